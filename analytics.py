@@ -0,0 +1,351 @@
+"""Platform analytics kept as counters, updated as things happen.
+
+Admins get applications per college and per district, the distribution of
+quiz ``recommended_field``, quizzes taken, registrations and daily active
+chat users without anything walking the users. The write paths report what
+they just did (``applied``, ``quiz_scored``, ``registered``, ``chatted``):
+each call adds to a per-process dict of deltas under a lock.
+
+Every ``interval`` seconds a background thread flushes the deltas of this
+worker into the shared ``StatCounter`` table in one transaction
+(``INSERT .. ON CONFLICT DO UPDATE value = value + delta`` on sqlite and
+PostgreSQL), so every worker and host adds to the same numbers. Active chat
+users are counted once per student per UTC day through the ``ChatDay``
+table, whose rows are inserted in the same transaction. If a flush fails,
+its deltas are kept for the next one.
+
+After each flush the view is re-read: the small counters, plus the top
+colleges through an index. It is serialised once, so ``/admin/analytics.json``
+returns pre-encoded bytes whatever the size of the platform. Numbers lag by
+up to ``interval`` seconds. Applications per district are counted under the
+district the college had when the student applied.
+
+Every ``snapshot_every`` seconds one worker also stores the headline totals
+as a ``StatSnapshot`` row (the time bucket is the primary key, so the other
+workers' inserts for it are no-ops). ``/admin/analytics`` plots them with
+Chart.js, and ``/admin/analytics/history.json`` returns them.
+
+The first start on a database that has no counters yet seeds them once from
+the existing tables (``backfill``).
+"""
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta
+
+from flask import Response, jsonify, render_template, request, session
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from module import Application, ChatDay, ChatMessage, StatCounter, StatSnapshot, User
+
+log = logging.getLogger(__name__)
+
+DAYS_SHOWN = 30
+TOP_COLLEGES = 20
+UPSERT_DIALECTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def today():
+    return datetime.utcnow().strftime("%Y-%m-%d")
+
+
+class Analytics:
+    def __init__(self, db, loader, interval=5.0, snapshot_every=300, keep_snapshots=7 * 24 * 3600,
+                 max_seen=10000):
+        self.db = db
+        self.loader = loader
+        self.interval = interval
+        self.snapshot_every = snapshot_every
+        self.keep_snapshots = keep_snapshots
+        self.max_seen = max_seen
+        self.token = None
+        self.admins = frozenset()
+        self._engine = None
+        self._lock = threading.Lock()
+        self._pending = defaultdict(int)  # (metric, key) -> delta not yet flushed
+        self._chatters = set()            # (user_id, day) not yet flushed
+        self._seen = OrderedDict()        # (user_id, day) already reported by this worker, LRU
+        self._bucket = None
+        self._body = b"{}"
+        self._history = b'{"snapshots": []}'
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {"events": 0, "flushes": 0, "failed_flushes": 0, "rows": 0, "snapshots": 0}
+
+    def init_app(self, app, token=None, admins=()):
+        """Register the admin page and JSON endpoints; ``admins`` are emails allowed in through their session."""
+        self.app = app
+        self.token = token
+        self.admins = frozenset(a.strip().lower() for a in admins if a.strip())
+        app.add_url_rule("/admin/analytics", "admin_analytics", self.page)
+        app.add_url_rule("/admin/analytics.json", "admin_analytics_json", self.current)
+        app.add_url_rule("/admin/analytics/history.json", "admin_analytics_history", self.history)
+
+    def start(self):
+        """Seed the counters if needed, load the view and start flushing in the background."""
+        if self._thread is None:
+            with self.app.app_context():
+                self._engine = self.db.engine
+            self.backfill()
+            self.flush()
+            self._thread = threading.Thread(target=self._run, name="analytics-flush", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+            except Exception:
+                log.exception("Analytics flush failed")
+
+    # ---------- write-path hooks ----------
+    def _add(self, metric, key, delta=1):
+        self._pending[(metric, key)] += delta
+
+    def applied(self, college_id):
+        college = self.loader.current.get(college_id)
+        with self._lock:
+            self.stats["events"] += 1
+            self._add("totals", "applications")
+            self._add("applications", str(college_id))
+            self._add("applications_by_district", (college or {}).get("district") or "Unknown")
+
+    def quiz_scored(self, old_field, new_field):
+        with self._lock:
+            self.stats["events"] += 1
+            self._add("totals", "quizzes")
+            if old_field != new_field:
+                if old_field:
+                    self._add("quiz_field", old_field, -1)
+                self._add("quiz_field", new_field)
+
+    def registered(self):
+        with self._lock:
+            self.stats["events"] += 1
+            self._add("totals", "users")
+            self._add("registrations", today())
+
+    def chatted(self, user_id):
+        seen = (user_id, today())
+        with self._lock:
+            self.stats["events"] += 1
+            if seen in self._seen:
+                self._seen.move_to_end(seen)
+                return
+            self._seen[seen] = True
+            if len(self._seen) > self.max_seen:
+                self._seen.popitem(last=False)
+            self._chatters.add(seen)
+
+    # ---------- flushing ----------
+    def _upsert(self, conn, deltas):
+        rows = [{"metric": m, "key": k, "value": v} for (m, k), v in sorted(deltas.items()) if v]
+        if not rows:
+            return
+        make_insert = UPSERT_DIALECTS.get(conn.dialect.name)
+        if make_insert is not None:
+            stmt = make_insert(StatCounter)
+            conn.execute(stmt.on_conflict_do_update(
+                index_elements=["metric", "key"], set_={"value": StatCounter.value + stmt.excluded.value}
+            ), rows)
+            return
+        for row in rows:
+            # a concurrent insert of the same new key fails the flush, which is then retried
+            found = conn.execute(
+                update(StatCounter)
+                .where(StatCounter.metric == row["metric"], StatCounter.key == row["key"])
+                .values(value=StatCounter.value + row["value"])
+            ).rowcount
+            if not found:
+                conn.execute(insert(StatCounter), [row])
+
+    def _new_chatters(self, conn, chatters):
+        """Insert ``ChatDay`` rows for ``chatters`` not counted yet -> ``{day: new students}``."""
+        by_day = defaultdict(set)
+        for user_id, day in chatters:
+            by_day[day].add(user_id)
+        counts = {}
+        for day, user_ids in by_day.items():
+            known = set(conn.execute(
+                select(ChatDay.user_id).where(ChatDay.day == day, ChatDay.user_id.in_(user_ids))
+            ).scalars())
+            new = user_ids - known
+            if new:
+                conn.execute(insert(ChatDay), [{"user_id": u, "day": day} for u in sorted(new)])
+                counts[day] = len(new)
+        return counts
+
+    def flush(self):
+        """Write this worker's deltas to the shared counters, then reload the view."""
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(int)
+            chatters, self._chatters = self._chatters, set()
+        if pending or chatters:
+            deltas = dict(pending)
+            try:
+                with self._engine.begin() as conn:
+                    if chatters:
+                        for day, n in self._new_chatters(conn, chatters).items():
+                            deltas[("chat_active", day)] = n
+                    self._upsert(conn, deltas)
+            except SQLAlchemyError as e:
+                # another worker raced us to a new row, or the database is away: keep it for the next flush
+                with self._lock:
+                    for key, delta in pending.items():
+                        self._pending[key] += delta
+                    self._chatters |= chatters
+                    self.stats["failed_flushes"] += 1
+                log.warning("Analytics flush of %d counters postponed: %s", len(deltas), e)
+                return False
+            self.stats["rows"] += len(deltas)
+        self.stats["flushes"] += 1
+        self._refresh()
+        return True
+
+    # ---------- the view ----------
+    def _refresh(self):
+        with self._engine.connect() as conn:
+            rows = conn.execute(
+                select(StatCounter.metric, StatCounter.key, StatCounter.value)
+                .where(StatCounter.metric != "applications")
+            ).all()
+            top = conn.execute(
+                select(StatCounter.key, StatCounter.value)
+                .where(StatCounter.metric == "applications", StatCounter.value > 0)
+                .order_by(StatCounter.value.desc())
+                .limit(TOP_COLLEGES)
+            ).all()
+        counters = defaultdict(dict)
+        for metric, key, value in rows:
+            counters[metric][key] = value
+        catalog = self.loader.current
+        top_colleges = []
+        for key, value in top:
+            college = catalog.get(int(key)) or {}
+            top_colleges.append({"id": int(key), "name": college.get("name"), "district": college.get("district"),
+                                 "applications": value})
+        now = datetime.utcnow()
+        days = [(now - timedelta(days=n)).strftime("%Y-%m-%d") for n in range(DAYS_SHOWN - 1, -1, -1)]
+        totals = counters["totals"]
+        view = {
+            "updated_at": now.isoformat(timespec="seconds") + "Z",
+            "totals": {
+                "users": totals.get("users", 0),
+                "applications": totals.get("applications", 0),
+                "quizzes": totals.get("quizzes", 0),
+                "chat_active_today": counters["chat_active"].get(days[-1], 0),
+            },
+            "applications": {
+                "top_colleges": top_colleges,
+                "by_district": dict(sorted(counters["applications_by_district"].items(), key=lambda kv: -kv[1])),
+            },
+            "quiz_fields": dict(sorted(((k, v) for k, v in counters["quiz_field"].items() if v > 0),
+                                       key=lambda kv: -kv[1])),
+            "daily": {
+                "days": days,
+                "chat_active": [counters["chat_active"].get(day, 0) for day in days],
+                "registrations": [counters["registrations"].get(day, 0) for day in days],
+            },
+        }
+        self._body = json.dumps(view, ensure_ascii=False).encode("utf-8")
+        self._snapshot(now, view["totals"])
+
+    def _snapshot(self, now, totals):
+        bucket = int(now.timestamp()) // self.snapshot_every * self.snapshot_every
+        if bucket == self._bucket:
+            return
+        taken_at = datetime.utcfromtimestamp(bucket)
+        try:
+            with self._engine.begin() as conn:
+                conn.execute(insert(StatSnapshot), [{"taken_at": taken_at, "data": json.dumps(totals)}])
+                conn.execute(delete(StatSnapshot).where(
+                    StatSnapshot.taken_at < taken_at - timedelta(seconds=self.keep_snapshots)
+                ))
+            self.stats["snapshots"] += 1
+        except IntegrityError:
+            pass  # another worker took this one
+        with self._engine.connect() as conn:
+            snapshots = conn.execute(select(StatSnapshot.taken_at, StatSnapshot.data).order_by(StatSnapshot.taken_at)).all()
+        self._history = json.dumps({
+            "interval": self.snapshot_every,
+            "snapshots": [dict(json.loads(data), at=at.isoformat(timespec="seconds") + "Z") for at, data in snapshots],
+        }).encode("utf-8")
+        self._bucket = bucket
+
+    # ---------- seeding ----------
+    def backfill(self):
+        """Seed the counters from the existing tables, once per database; True if this call did it."""
+        since = (datetime.utcnow() - timedelta(days=DAYS_SHOWN)).replace(hour=0, minute=0, second=0, microsecond=0)
+        try:
+            with self._engine.begin() as conn:
+                if conn.execute(select(StatCounter.value).where(StatCounter.metric == "meta",
+                                                                 StatCounter.key == "backfilled")).first():
+                    return False
+                # claims the backfill: a second worker doing the same fails here
+                conn.execute(insert(StatCounter), [{"metric": "meta", "key": "backfilled", "value": int(time.time())}])
+                counts = defaultdict(int)
+                counts[("totals", "users")] = conn.execute(select(func.count()).select_from(User)).scalar_one()
+                counts[("totals", "quizzes")] = conn.execute(
+                    select(func.count()).select_from(User).where(User.quiz_scores.is_not(None))
+                ).scalar_one()
+                for field, n in conn.execute(
+                    select(User.recommended_field, func.count())
+                    .where(User.recommended_field.is_not(None), User.recommended_field != "")
+                    .group_by(User.recommended_field)
+                ):
+                    counts[("quiz_field", field)] = n
+                catalog = self.loader.current
+                for college_id, n in conn.execute(
+                    select(Application.college_id, func.count()).group_by(Application.college_id)
+                ):
+                    counts[("totals", "applications")] += n
+                    counts[("applications", str(college_id))] = n
+                    district = (catalog.get(college_id) or {}).get("district") or "Unknown"
+                    counts[("applications_by_district", district)] += n
+                active = conn.execute(
+                    select(ChatMessage.user_id, func.date(ChatMessage.created_at))
+                    .where(ChatMessage.role == "user", ChatMessage.created_at >= since)
+                    .distinct()
+                ).all()
+                if active:
+                    conn.execute(insert(ChatDay), [{"user_id": u, "day": str(day)} for u, day in active])
+                    for _, day in active:
+                        counts[("chat_active", str(day))] += 1
+                self._upsert(conn, counts)
+        except SQLAlchemyError as e:
+            log.info("Analytics counters not seeded here: %s", e)
+            return False
+        log.info("Seeded analytics counters from %d users", counts[("totals", "users")])
+        return True
+
+    # ---------- views ----------
+    def _authorized(self):
+        if self.token and request.headers.get("Authorization") == f"Bearer {self.token}":
+            return True
+        return session.get("user") in self.admins
+
+    def page(self):
+        if not self._authorized():
+            return Response("unauthorized\n", status=401, mimetype="text/plain")
+        return render_template("admin_analytics.html")
+
+    def current(self):
+        if not self._authorized():
+            return jsonify({"error": "unauthorized"}), 401
+        return Response(self._body, mimetype="application/json", headers={"Cache-Control": "no-store"})
+
+    def history(self):
+        if not self._authorized():
+            return jsonify({"error": "unauthorized"}), 401
+        return Response(self._history, mimetype="application/json", headers={"Cache-Control": "no-store"})
@@ -1,107 +1,118 @@
 import os
+import io
 import json
+import shutil
+import tempfile
+import threading
+import time
 from flask import (
-    Flask, render_template, request, redirect, url_for, flash, session, jsonify
+    Flask, render_template, request, redirect, url_for, flash, session, jsonify,
+    Response, stream_with_context,
 )
-from werkzeug.utils import secure_filename
+from werkzeug.security import check_password_hash, generate_password_hash
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError, IntegrityError
 from dotenv import load_dotenv
 from datetime import datetime
-import openai
-
-# ---------- Load environment ----------
-load_dotenv()
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if OPENAI_API_KEY:
-    openai.api_key = OPENAI_API_KEY
+from functools import partial
+
+from analytics import Analytics
+from assets import AssetManifest
+from catalog import CatalogLoader, load_catalog
+from catalog_api import CatalogAPI
+from columnar import open_catalog
+from chat_context import ContextBuilder, count_tokens
+from chat_history import ChatHistory
+from intents import IntentEngine
+from ledger import ApplicationLedger
+from llm_client import ChatClient, CircuitBreaker
+from metrics import Metrics
+from page_cache import PageCache
+from quiz_scoring import QuizScorer
+from recommend import Recommender
+from search import CollegeSearch, highlight
+from snapshot import Snapshot
+from sessions import MemoryStore, ServerSession, ServerSessionInterface, SqliteStore
+from uploads import ImagePipeline, UploadError
+from module import WELCOME_MESSAGE, ChatMessage, User, db, upgrade_schema
+from reply_cache import MemoryBackend, ReplyCache, SqliteBackend, cache_key
 
 # ---------- Flask setup ----------
+# Importing this module only defines the app and its routes. Reading the
+# environment, opening the stores and loading data happen in create_app()
+# (bottom of the file), once per process.
 app = Flask(__name__)
-app.secret_key = os.getenv("FLASK_SECRET", "supersecretkey")  # change in production
+
+# Per-endpoint latency/size histograms, template timing, chat and catalog timings on /metrics
+metrics = Metrics()
+metrics.histogram("openai_request_seconds", "OpenAI chat completion latency (streams: until the last delta).")
+metrics.counter("openai_errors_total", "Failed OpenAI calls by exception class.")
+metrics.histogram("openai_attempt_seconds", "Latency of each upstream OpenAI attempt by outcome (ok, retryable, fatal).")
+metrics.counter("openai_tokens_total", "Tokens sent/received; counted=api from usage, estimate for streams.")
+metrics.counter("chat_replies_total", "Chat replies by source (model, cache, coalesced, fallback).")
+metrics.histogram("catalog_query_seconds", "Catalog filter/page and nearest-neighbour query time.")
 
 # ---------- File upload config ----------
 UPLOAD_FOLDER = os.path.join("static", "uploads")
 ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "gif"}
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
-
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+app.config["MAX_CONTENT_LENGTH"] = 16 * 1024 * 1024
 
 
 def allowed_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-# ---------- Dummy user storage (in-memory) ----------
-users = {
-    "student@example.com": {
-        "email": "student@example.com",
-        "password": "12345",
-        "name": "Student User",
-        "qualification": "12th",
-        "school_background": "Science Stream",
-        "marks": "85%",
-        "subjects": "Maths, Physics, Computer Science",
-        "interests": "AI, Web Development, Data Science",
-        "skills": "Python, HTML, CSS",
-        "career_goal": "Software Engineer",
-        "college": "Government College of Engineering",
-        "joined": "2025",
-        "guidelines": "Focus on AI & Data Science for future scope.",
-        "profile_pic": None,
-        "recommended_field": None,
-        "chat_history": [
-            {"role": "assistant", "content": "👋 Hello! I’m your AI career counselor. How can I help today?"}
-        ],
-        "applied_colleges": [],
-    }
-}
-
-# ---------- Load colleges (persisted file) ----------
-colleges_file = "colleges.json"
-if os.path.exists(colleges_file):
-    with open(colleges_file, "r", encoding="utf-8") as f:
-        colleges_data = json.load(f)
-else:
-    colleges_data = [
-        {
-            "id": 1,
-            "name": "Government College of Engineering",
-            "district": "Srinagar",
-            "type": "Engineering",
-            "fields": "Engineering/Tech",
-        },
-        {
-            "id": 2,
-            "name": "Government Medical College Srinagar",
-            "district": "Srinagar",
-            "type": "Medical",
-            "fields": "Medicine/Biology",
-        },
-        {
-            "id": 3,
-            "name": "Arts & Humanities College Jammu",
-            "district": "Jammu",
-            "type": "Arts",
-            "fields": "Arts/Design",
-        },
-    ]
-    with open(colleges_file, "w", encoding="utf-8") as f:
-        json.dump(colleges_data, f, indent=4, ensure_ascii=False)
-
-# ---------- Load timeline ----------
-timeline_file = "timeline.json"
-if os.path.exists(timeline_file):
-    with open(timeline_file, "r", encoding="utf-8") as f:
-        timeline_data = json.load(f)
-else:
-    timeline_data = [
-        {"year": "2025", "event": "Take Career Quiz & Identify Field"},
-        {"year": "2026", "event": "Prepare for Entrance Exams"},
-        {"year": "2027", "event": "Apply to Top Colleges"},
-        {"year": "2028", "event": "Start Undergraduate Program"},
-    ]
-    with open(timeline_file, "w", encoding="utf-8") as f:
-        json.dump(timeline_data, f, indent=4, ensure_ascii=False)
+# ---------- Database (users, chat history, applications) ----------
+ledger = ApplicationLedger(db)
+
+
+def _sqlite_pragmas(dbapi_conn, _):
+    # WAL lets worker processes read while another one writes
+    cur = dbapi_conn.cursor()
+    cur.execute("PRAGMA journal_mode=WAL")
+    cur.execute("PRAGMA synchronous=NORMAL")
+    cur.execute("PRAGMA busy_timeout=5000")
+    cur.close()
+
+
+def get_user(email):
+    if not email:
+        return None
+    return User.query.filter_by(email=email).first()
+
+
+def regenerate_session():
+    # new server-side session id across login/logout (session fixation); signed-cookie sessions have no id
+    if isinstance(session._get_current_object(), ServerSession):
+        session.regenerate()
+
+
+# ---------- Colleges ----------
+# Served when COLLEGES_FILE doesn't exist (it is never created for you)
+DEFAULT_COLLEGES = [
+    {
+        "id": 1,
+        "name": "Government College of Engineering",
+        "district": "Srinagar",
+        "type": "Engineering",
+        "fields": "Engineering/Tech",
+    },
+    {
+        "id": 2,
+        "name": "Government Medical College Srinagar",
+        "district": "Srinagar",
+        "type": "Medical",
+        "fields": "Medicine/Biology",
+    },
+    {
+        "id": 3,
+        "name": "Arts & Humanities College Jammu",
+        "district": "Jammu",
+        "type": "Arts",
+        "fields": "Arts/Design",
+    },
+]
 
 
 # ---------- Routes ----------
@@ -117,8 +128,9 @@ def login():
     if request.method == "POST":
         email = request.form.get("email", "").strip().lower()
         password = request.form.get("password", "")
-        user = users.get(email)
-        if user and user.get("password") == password:
+        user = get_user(email)
+        if user and check_password_hash(user.password, password):
+            regenerate_session()
             session["user"] = email
             flash("Login successful! 🎉", "success")
             return redirect(url_for("dashboard"))
@@ -149,16 +161,16 @@ def register():
         if "profile_pic" in request.files:
             file = request.files["profile_pic"]
             if file and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                filepath = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-                file.save(filepath)
-                profile_pic = f"uploads/{filename}"
+                try:
+                    profile_pic = avatar_pipeline.save(file)
+                except UploadError as e:
+                    flash(f"{e} ⚠️", "warning")
 
         if not email or not password:
             flash("Please provide email and password", "warning")
             return render_template("register.html")
 
-        if email in users:
+        if get_user(email):
             flash("Email already registered ⚠️", "warning")
             return render_template("register.html")
 
@@ -166,27 +178,27 @@ def register():
             flash("Passwords do not match ❌", "danger")
             return render_template("register.html")
 
-        users[email] = {
-            "email": email,
-            "password": password,
-            "name": name or email.split("@")[0].title(),
-            "qualification": qualification,
-            "school_background": school_background,
-            "marks": marks,
-            "subjects": subjects,
-            "interests": interests,
-            "skills": skills,
-            "career_goal": career_goal,
-            "college": "",
-            "joined": "",
-            "guidelines": "",
-            "profile_pic": profile_pic,
-            "recommended_field": None,
-            "chat_history": [
-                {"role": "assistant", "content": "👋 Hello! I’m your AI career counselor. How can I help today?"}
-            ],
-            "applied_colleges": [],
-        }
+        user = User(
+            email=email,
+            password=generate_password_hash(password),
+            name=name or email.split("@")[0].title(),
+            qualification=qualification,
+            school_background=school_background,
+            marks=marks,
+            subjects=subjects,
+            interests=interests,
+            skills=skills,
+            career_goal=career_goal,
+            college="",
+            joined="",
+            guidelines="",
+            profile_pic=profile_pic,
+        )
+        user.messages.append(ChatMessage(role="assistant", content=WELCOME_MESSAGE))
+        db.session.add(user)
+        db.session.commit()
+        analytics.registered()
+        regenerate_session()
         session["user"] = email
         flash("Registration successful ✅ Welcome!", "success")
         return redirect(url_for("dashboard"))
@@ -202,7 +214,7 @@ def dashboard():
         return redirect(url_for("login"))
 
     user_email = session["user"]
-    user_data = users.get(user_email)
+    user_data = get_user(user_email)
     if not user_data:
         session.pop("user", None)
         flash("User not found. Please register or log in again.", "danger")
@@ -217,7 +229,7 @@ def profile():
     if "user" not in session:
         flash("Please log in to view your profile ⚠️", "warning")
         return redirect(url_for("login"))
-    return render_template("profile.html", user=users[session["user"]])
+    return render_template("profile.html", user=get_user(session["user"]))
 
 
 # Edit profile
@@ -227,7 +239,7 @@ def edit_profile():
         flash("Please log in first ⚠️", "warning")
         return redirect(url_for("login"))
 
-    user_data = users[session["user"]]
+    user_data = get_user(session["user"])
     if request.method == "POST":
         for field in [
             "name",
@@ -242,16 +254,17 @@ def edit_profile():
             "career_goal",
             "guidelines",
         ]:
-            user_data[field] = request.form.get(field, user_data.get(field, ""))
+            setattr(user_data, field, request.form.get(field, getattr(user_data, field) or ""))
         # profile picture
         if "profile_pic" in request.files:
             file = request.files["profile_pic"]
             if file and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                filepath = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-                file.save(filepath)
-                user_data["profile_pic"] = f"uploads/{filename}"
+                try:
+                    user_data.profile_pic = avatar_pipeline.save(file)
+                except UploadError as e:
+                    flash(f"{e} ⚠️", "warning")
 
+        db.session.commit()
         flash("Profile updated successfully ✅", "success")
         return redirect(url_for("profile"))
 
@@ -264,13 +277,24 @@ def chat():
     if "user" not in session:
         flash("Please log in first ⚠️", "warning")
         return redirect(url_for("login"))
-    user_data = users[session["user"]]
-    # Ensure chat_history exists
-    if "chat_history" not in user_data:
-        user_data["chat_history"] = [
-            {"role": "assistant", "content": "👋 Hello! I’m your AI career counselor. How can I help today?"}
-        ]
-    return render_template("chat.html", chat_history=user_data["chat_history"])
+    user_data = get_user(session["user"])
+    # Only the latest messages; older ones are fetched from /chat/history while scrolling back
+    messages = chat_history.recent_messages(user_data.id)
+    if not messages:
+        messages = [chat_history.append(user_data.id, "assistant", WELCOME_MESSAGE)]
+    has_more = chat_history.count(user_data.id) > len(messages)
+    return render_template("chat.html", chat_history=messages, has_more=has_more)
+
+
+# Older chat messages, one page at a time: /chat/history?before=<oldest id shown>&limit=50
+@app.route("/chat/history")
+def chat_history_api():
+    if "user" not in session:
+        return jsonify({"error": "Please log in first."}), 401
+    user_data = get_user(session["user"])
+    limit = min(max(request.args.get("limit", 50, type=int), 1), 200)
+    messages, more = chat_history.page(user_data.id, before=request.args.get("before", type=int), limit=limit)
+    return jsonify({"messages": messages, "more": more})
 
 
 # Reset chat
@@ -278,20 +302,112 @@ def chat():
 def chat_reset():
     if "user" not in session:
         return redirect(url_for("login"))
-    user_data = users[session["user"]]
-    user_data["chat_history"] = [
-        {"role": "assistant", "content": "🔄 Chat reset. 👋 How can I help with your career journey now?"}
-    ]
+    user_data = get_user(session["user"])
+    user_data.chat_summary, user_data.chat_summary_upto = None, 0
+    chat_history.reset(user_data.id, "🔄 Chat reset. 👋 How can I help with your career journey now?")
     return redirect(url_for("chat"))
 
 
+# ---------- Chat helpers ----------
+CHAT_MODEL = "gpt-3.5-turbo"
+SYSTEM_PROMPT = "You are a helpful AI career counselor for students in Jammu & Kashmir."
+
+
+def fallback_reply(user_message, history_len):
+    """Domain-specific canned reply used when the AI is unavailable."""
+    # unmatched messages rotate through general helpful lines so it's not repetitive
+    return intent_engine.reply(user_message, turn=history_len)
+
+
+def chat_messages(user_data):
+    # the turns the summary doesn't cover yet, from the hot tail
+    offset, history = chat_history.tail(user_data.id, user_data.chat_summary_upto)
+    messages, info = chat_context.build(
+        SYSTEM_PROMPT, [{"role": m["role"], "content": m["content"]} for m in history],
+        (user_data.chat_summary_upto, user_data.chat_summary), offset=offset,
+    )
+    if info["resummarized"]:
+        user_data.chat_summary_upto, user_data.chat_summary = info["summary"]
+        db.session.commit()
+    app.logger.info(
+        "chat prompt tokens: %d -> %d (%d turns summarised)",
+        info["tokens_before"], info["tokens_after"], info["summarized"],
+    )
+    return messages
+
+
+def sse(data, event=None):
+    """Format one Server-Sent Event."""
+    payload = json.dumps(data, ensure_ascii=False)
+    return (f"event: {event}\n" if event else "") + f"data: {payload}\n\n"
+
+
+def add_chat_message(user_data, role, content):
+    chat_history.append(user_data.id, role, content)
+
+
+def stream_chat_reply(user_id, user_message, key=None):
+    """Yield SSE events with model deltas as they arrive, then a final ``done`` event.
+
+    The finished reply is appended to the chat history once the stream ends.
+    If the model is unavailable before the first delta, the keyword fallback
+    is sent as a single delta instead. With a cache ``key`` the reply goes
+    through the reply cache's single-flight: a cached reply, or the one
+    another request for the same key is streaming, is sent as one delta, and
+    a completed model reply is stored for next time.
+    """
+    # the view's DB session is closed before streaming starts; load the user again
+    user_data = db.session.get(User, user_id)
+    parts = []
+    cached, source, flight = reply_cache.claim(key) if key else (None, "computed", None)
+    try:
+        if cached:
+            parts.append(cached)
+            yield sse({"delta": cached})
+        elif source == "computed" and OPENAI_API_KEY:
+            messages = chat_messages(user_data)
+            start = time.perf_counter()
+            try:
+                for delta in chat_client.stream(messages, max_tokens=600, temperature=0.7):
+                    parts.append(delta)
+                    yield sse({"delta": delta})
+                if flight:
+                    # only a complete reply is shared with the waiters and cached
+                    reply_cache.release(key, flight, "".join(parts).strip())
+                    flight = None
+            except Exception as e:
+                # keep whatever already reached the user; otherwise fall back below
+                metrics.inc("openai_errors_total", error=type(e).__name__)
+                app.logger.warning("Streaming chat failed after %d deltas: %s", len(parts), e)
+            metrics.observe("openai_request_seconds", time.perf_counter() - start, mode="stream")
+            metrics.inc("openai_tokens_total", sum(count_tokens(m["content"]) for m in messages), kind="prompt", counted="estimate")
+            metrics.inc("openai_tokens_total", count_tokens("".join(parts)), kind="completion", counted="estimate")
+    finally:
+        # failed, disconnected or no model: the waiters fall back on their own
+        if flight:
+            reply_cache.release(key, flight, None)
+
+    bot_reply = "".join(parts).strip()
+    if not bot_reply:
+        bot_reply = fallback_reply(user_message, chat_history.count(user_data.id))
+        yield sse({"delta": bot_reply})
+        source = "fallback"
+    elif source == "computed":
+        source = "model"
+    metrics.inc("chat_replies_total", source=source, mode="stream")
+
+    add_chat_message(user_data, "assistant", bot_reply)
+    yield sse({"reply": bot_reply}, event="done")
+
+
 # Chat API with live AI + domain-specific fallback
+# Send {"stream": true} (or Accept: text/event-stream) to get the reply as SSE deltas
 @app.route("/chat/api", methods=["POST"])
 def chat_api():
     if "user" not in session:
         return jsonify({"reply": "⚠️ Please log in first."})
 
-    user_data = users[session["user"]]
+    user_data = get_user(session["user"])
     data = request.get_json() or {}
     user_message = (data.get("message") or "").strip()
 
@@ -299,70 +415,50 @@ def chat_api():
         return jsonify({"reply": "⚠️ Please type a message."})
 
     # Save user message
-    user_data.setdefault("chat_history", []).append({"role": "user", "content": user_message})
-
-    bot_reply = None
-
-    # Try real OpenAI if API key present
-    if OPENAI_API_KEY:
+    add_chat_message(user_data, "user", user_message)
+    analytics.chatted(user_data.id)
+
+    # Repeated questions are answered from the reply cache unless the client opts out
+    bypass = data.get("cache") is False or "no-cache" in request.headers.get("Cache-Control", "")
+    key = None if bypass else cache_key(user_message, user_data.recommended_field or "")
+
+    if data.get("stream") or request.accept_mimetypes.best == "text/event-stream":
+        return Response(
+            stream_with_context(stream_chat_reply(user_data.id, user_message, key)),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    def ask_model():
+        # Try real OpenAI if API key present
+        if not OPENAI_API_KEY:
+            return None
+        start = time.perf_counter()
         try:
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "system", "content": "You are a helpful AI career counselor for students in Jammu & Kashmir."}]
-                         + user_data["chat_history"],
-                max_tokens=600,
-                temperature=0.7,
-            )
-            bot_reply = response["choices"][0]["message"]["content"].strip()
+            response = chat_client.complete(chat_messages(user_data), max_tokens=600, temperature=0.7)
+            usage = response.get("usage") or {}
+            metrics.inc("openai_tokens_total", usage.get("prompt_tokens", 0), kind="prompt", counted="api")
+            metrics.inc("openai_tokens_total", usage.get("completion_tokens", 0), kind="completion", counted="api")
+            return response["choices"][0]["message"]["content"].strip()
         except Exception as e:
-            # we will fall back to domain messages below, but keep a short reason for debugging (not shown to user)
-            error_text = str(e)
-            # choose friendly message later
-            bot_reply = None
+            # we fall back to domain messages below; the reason goes to the log and /metrics, not the user
+            metrics.inc("openai_errors_total", error=type(e).__name__)
+            app.logger.warning("Chat completion failed: %s", e)
+            return None
+        finally:
+            metrics.observe("openai_request_seconds", time.perf_counter() - start, mode="json")
+
+    bot_reply, source = reply_cache.get_or_compute(key, ask_model, bypass=bypass)
     # If bot_reply still None, use fallback messages (domain-specific)
     if not bot_reply:
-        fallback_replies = [
-            "🎓 NEET / Medical: Focus on NCERT Biology & Chemistry. Practice previous years' papers and timed mocks.",
-            "📐 JEE / Engineering: Strengthen Physics fundamentals, practice problem solving and take regular mock tests.",
-            "📚 UPSC / Civil Services: Start early with NCERTs, read daily editorials, and practice answer-writing.",
-            "⚖️ Law (CLAT): Work on legal reasoning, logical ability, and comprehension. Take mock tests and read case summaries.",
-            "💼 Commerce / CA / CS: Build basics in Accountancy, Business Studies and practice numerical problems.",
-            "🎨 Arts / Design: Build a strong portfolio, practice creative projects, and consider design entrance prep.",
-            "💻 IT / CS: Start learning Python, data structures, and small projects (web apps, scripts) to build a portfolio.",
-            "🏛️ Government exams (JKPSC etc.): Track official notifications, focus on basics and current affairs, and practice mock papers.",
-            "💡 Career tip: Improve soft skills (communication, teamwork) — employers value these highly.",
-            "🎯 Scholarships: Look for schemes like PMSSS (for J&K students) and state scholarships; they can reduce costs significantly."
-        ]
-        # Pick reply based on keywords in user_message for slightly smarter fallback
-        user_low = user_message.lower()
-        selected = None
-        keyword_map = {
-            ("neet", "medical", "biology", "mbbs"): 0,
-            ("jee", "engineering", "physics", "math"): 1,
-            ("upsc", "civil services", "ias", "ias/ips"): 2,
-            ("clat", "law", "llb"): 3,
-            ("ca", "commerce", "cs", "account"): 4,
-            ("arts", "design", "painting", "fine"): 5,
-            ("python", "coding", "data science", "machine", "ai", "web"): 6,
-            ("jkpsc", "state", "psc", "government exam"): 7,
-            ("scholarship", "pmsss", "financial", "grant"): 9,
-        }
-        for keys, idx in keyword_map.items():
-            for k in keys:
-                if k in user_low:
-                    selected = fallback_replies[idx]
-                    break
-            if selected:
-                break
-
-        if not selected:
-            # rotate through general helpful lines so it's not repetitive
-            selected = fallback_replies[len(user_data["chat_history"]) % len(fallback_replies)]
-
-        bot_reply = f"{selected}\n\n⚠️ (AI currently unavailable for live replies.)"
+        bot_reply = fallback_reply(user_message, chat_history.count(user_data.id))
+        source = "fallback"
+    elif source == "computed":
+        source = "model"
+    metrics.inc("chat_replies_total", source=source, mode="json")
 
     # Save assistant reply into history
-    user_data.setdefault("chat_history", []).append({"role": "assistant", "content": bot_reply})
+    add_chat_message(user_data, "assistant", bot_reply)
 
     return jsonify({"reply": bot_reply})
 
@@ -375,36 +471,60 @@ def quiz():
         return redirect(url_for("login"))
 
     if request.method == "POST":
-        answers = [request.form.get(f"q{i}", "") for i in range(1, 11)]
-
-        scores = {
-            "Engineering/Tech": 0,
-            "Medicine/Biology": 0,
-            "Arts/Design": 0,
-            "Business/Management": 0,
-            "Education/Research": 0,
-        }
+        answers = [request.form.get(q, "") for q in quiz_scorer.answer_columns]
 
-        for ans in answers:
-            a = (ans or "").lower()
-            if any(x in a for x in ["math", "coding", "problem"]):
-                scores["Engineering/Tech"] += 2
-            if any(x in a for x in ["biology", "helping", "health"]):
-                scores["Medicine/Biology"] += 2
-            if any(x in a for x in ["drawing", "creative", "design"]):
-                scores["Arts/Design"] += 2
-            if any(x in a for x in ["leadership", "business", "money"]):
-                scores["Business/Management"] += 2
-            if any(x in a for x in ["reading", "teaching", "research"]):
-                scores["Education/Research"] += 2
+        best_field, scores = quiz_scorer.score(answers)
+        if best_field is None:
+            flash("Your answers didn't point to any field yet. Pick the options closest to your interests 🎯", "info")
+            return render_template("quiz.html")
+        user = get_user(session["user"])
+        previous_field = user.recommended_field
+        user.recommended_field = best_field
+        user.quiz_scores = json.dumps(scores)
+        db.session.commit()
+        analytics.quiz_scored(previous_field, best_field)
 
-        best_field = max(scores, key=scores.get)
-        users[session["user"]]["recommended_field"] = best_field
-
-        return render_template("quiz_result.html", field=best_field, scores=scores)
+        return render_template("quiz_result.html", field=best_field, suggestion=best_field, scores=scores)
 
     return render_template("quiz.html")
 
+
+# Bulk quiz scoring for schools: POST a CSV (q1..q10 + any id columns) as "file",
+# get the same rows back with recommended_field and per-category scores, streamed
+@app.route("/quiz/bulk", methods=["POST"])
+def quiz_bulk():
+    if "user" not in session:
+        return jsonify({"error": "Please log in first."}), 401
+    file = request.files.get("file")
+    if not file:
+        return jsonify({"error": "Upload a CSV file as 'file'."}), 400
+
+    # the upload is closed when the view returns, before the response streams;
+    # keep our own spooled copy (disk-backed past 1 MB) for the generator
+    upload = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    shutil.copyfileobj(file.stream, upload)
+    upload.seek(0)
+    lines = io.TextIOWrapper(upload, encoding="utf-8-sig", newline="")
+    results = quiz_scorer.score_csv(lines)
+    try:
+        header = next(results)
+    except ValueError as e:
+        lines.close()
+        return jsonify({"error": str(e)}), 400
+
+    def generate():
+        try:
+            yield header
+            yield from results
+        finally:
+            lines.close()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/csv",
+        headers={"Content-Disposition": "attachment; filename=quiz_results.csv"},
+    )
+
 # Colleges listing (filter + pagination)
 @app.route("/colleges")
 def colleges():
@@ -414,25 +534,23 @@ def colleges():
     page = int(request.args.get("page", 1))
     per_page = int(request.args.get("per_page", 6))
 
-    filtered = []
-    for c in colleges_data:
-        if search and search not in c["name"].lower():
-            continue
-        if district and c["district"].lower() != district:
-            continue
-        if ctype and c["type"].lower() != ctype:
-            continue
-        filtered.append(c)
-
-    total = len(filtered)
-    start = (page - 1) * per_page
-    end = start + per_page
-    paginated = filtered[start:end]
-
-    total_pages = (total // per_page + (1 if total % per_page else 0))
+    college_catalog = catalog_loader.current
+    highlights = {}
+    if search.strip():
+        with metrics.time("catalog_query_seconds", query="search"):
+            hits, total, total_pages = college_search.page(
+                college_catalog, search, page=page, per_page=per_page, district=district, ctype=ctype
+            )
+        paginated = [hit.record for hit in hits]
+        highlights = {hit.record.get("id"): hit.highlights for hit in hits}
+    else:
+        with metrics.time("catalog_query_seconds", query="page"):
+            paginated, total, total_pages = college_catalog.page(
+                page=page, per_page=per_page, district=district, ctype=ctype
+            )
 
-    # ✅ Unique districts for dropdown
-    all_districts = sorted({c["district"] for c in colleges_data})
+    # ✅ Unique districts for dropdown (precomputed facets, with counts)
+    all_districts = college_catalog.facet_values("district")
 
     return render_template(
         "colleges.html",
@@ -442,37 +560,76 @@ def colleges():
         search=search,
         district=district,
         ctype=ctype,
-        all_districts=all_districts  # 👈 important fix
+        all_districts=all_districts,  # 👈 important fix
+        facets=college_catalog.facets,
+        total=total,
+        highlights=highlights,
     )
 
 
 # College detail + Nearby Colleges + Map
 @app.route("/college/<int:college_id>")
 def college_detail(college_id):
-    college = next((c for c in colleges_data if c.get("id") == college_id), None)
+    college_catalog = catalog_loader.current
+    college = college_catalog.get(college_id)
     if not college:
         flash("College not found ⚠️", "danger")
         return redirect(url_for("colleges"))
 
-    # Nearby colleges = same district, excluding itself
-    nearby = [
-        c for c in colleges_data
-        if c.get("district") == college.get("district") and c.get("id") != college_id
-    ][:3]  # limit to 3 nearby colleges
+    # Nearby colleges = 3 closest by distance (same district if no coordinates)
+    nearby = college_catalog.nearby(college, k=3)
 
     # Google Maps embed
     maps_url = f"https://www.google.com/maps?q={college['name']} {college['district']}&output=embed"
 
-    user = users.get(session.get("user")) if "user" in session else None
+    user = get_user(session.get("user"))
+    applied = user is not None and ledger.has_applied(user.id, college_id)
     return render_template(
         "college_detail.html",
         college=college,
-        user=user,
+        applied=applied,
         maps_url=maps_url,
         nearby=nearby
     )
 
 
+# Nearest colleges to a point (JSON), e.g. /colleges/near?lat=34.08&lng=74.79&k=5&radius=25
+@app.route("/colleges/near")
+def colleges_near():
+    try:
+        lat = float(request.args["lat"])
+        lng = float(request.args["lng"])
+        k = min(max(int(request.args.get("k", 5)), 1), 50)
+        radius = request.args.get("radius")
+        radius = float(radius) if radius else None
+    except (KeyError, ValueError):
+        return jsonify({"error": "lat and lng are required numbers; k and radius must be numeric"}), 400
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return jsonify({"error": "lat/lng out of range"}), 400
+
+    with metrics.time("catalog_query_seconds", query="nearest"):
+        hits = catalog_loader.current.nearest(
+            lat, lng, k=k, radius_km=radius,
+            ctype=request.args.get("type", ""), field=request.args.get("field", ""),
+        )
+    return jsonify({
+        "version": catalog_loader.version,
+        "colleges": [
+            {
+                "id": c.get("id"),
+                "name": c.get("name"),
+                "district": c.get("district"),
+                "type": c.get("type"),
+                "fields": c.get("fields"),
+                "lat": c.get("lat"),
+                "lng": c.get("lng"),
+                "distance_km": round(dist, 3),
+            }
+            for dist, c in hits
+        ],
+    })
+
+
 @app.route("/college/<int:college_id>/apply")
 def apply_college(college_id):
     if "user" not in session:
@@ -480,18 +637,34 @@ def apply_college(college_id):
         return redirect(url_for("login"))
 
     email = session["user"]
-    user_data = users[email]
-    user_data.setdefault("applied_colleges", [])
-
-    if college_id in user_data["applied_colleges"]:
+    user_data = get_user(email)
+    # duplicates are answered from memory; new applications are group-committed (ledger.py)
+    if not ledger.apply(user_data.id, college_id):
         flash("✅ You have already applied to this college.", "info")
         return redirect(url_for("college_detail", college_id=college_id))
+    analytics.applied(college_id)
 
-    user_data["applied_colleges"].append(college_id)
     flash("🎉 Application submitted successfully!", "success")
     return redirect(url_for("college_detail", college_id=college_id))
 
 
+# Applicants of one college for admissions staff, streamed:
+# /college/7/applicants.csv or .ndjson with "Authorization: Bearer $EXPORT_TOKEN"
+@app.route("/college/<int:college_id>/applicants.<fmt>")
+def college_applicants(college_id, fmt):
+    token = os.getenv("EXPORT_TOKEN")
+    if not token or request.headers.get("Authorization") != f"Bearer {token}":
+        return jsonify({"error": "unauthorized"}), 401
+    if fmt not in ("csv", "ndjson"):
+        return jsonify({"error": "format must be csv or ndjson"}), 404
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return Response(
+        stream_with_context(ledger.export(college_id, fmt)),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename=college_{college_id}_applicants.{fmt}"},
+    )
+
+
 # Recommended colleges based on quiz
 @app.route("/recommended_colleges")
 def recommended_colleges():
@@ -499,16 +672,19 @@ def recommended_colleges():
         flash("Please log in first ⚠️", "warning")
         return redirect(url_for("login"))
 
-    user = users[session["user"]]
-    field = user.get("recommended_field")
+    user = get_user(session["user"])
+    field = user.recommended_field
     if not field:
         flash("Please take the quiz first to get recommendations 🎯", "info")
         return redirect(url_for("quiz"))
 
-    filtered = [
-        c for c in colleges_data if field.lower() in c.get("fields", "").lower()
-    ]
-    return render_template("recommended_colleges.html", colleges=filtered, field=field)
+    page = max(int(request.args.get("page", 1)), 1)
+    per_page = min(max(int(request.args.get("per_page", 12)), 1), 60)
+    ranked, total, total_pages = recommender.page(
+        catalog_loader.current, scores=user.quiz_result, field=field, page=page, per_page=per_page
+    )
+    return render_template("recommended_colleges.html", colleges=ranked, field=field,
+                           page=page, total=total, total_pages=total_pages)
 
 # Timeline
 @app.route("/timeline")
@@ -534,8 +710,8 @@ def exam_prep():
         flash("Please log in first ⚠️", "warning")
         return redirect(url_for("login"))
 
-    user = users[session["user"]]
-    field = user.get("recommended_field", "General")
+    user = get_user(session["user"])
+    field = user.recommended_field
 
     # Exam data with date
     exams = {
@@ -602,270 +778,297 @@ def exam_prep():
 
     return render_template("exam_prep.html", exams=exam_list, field=field)
 
-# ===== Parents Dashboard =====
+# ===== Parents pages =====
+# Content lives in data/parents.json; pages are rendered once and served from memory
 @app.route("/parents_dashboard")
 def parents_dashboard():
-    # Dummy data for now, later can connect to DB or JSON
-    courses_10_12 = [
-        {"stream": "Science", "subjects": "Physics, Chemistry, Math/Biology, English"},
-        {"stream": "Commerce", "subjects": "Accountancy, Business Studies, Economics, Math/CS"},
-        {"stream": "Arts", "subjects": "History, Political Science, Sociology, Literature"},
-    ]
-
-    scholarships = [
-        {"name": "National Scholarship", "eligibility": "Above 80% in 12th", "amount": "₹50,000/year"},
-        {"name": "State Merit Scholarship", "eligibility": "J&K Domicile + Above 75%", "amount": "₹25,000/year"},
-    ]
-
-    quotas = [
-        "SC/ST Reservation",
-        "OBC Reservation",
-        "EWS (Economically Weaker Section)",
-        "Defence Personnel Quota",
-        "PWD Quota"
-    ]
-
-    occupations = [
-        "Engineering & Technology",
-        "Medical & Healthcare",
-        "Civil Services",
-        "Law",
-        "Teaching & Research",
-        "Entrepreneurship"
-    ]
-
-    gov_exams = [
-        {"exam": "NEET", "qualification": "12th Science with PCB"},
-        {"exam": "JEE", "qualification": "12th Science with PCM"},
-        {"exam": "UPSC CSE", "qualification": "Graduate"},
-        {"exam": "SSC CGL", "qualification": "Graduate"},
-        {"exam": "Bank PO", "qualification": "Graduate"},
-    ]
-
-    admission_alerts = [
-        {"college": "NIT Srinagar", "last_date": "30 June 2025"},
-        {"college": "AIIMS Jammu", "last_date": "15 July 2025"},
-        {"college": "University of Jammu", "last_date": "10 August 2025"},
-    ]
-
-    financial_planning = [
-        "Start SIP/FD for child’s higher education",
-        "Look for education loans with low interest rates",
-        "Apply for multiple scholarships",
-        "Balance between private & government colleges"
-    ]
+    return parents_pages.render("parents_dashboard.html", "dashboard")
 
-    course_mapping = [
-        {"course": "B.Tech (CSE)", "outcome": "Software Engineer, Data Scientist, AI Specialist"},
-        {"course": "MBBS", "outcome": "Doctor, Surgeon, Specialist"},
-        {"course": "B.Com", "outcome": "CA, Accountant, Banking Professional"},
-        {"course": "BA", "outcome": "Civil Services, Journalism, Teaching"},
-    ]
-
-    return render_template(
-        "parents_dashboard.html",
-        courses=courses_10_12,
-        scholarships=scholarships,
-        quotas=quotas,
-        occupations=occupations,
-        gov_exams=gov_exams,
-        admission_alerts=admission_alerts,
-        financial_planning=financial_planning,
-        course_mapping=course_mapping
-    )
 
 @app.route("/parents/courses")
 def parents_courses():
-    courses_after_10th = [
-        {
-            "stream": "Science",
-            "subjects": "Physics, Chemistry, Math/Biology, English",
-            "opportunities": "Engineering, Medicine, Research, IT, Pure Sciences"
-        },
-        {
-            "stream": "Commerce",
-            "subjects": "Accountancy, Business Studies, Economics, Math/CS",
-            "opportunities": "CA, CS, CMA, Banking, Management, Finance"
-        },
-        {
-            "stream": "Arts/Humanities",
-            "subjects": "History, Political Science, Sociology, Literature, Psychology",
-            "opportunities": "Civil Services, Law, Journalism, Design, Teaching"
-        },
-        {
-            "stream": "Diploma/Polytechnic",
-            "subjects": "Applied Science & Technical Subjects",
-            "opportunities": "Direct entry into engineering fields, technician jobs"
-        },
-        {
-            "stream": "Vocational Courses",
-            "subjects": "Tailoring, Photography, Computer Basics, Tourism, Agriculture",
-            "opportunities": "Skilled jobs, entrepreneurship, early employment"
-        },
-        {
-            "stream": "ITI (Industrial Training)",
-            "subjects": "Electrician, Fitter, Mechanic, Welder, Computer Operator",
-            "opportunities": "Skilled industry jobs, government technical posts"
-        },
-    ]
-
-    courses_after_12th = [
-        {"stream": "Engineering/Technology", "subjects": "PCM", "opportunities": "B.Tech, B.E, AI, Robotics"},
-        {"stream": "Medical", "subjects": "PCB", "opportunities": "MBBS, BDS, BAMS, Nursing, Pharmacy"},
-        {"stream": "Commerce & Management", "subjects": "Accountancy, Business Studies", "opportunities": "B.Com, BBA, MBA"},
-        {"stream": "Arts & Humanities", "subjects": "Humanities", "opportunities": "BA, Law, Journalism, Civil Services"},
-        {"stream": "Law", "subjects": "Any stream", "opportunities": "BA LLB, BBA LLB"},
-        {"stream": "Design & Creative", "subjects": "Any stream", "opportunities": "Fashion, Animation, Fine Arts"},
-        {"stream": "Defense & Civil Services", "subjects": "Any stream", "opportunities": "NDA, UPSC (later)"},
-        {"stream": "Hotel Management & Tourism", "subjects": "Any stream", "opportunities": "BHM, Tourism Industry"},
-        {"stream": "Education & Research", "subjects": "Any stream", "opportunities": "B.Ed, Teaching, Research"},
-    ]
+    return parents_pages.render("parents_courses.html", "courses")
 
-    course_outcomes = [
-        {"course": "B.Tech (CSE)", "outcomes": "Software Engineer, Data Scientist, AI Specialist"},
-        {"course": "MBBS", "outcomes": "Doctor, Surgeon, Specialist"},
-        {"course": "B.Com", "outcomes": "CA, Accountant, Finance Professional"},
-        {"course": "BA (Humanities)", "outcomes": "Civil Services, Journalism, Teaching"},
-        {"course": "LLB", "outcomes": "Lawyer, Judge, Legal Advisor"},
-        {"course": "B.Des", "outcomes": "Fashion Designer, Animator, UI/UX Designer"},
-        {"course": "BHM", "outcomes": "Hotel Manager, Travel Consultant"},
-        {"course": "B.Ed", "outcomes": "Teacher, Lecturer, Researcher"},
-    ]
-
-    return render_template(
-        "parents_courses.html",
-        courses_after_10th=courses_after_10th,
-        courses_after_12th=courses_after_12th,
-        course_outcomes=course_outcomes
-    )
-# parents scholorships
 
 @app.route("/parents/scholarships")
 def parents_scholarships():
-    scholarships = [
-        {
-            "name": "National Merit Scholarship",
-            "eligibility": "Class 10/12 toppers, merit-based",
-            "benefits": "₹10,000 per annum for 2 years",
-            "apply_link": "https://scholarships.gov.in/",
-            "category": "Merit-based Central"
-        },
-        {
-            "name": "Post-Matric Scholarship (SC/ST/OBC)",
-            "eligibility": "Students from reserved categories studying post-matric courses",
-            "benefits": "Tuition fee waiver, hostel allowance, monthly stipend",
-            "apply_link": "https://scholarships.gov.in/",
-            "category": "Need-based Central"
-        },
-        {
-            "name": "AICTE Pragati Scholarship (Girls)",
-            "eligibility": "Girl students in technical/engineering colleges",
-            "benefits": "₹50,000 annually + tuition reimbursement",
-            "apply_link": "https://aicte-pragati-saksham.gov.in/",
-            "category": "Girls Central"
-        },
-        {
-            "name": "INSPIRE Scholarship (Science Stream)",
-            "eligibility": "Top 1% in Class 12, pursuing BSc/Integrated MSc",
-            "benefits": "₹80,000 per year",
-            "apply_link": "https://online-inspire.gov.in/",
-            "category": "Merit-based Central"
-        },
-        {
-            "name": "State Government Scholarships",
-            "eligibility": "Varies by state (check local portal)",
-            "benefits": "Fee reimbursement, stipend, book grants",
-            "apply_link": "https://scholarships.gov.in/",
-            "category": "Need-based State"
-        }
-    ]
-    return render_template("parents_scholarships.html", scholarships=scholarships)
-
-# ------------------------------
-# Quota / Reservation Data
-# ------------------------------
-quotas = [
-    {"name": "Scheduled Caste (SC)", "category": "SC", "reservation": "15%",
-     "eligibility": "Students with valid SC certificate",
-     "notes": "Applicable in Central & State institutions"},
-
-    {"name": "Scheduled Tribe (ST)", "category": "ST", "reservation": "7.5%",
-     "eligibility": "Students with valid ST certificate",
-     "notes": "Relaxation in cut-offs and fees"},
-
-    {"name": "Other Backward Classes (OBC – Non Creamy Layer)", "category": "OBC", "reservation": "27%",
-     "eligibility": "OBC students (Non-Creamy Layer, income < ₹8 lakh)",
-     "notes": "Requires central OBC certificate"},
-
-    {"name": "Economically Weaker Section (EWS)", "category": "EWS", "reservation": "10%",
-     "eligibility": "General category, income < ₹8 lakh",
-     "notes": "Requires valid EWS certificate"},
-
-    {"name": "Persons with Disability (PwD)", "category": "PwD", "reservation": "5%",
-     "eligibility": "Minimum 40% disability with certificate",
-     "notes": "Reservation across all categories"},
-
-    {"name": "Minority Communities", "category": "Minority", "reservation": "Varies",
-     "eligibility": "Muslim, Christian, Sikh, Buddhist, Jain, Parsi",
-     "notes": "Special scholarships and state quotas available"},
-
-    {"name": "State Quotas", "category": "State", "reservation": "Varies by state",
-     "eligibility": "Domicile students",
-     "notes": "Each state has unique reservation policies"},
-]
+    return parents_pages.render("parents_scholarships.html", "scholarships")
+
 
-# ------------------------------
-# Route for Quotas / Reservation
-# ------------------------------
 @app.route("/parents/quotas")
 def parents_quotas():
-    return render_template("parents_quota.html", quotas=quotas)
+    return parents_pages.render("parents_quota.html", "quotas")
 
 
-# ===== Occupation Guidance =====
 @app.route("/parents/occupation")
 def parents_occupation():
-    occupations = [
-        {
-            "name": "Engineering & Technology",
-            "description": "Focuses on innovation, design, and solving technical problems.",
-            "paths": ["B.Tech", "Diploma", "Polytechnic"],
-            "careers": ["Software Engineer", "Mechanical Engineer", "AI Specialist"],
-            "salary": "₹4–12 LPA",
-            "future": "High demand in IT, AI, Robotics, and Renewable Energy",
-            "colleges": ["IITs", "NITs", "IIITs", "Top State Universities"],
-            "tips": "Encourage logical thinking and problem-solving practice."
-        },
-        {
-            "name": "Medical & Healthcare",
-            "description": "Career in medicine, surgery, and allied healthcare services.",
-            "paths": ["MBBS", "BDS", "Nursing", "Pharmacy"],
-            "careers": ["Doctor", "Surgeon", "Dentist", "Pharmacist"],
-            "salary": "₹5–20 LPA",
-            "future": "Evergreen demand in healthcare worldwide",
-            "colleges": ["AIIMS", "JIPMER", "State Medical Colleges"],
-            "tips": "Strong biology background and compassion are key."
-        },
-        {
-            "name": "Civil Services",
-            "description": "Prestigious government jobs via UPSC/State PSC exams.",
-            "paths": ["Any Graduate Degree"],
-            "careers": ["IAS", "IPS", "IFS", "IRS"],
-            "salary": "₹7–18 LPA + perks",
-            "future": "Stable and influential career",
-            "colleges": ["Delhi University", "JNU", "State Universities"],
-            "tips": "Focus on current affairs and communication skills."
-        }
-    ]
-    return render_template("occupation_guidance.html", occupations=occupations)
+    return parents_pages.render("occupation_guidance.html", "occupation")
+
+
+# ---------- Metrics from component stats (read at scrape time) ----------
+@metrics.collector
+def component_stats():
+    yield ("reply_cache_events_total", "counter", "Reply cache hits, misses, coalesced waits, bypasses, stores.",
+           {(("event", k),): v for k, v in reply_cache.stats.items()})
+    yield ("chat_history_total", "counter", "Chat history hot-tier hits, loads, stale reloads, evictions, appends, pages.",
+           {(("event", k),): v for k, v in chat_history.stats.items()})
+    yield ("chat_context_total", "counter", "Prompt builder requests, re-summaries and tokens before/after trimming.",
+           {(("kind", k),): v for k, v in chat_context.stats.items()})
+    yield ("recommendations_total", "counter", "Recommendation cache hits/misses and index builds.",
+           {(("event", k),): v for k, v in recommender.stats.items()})
+    yield ("college_search_total", "counter", "College search queries, full index builds and incremental updates.",
+           {(("event", k),): v for k, v in college_search.stats.items()})
+    yield ("catalog_api_responses_total", "counter", "Catalog API bodies served from cache, built, and 304s.",
+           {(("event", k),): v for k, v in catalog_api.stats.items()})
+    yield ("page_cache_total", "counter", "Parents page cache hits, renders and uncached renders.",
+           {(("event", k),): v for k, v in parents_pages.stats.items()})
+    yield ("analytics_total", "counter", "Analytics events recorded, flushes (and failed ones), counter rows written, snapshots.",
+           {(("event", k),): v for k, v in analytics.stats.items()})
+    yield ("startup_snapshots_total", "counter", "Startup snapshots read back, built, and built but not saved.",
+           {(("event", k),): v for k, v in snapshots.stats.items()})
+    yield ("applications_total", "counter", "College applications recorded, duplicates, commits and conflict retries.",
+           {(("event", k),): v for k, v in ledger.stats.items() if k != "largest_batch"})
+    yield ("applications_largest_batch", "gauge", "Most applications written in one group commit.",
+           {(): ledger.stats["largest_batch"]})
+    yield ("openai_calls_total", "counter", "OpenAI attempts by outcome, retries and calls short-circuited by the breaker.",
+           {(("event", k),): v for k, v in chat_client.stats.items()})
+    breaker = chat_client.breaker
+    yield ("openai_breaker_state", "gauge", "1 for the circuit breaker's current state.",
+           {(("state", state),): int(breaker.state == state) for state in breaker.transitions})
+    yield ("openai_breaker_transitions_total", "counter", "Circuit breaker transitions into each state.",
+           {(("state", state),): n for state, n in breaker.transitions.items()})
+    session_stats = getattr(app.session_interface, "stats", None)
+    if session_stats:
+        labels = (("backend", session_stats["backend"]),)
+        yield ("session_store_calls_total", "counter", "Session store calls by operation.",
+               {labels + (("op", op),): session_stats[op][0] for op in ("get", "set", "delete")})
+        yield ("session_store_seconds_total", "counter", "Time spent in the session store by operation.",
+               {labels + (("op", op),): session_stats[op][1] for op in ("get", "set", "delete")})
+    catalog = catalog_loader.current
+    yield ("catalog_version", "gauge", "Version of the loaded college catalog.", {(): catalog.version})
+    yield ("catalog_colleges", "gauge", "Colleges in the loaded catalog.", {(): len(catalog)})
+
+
 # Logout
 @app.route("/logout")
 def logout():
     session.pop("user", None)
+    regenerate_session()
     flash("Logged out successfully 👋", "info")
     return redirect(url_for("login"))
 
 
+# ---------- Startup ----------
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+_start_lock = threading.Lock()
+_started = False
+
+
+def create_app():
+    """Read the configuration, open the stores and load the data; returns ``app``.
+
+    Runs once per process; later calls return straight away. ``gunicorn
+    'app:create_app()'`` does it as each worker boots, and serving ``app:app``
+    does it on the first request. Nothing is written next to the code: a
+    missing colleges file falls back to ``DEFAULT_COLLEGES``, and data
+    derived from the sources (compiled catalog, search index, compressed
+    assets) is kept under the instance folder, or rebuilt in memory on
+    every boot when that is read-only.
+    """
+    global _started, OPENAI_API_KEY, asset_manifest, avatar_pipeline, catalog_loader, college_search, catalog_api
+    global snapshots, analytics, chat_client, chat_history, intent_engine, chat_context, reply_cache, quiz_scorer, recommender, parents_pages
+    with _start_lock:
+        if _started:
+            return app
+
+        # ---------- Load environment ----------
+        load_dotenv()
+        OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+        app.secret_key = os.getenv("FLASK_SECRET", "supersecretkey")  # change in production
+        # Compiled/pickled startup data, reused by every later boot until its source changes
+        snapshots = Snapshot(os.getenv("SNAPSHOT_DIR", os.path.join(app.instance_path, "snapshot")))
+
+        # Server-side sessions: the cookie only holds an opaque id. SESSION_BACKEND=sqlite (default)
+        # is shared by all workers, memory is a per-process LRU, cookie keeps Flask's signed cookie
+        session_backend = os.getenv("SESSION_BACKEND", "sqlite")
+        if session_backend == "sqlite":
+            os.makedirs(app.instance_path, exist_ok=True)
+            app.session_interface = ServerSessionInterface(
+                SqliteStore(os.getenv("SESSION_PATH", os.path.join(app.instance_path, "sessions.sqlite3")))
+            )
+        elif session_backend == "memory":
+            app.session_interface = ServerSessionInterface(
+                MemoryStore(max_size=int(os.getenv("SESSION_CACHE_SIZE", 10000)))
+            )
+
+        metrics.init_app(app, token=os.getenv("METRICS_TOKEN"))
+
+        # Fingerprinted + gzip/brotli-compressed CSS/JS, served with far-future cache headers
+        asset_manifest = AssetManifest(app.static_folder, snapshot=snapshots)
+        asset_manifest.init_app(app)
+
+        # Avatars are stored under a content hash and resized to thumbnails in the background
+        avatar_pipeline = ImagePipeline(app.static_folder)
+        app.jinja_env.globals["avatar_urls"] = avatar_pipeline.avatar_urls
+
+        # ---------- Database ----------
+        # sqlite by default so it runs locally; point DATABASE_URL at a shared server
+        # (e.g. postgresql://...) to run several gunicorn workers / hosts
+        app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("DATABASE_URL", "sqlite:///pathfinder.db")
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+            "pool_size": int(os.getenv("DB_POOL_SIZE", 5)),
+            "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 10)),
+            "pool_recycle": 1800,
+            "pool_pre_ping": True,
+        }
+        db.init_app(app)
+        with app.app_context():
+            if db.engine.dialect.name == "sqlite":
+                event.listen(db.engine, "connect", _sqlite_pragmas)
+                db.engine.dispose()
+            _create_tables()
+            for column in upgrade_schema():
+                app.logger.warning("Added missing column %s to the database", column)
+            _seed_demo_user()
+
+        # ---------- Colleges ----------
+        # Indexes / facets are built once per version of the colleges file; edits to the
+        # file are picked up in the background and swapped in without a restart.
+        # By default the file is compiled once into memory-mapped columns that every
+        # worker shares (instance/catalog); CATALOG_FORMAT=json keeps a private
+        # in-memory copy per worker instead.
+        colleges_file = os.getenv("COLLEGES_FILE", "colleges.json")
+        if os.getenv("CATALOG_FORMAT", "columnar") == "columnar":
+            catalog_factory = partial(
+                open_catalog, cache_dir=os.getenv("CATALOG_CACHE_DIR", os.path.join(app.instance_path, "catalog"))
+            )
+        else:
+            catalog_factory = load_catalog
+        records = None if os.path.exists(colleges_file) else DEFAULT_COLLEGES
+        catalog_loader = CatalogLoader(colleges_file, records=records, factory=catalog_factory).start()
+
+        # Ranked, typo-tolerant search over names, descriptions and courses; reindexed
+        # (incrementally for admin edits and imports) whenever the catalog changes
+        college_search = CollegeSearch(snapshot=snapshots)
+        catalog_loader.subscribe(college_search.build)
+        app.jinja_env.filters["highlight"] = highlight
+
+        # JSON catalog API for the mobile client (/api/v1/colleges): cursor pages,
+        # field selection, ETag/304 and gzip/brotli bodies
+        catalog_api = CatalogAPI(catalog_loader, college_search)
+        catalog_api.init_app(app)
+
+        # ---------- Chat ----------
+        # Pooled OpenAI calls with connect/read deadlines, jittered retries and a circuit breaker:
+        # while the upstream is down, chat answers from the offline fallback straight away.
+        # The SDK itself is only imported by the first call.
+        chat_client = ChatClient(
+            CHAT_MODEL,
+            connect_timeout=float(os.getenv("OPENAI_CONNECT_TIMEOUT", 3.05)),
+            read_timeout=float(os.getenv("OPENAI_READ_TIMEOUT", 20)),
+            deadline=float(os.getenv("OPENAI_DEADLINE", 45)),
+            max_retries=int(os.getenv("OPENAI_MAX_RETRIES", 2)),
+            pool_size=int(os.getenv("OPENAI_POOL_SIZE", 10)),
+            breaker=CircuitBreaker(
+                failure_threshold=int(os.getenv("OPENAI_BREAKER_FAILURES", 5)),
+                reset_timeout=float(os.getenv("OPENAI_BREAKER_RESET", 30)),
+            ),
+            metrics=metrics,
+            api_key=OPENAI_API_KEY,
+        )
+
+        # Offline replies used when the AI is unavailable (compiled once from data/intents.json)
+        intent_engine = IntentEngine.load(os.path.join(DATA_DIR, "intents.json"))
+
+        # Prompt is kept under this many tokens; older turns are folded into a rolling summary
+        chat_context = ContextBuilder(budget=int(os.getenv("CHAT_CONTEXT_TOKENS", 2000)))
+
+        # Each active student's unsummarised turns (and the last CHAT_PAGE_SIZE messages) stay in
+        # memory for CHAT_HOT_USERS students; the rest is read from the database a page at a time
+        chat_history = ChatHistory(db, recent=int(os.getenv("CHAT_PAGE_SIZE", 30)),
+                                   max_users=int(os.getenv("CHAT_HOT_USERS", 10000)))
+
+        # Cache of AI replies to repeated questions (CHAT_CACHE=sqlite to share it between workers)
+        if os.getenv("CHAT_CACHE", "memory") == "sqlite":
+            cache_backend = SqliteBackend(os.getenv("CHAT_CACHE_PATH", "reply_cache.sqlite3"),
+                                          max_size=int(os.getenv("CHAT_CACHE_SIZE", 10000)))
+        else:
+            cache_backend = MemoryBackend(max_size=int(os.getenv("CHAT_CACHE_SIZE", 1000)))
+        reply_cache = ReplyCache(cache_backend, ttl=int(os.getenv("CHAT_CACHE_TTL", 24 * 3600)))
+
+        # ---------- Quiz and recommendations ----------
+        # Quiz categories and keywords live in data/quiz_rules.json
+        quiz_scorer = QuizScorer.load()
+
+        # Ranked recommendations per quiz profile, reindexed whenever the catalog reloads
+        recommender = Recommender.load(quiz_scorer.categories)
+        catalog_loader.subscribe(recommender.build)
+
+        # Parents pages are rendered once and served from memory
+        parents_pages = PageCache(os.path.join(DATA_DIR, "parents.json"))
+
+        # ---------- Analytics ----------
+        # Counters updated by the write paths and flushed to the database every few seconds;
+        # /admin/analytics for ADMIN_EMAILS, the JSON also with "Authorization: Bearer $ANALYTICS_TOKEN"
+        analytics = Analytics(db, catalog_loader, interval=float(os.getenv("ANALYTICS_INTERVAL", 5)),
+                              snapshot_every=int(os.getenv("ANALYTICS_SNAPSHOT_EVERY", 300)))
+        analytics.init_app(app, token=os.getenv("ANALYTICS_TOKEN"), admins=os.getenv("ADMIN_EMAILS", "").split(","))
+        analytics.start()
+
+        _started = True
+    return app
+
+
+def _create_tables(attempts=3):
+    for attempt in range(attempts):
+        try:
+            db.create_all()
+            return
+        except DBAPIError:
+            # another worker booting at the same time created a table first; look again
+            if attempt == attempts - 1:
+                raise
+
+
+def _seed_demo_user():
+    if User.query.filter_by(email="student@example.com").first():
+        return
+    demo = User(
+        email="student@example.com",
+        password=generate_password_hash("12345"),
+        name="Student User",
+        qualification="12th",
+        school_background="Science Stream",
+        marks="85%",
+        subjects="Maths, Physics, Computer Science",
+        interests="AI, Web Development, Data Science",
+        skills="Python, HTML, CSS",
+        career_goal="Software Engineer",
+        college="Government College of Engineering",
+        joined="2025",
+        guidelines="Focus on AI & Data Science for future scope.",
+    )
+    demo.messages.append(ChatMessage(role="assistant", content=WELCOME_MESSAGE))
+    db.session.add(demo)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # another worker seeded it first
+        db.session.rollback()
+
+
+def _start_on_first_request(wsgi_app):
+    # lets ``gunicorn app:app`` and the test client work without calling create_app() first
+    def wsgi(environ, start_response):
+        if not _started:
+            create_app()
+        return wsgi_app(environ, start_response)
+    return wsgi
+
+
+app.wsgi_app = _start_on_first_request(app.wsgi_app)
+
+
 # Run server
 if __name__ == "__main__":
-    app.run(debug=True, host="127.0.0.1", port=int(os.getenv("PORT", 5000)))
+    create_app().run(debug=True, host="127.0.0.1", port=int(os.getenv("PORT", 5000)))
@@ -0,0 +1,152 @@
+"""Fingerprinted, precompressed static assets.
+
+At startup every ``.css`` / ``.js`` file under ``static`` (uploads excluded) is
+read once, given a content-hashed name (``style.css`` -> ``style.1a2b3c4d5e.css``)
+and compressed with gzip and, when the ``brotli`` package is installed, brotli.
+``url_for('static', filename='style.css')`` resolves to the hashed name, and
+hashed names are served from memory with a strong ETag and a one-year
+``immutable`` Cache-Control: a changed file gets a new URL, so browsers never
+need to revalidate. Anything not in the manifest falls through to Flask's
+normal static handling. Given a ``snapshot.Snapshot``, the compressed
+manifest is saved once and read back by later boots until a file changes.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+
+from flask import Response, request
+
+from catalog import file_key
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+FINGERPRINT_EXTENSIONS = (".css", ".js")
+IMMUTABLE = "public, max-age=31536000, immutable"
+MIN_COMPRESS_BYTES = 256
+# per-request bodies can't afford the build-time levels; these keep most of the gain at a fraction of the CPU
+DYNAMIC_GZIP_LEVEL = 6
+DYNAMIC_BROTLI_QUALITY = 5
+
+
+class Asset:
+    __slots__ = ("name", "mimetype", "etag", "variants")
+
+    def __init__(self, name, data):
+        self.name = name
+        self.mimetype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        self.etag = hashlib.sha256(data).hexdigest()[:20]
+        # encoding -> body; "identity" is always present
+        self.variants = {"identity": data}
+        if len(data) >= MIN_COMPRESS_BYTES:
+            self.variants["gzip"] = gzip.compress(data, compresslevel=9, mtime=0)
+            if brotli is not None:
+                self.variants["br"] = brotli.compress(data, quality=11)
+
+    def pick(self, accept_encodings):
+        """Smallest variant the client accepts -> ``(encoding, body)``."""
+        best = ("identity", self.variants["identity"])
+        for encoding, body in self.variants.items():
+            if encoding != "identity" and accept_encodings[encoding] > 0 and len(body) < len(best[1]):
+                best = (encoding, body)
+        return best
+
+    def etag_for(self, encoding):
+        # strong ETags must differ between encodings of the same file
+        return self.etag if encoding == "identity" else f"{self.etag}-{encoding}"
+
+
+class AssetManifest:
+    def __init__(self, static_folder, skip_dirs=("uploads",), snapshot=None):
+        self.static_folder = static_folder
+        self.skip_dirs = skip_dirs
+        self.snapshot = snapshot
+        self.urls = {}    # "style.css" -> "style.<hash>.css"
+        self.assets = {}  # "style.<hash>.css" -> Asset
+        self.build()
+
+    def _files(self):
+        found = []
+        for root, dirs, files in os.walk(self.static_folder):
+            dirs[:] = [d for d in dirs if os.path.relpath(os.path.join(root, d), self.static_folder) not in self.skip_dirs]
+            for fname in files:
+                if fname.endswith(FINGERPRINT_EXTENSIONS):
+                    found.append(os.path.join(root, fname))
+        return sorted(found)
+
+    def build(self):
+        paths = self._files()
+        if self.snapshot is None:
+            self.urls, self.assets = self._compile(paths)
+        else:
+            key = (brotli is not None, [(path, file_key(path)) for path in paths])
+            self.urls, self.assets = self.snapshot.load("assets", key, lambda: self._compile(paths))
+
+    def _compile(self, paths):
+        urls, assets = {}, {}
+        for path in paths:
+            logical = os.path.relpath(path, self.static_folder).replace(os.sep, "/")
+            with open(path, "rb") as f:
+                data = f.read()
+            stem, ext = os.path.splitext(logical)
+            hashed = f"{stem}.{hashlib.sha256(data).hexdigest()[:10]}{ext}"
+            urls[logical] = hashed
+            assets[hashed] = Asset(hashed, data)
+        return urls, assets
+
+    def init_app(self, app):
+        original_static = app.view_functions["static"]
+
+        @app.url_defaults
+        def fingerprint_static_urls(endpoint, values):
+            if endpoint == "static" and values.get("filename") in self.urls:
+                values["filename"] = self.urls[values["filename"]]
+
+        def static(filename):
+            asset = self.assets.get(filename)
+            if asset is None:
+                return original_static(filename=filename)
+            return self.respond(asset)
+
+        app.view_functions["static"] = static
+        app.extensions["asset_manifest"] = self
+
+    def respond(self, asset):
+        return send_asset(asset, IMMUTABLE)
+
+
+def send_asset(asset, cache_control):
+    """Response for ``asset`` in the best encoding the client accepts, or a 304."""
+    encoding, body = asset.pick(request.accept_encodings)
+    etag = asset.etag_for(encoding)
+    if etag in request.if_none_match:
+        resp = Response(status=304)
+    else:
+        resp = Response(body, mimetype=asset.mimetype)
+        if encoding != "identity":
+            resp.headers["Content-Encoding"] = encoding
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = cache_control
+    resp.vary.add("Accept-Encoding")
+    return resp
+
+
+def negotiate(accept_encodings):
+    """Encoding for a dynamic response: brotli, else gzip, else identity."""
+    if brotli is not None and accept_encodings["br"] > 0:
+        return "br"
+    if accept_encodings["gzip"] > 0:
+        return "gzip"
+    return "identity"
+
+
+def compress(data, encoding):
+    """``data`` in ``encoding`` (from ``negotiate``), with the fast dynamic settings."""
+    if encoding == "br":
+        return brotli.compress(data, quality=DYNAMIC_BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=DYNAMIC_GZIP_LEVEL, mtime=0)
+    return data
@@ -0,0 +1,111 @@
+"""Admin analytics: walking every user vs the incremental counters.
+
+    python bench/bench_analytics.py --users 20000 --applications 5 --requests 500
+
+Seeds ``--users`` students (quiz results, a few chat messages and
+``--applications`` applications each) and times:
+
+* the walk the numbers used to need: every user with their applications
+  and chat messages loaded, counted in Python;
+* the one-time ``backfill`` that seeds the counters with GROUP BY queries;
+* ``/admin/analytics.json`` through the Flask test client;
+* what the write paths pay: one ``applied``/``chatted`` call, and one flush
+  of ``--events`` of them into the counter table.
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+TMP = tempfile.mkdtemp(prefix="pf-analytics-")
+DB_URL = f"sqlite:///{os.path.join(TMP, 'analytics.db')}"
+os.environ.update(DATABASE_URL=DB_URL, SESSION_BACKEND="memory", ANALYTICS_TOKEN="bench",
+                  CATALOG_CACHE_DIR=os.path.join(TMP, "catalog"), SNAPSHOT_DIR=os.path.join(TMP, "snapshot"))
+
+from sqlalchemy import delete, insert, select  # noqa: E402
+
+from seed_users import seed  # noqa: E402
+from module import Application, ChatDay, StatCounter, User, db  # noqa: E402
+
+
+def walk():
+    """Every number on the analytics page, computed from the users themselves."""
+    per_college, fields = Counter(), Counter()
+    active = set()
+    since = datetime.utcnow() - timedelta(days=1)
+    for user in User.query.all():
+        per_college.update(a.college_id for a in user.applications)
+        if user.recommended_field:
+            fields[user.recommended_field] += 1
+        if any(m.role == "user" and m.created_at >= since for m in user.messages):
+            active.add(user.id)
+    return per_college, fields, len(active)
+
+
+def timed(fn, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument("--applications", type=int, default=5)
+    parser.add_argument("--messages", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--events", type=int, default=2000)
+    args = parser.parse_args()
+
+    seed(DB_URL, args.users, args.messages)
+    import app as webapp  # noqa: E402
+
+    app = webapp.create_app()
+    analytics = webapp.analytics
+    rnd = random.Random(5)
+    with app.app_context():
+        with db.engine.begin() as conn:
+            user_ids = conn.execute(select(User.id)).scalars().all()
+            rows = [{"user_id": u, "college_id": c} for u in user_ids for c in rnd.sample(range(1, 500), args.applications)]
+            conn.execute(insert(Application), rows)
+        (per_college, _, _), walk_s = timed(walk)
+        db.session.remove()
+        print(f"{len(user_ids):,} users, {len(rows):,} applications\n")
+        print(f"walk every user                {walk_s * 1000:10.1f} ms  ({sum(per_college.values()):,} applications counted)")
+
+        # counters were seeded before the applications existed; seed them again
+        with db.engine.begin() as conn:
+            conn.execute(delete(StatCounter))
+            conn.execute(delete(ChatDay))
+        _, backfill_s = timed(analytics.backfill)
+        analytics.flush()
+    print(f"backfill (once per database)   {backfill_s * 1000:10.1f} ms")
+
+    client = app.test_client()
+    headers = {"Authorization": "Bearer bench"}
+    resp, request_s = timed(lambda: client.get("/admin/analytics.json", headers=headers), args.requests)
+    print(f"GET /admin/analytics.json      {request_s * 1000:10.3f} ms  ({len(resp.get_data()):,} bytes, "
+          f"{resp.json['totals']['applications']:,} applications)")
+
+    _, hook_s = timed(lambda: analytics.applied(rnd.randint(1, 500)), args.events)
+    for user_id in rnd.sample(user_ids, min(args.events, len(user_ids))):
+        analytics.chatted(user_id)
+    print(f"applied() on the write path    {hook_s * 1e6:10.2f} us")
+    _, flush_s = timed(analytics.flush)
+    print(f"flush of {args.events:,} + {min(args.events, len(user_ids)):,} events    {flush_s * 1000:10.1f} ms  "
+          f"(every {analytics.interval:g}s per worker)")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    finally:
+        shutil.rmtree(TMP, ignore_errors=True)
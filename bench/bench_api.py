@@ -0,0 +1,118 @@
+"""Bytes and server time per catalog interaction: the HTML listing vs the JSON API.
+
+    python bench/bench_api.py --colleges 100000 --interactions 300
+
+Generates a catalog and loads the app on it, then replays ``--interactions``
+filter changes (a search term and/or district, first and second page) through
+the Flask test client as ``/colleges`` HTML (what the mobile client scrapes)
+and as ``/api/v1/colleges`` with ``fields=id,name,district,type``: uncompressed,
+brotli, the same requests again (answered from the encoded-body cache), and a
+revalidation with the ETag from the first response (304).
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import brotli  # noqa: E402
+
+from gen_catalog import DISTRICTS, write as write_catalog  # noqa: E402
+
+TMP = tempfile.mkdtemp(prefix="pf-api-")
+QUERY_FIELDS = "id,name,district,type"
+SEARCHES = ["", "", "college", "srinagar", "enginering", "medical", "institute of technology", "hostel"]
+
+
+def decoded(resp):
+    body = resp.get_data()
+    encoding = resp.headers.get("Content-Encoding")
+    if encoding == "br":
+        body = brotli.decompress(body)
+    elif encoding == "gzip":
+        body = gzip.decompress(body)
+    return json.loads(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--colleges", type=int, default=100_000)
+    parser.add_argument("--interactions", type=int, default=300)
+    args = parser.parse_args()
+
+    path = write_catalog(os.path.join(TMP, "colleges.json"), args.colleges, seed=1, coords=True)
+    os.environ.update(COLLEGES_FILE=path, DATABASE_URL=f"sqlite:///{os.path.join(TMP, 'api.db')}",
+                      SESSION_BACKEND="memory", CATALOG_CACHE_DIR=os.path.join(TMP, "catalog"),
+                      SNAPSHOT_DIR=os.path.join(TMP, "snapshot"))
+    from app import create_app  # noqa: E402
+
+    app = create_app()  # reads the environment
+
+    client = app.test_client()
+    rnd = random.Random(3)
+    steps = []
+    for _ in range(args.interactions):
+        search = rnd.choice(SEARCHES)
+        district = rnd.choice(list(DISTRICTS)) if rnd.random() < 0.4 else ""
+        steps.append((search, district))
+
+    def html(search, district, headers):
+        out = []
+        for page in (1, 2):
+            out.append(client.get("/colleges", query_string={"search": search, "district": district, "page": page},
+                                  headers=headers))
+        return out
+
+    def api(search, district, headers):
+        query = {"search": search, "district": district, "fields": QUERY_FIELDS, "limit": 6}
+        first = client.get("/api/v1/colleges", query_string=query, headers=headers)
+        cursor = decoded(first)["next_cursor"]
+        if cursor is None:
+            return [first]
+        return [first, client.get("/api/v1/colleges", query_string=dict(query, cursor=cursor), headers=headers)]
+
+    def run(label, fn, headers):
+        size = count = 0
+        start = time.perf_counter()
+        for search, district in steps:
+            for resp in fn(search, district, headers):
+                size += len(resp.get_data())
+                count += 1
+        elapsed = time.perf_counter() - start
+        print(f"{label:<34} {count:>6} {size / count / 1024:9.2f} KB {elapsed / count * 1000:9.2f} ms")
+
+    print(f"{args.colleges:,} colleges, {args.interactions} interactions\n")
+    print(f"{'':<34} {'reqs':>6} {'bytes/req':>12} {'time/req':>12}")
+    run("HTML /colleges, identity", html, {})
+    run("HTML /colleges, accepts br", html, {"Accept-Encoding": "br"})
+    run("API, identity", api, {})
+    run("API, br (cold)", api, {"Accept-Encoding": "br"})
+    run("API, br (cached body)", api, {"Accept-Encoding": "br"})
+
+    query_etags = {}
+    for search, district in steps:
+        query = {"search": search, "district": district, "fields": QUERY_FIELDS, "limit": 6}
+        resp = client.get("/api/v1/colleges", query_string=query, headers={"Accept-Encoding": "br"})
+        query_etags[(search, district)] = resp.headers["ETag"]
+
+    def revalidate(search, district, headers):
+        query = {"search": search, "district": district, "fields": QUERY_FIELDS, "limit": 6}
+        resp = client.get("/api/v1/colleges", query_string=query,
+                          headers=dict(headers, **{"If-None-Match": query_etags[(search, district)]}))
+        assert resp.status_code == 304
+        return [resp]
+
+    run("API, br, If-None-Match (304)", revalidate, {"Accept-Encoding": "br"})
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    finally:
+        shutil.rmtree(TMP, ignore_errors=True)
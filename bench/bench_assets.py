@@ -0,0 +1,85 @@
+"""Static asset transfer: plain static files vs fingerprinted, precompressed ones.
+
+    python bench/bench_assets.py --page /login --visits 5
+
+Loads a page through the Flask test client and every CSS/JS file it links,
+first on a cold cache and then on ``--visits`` repeat visits. Without the
+manifest each repeat visit revalidates every asset (a 304 round trip); with
+it the hashed URLs are ``immutable`` and cost no request at all.
+"""
+import argparse
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app import create_app  # noqa: E402
+
+app = create_app()
+
+LINK_RE = re.compile(r'(?:href|src)="(/static/[^"]+\.(?:css|js))"')
+
+
+def fetch(client, path, headers):
+    resp = client.get(path, headers=headers)
+    return resp, len(resp.get_data())
+
+
+def visit(client, page, encoding, cache):
+    """One page view; ``cache`` maps asset URL -> (etag, immutable). Returns (requests, bytes)."""
+    headers = {"Accept-Encoding": encoding} if encoding else {}
+    resp, total = fetch(client, page, headers)
+    requests = 1
+    for url in LINK_RE.findall(resp.get_data(as_text=True)):
+        cached = cache.get(url)
+        if cached and cached[1]:
+            continue  # immutable: served from the browser cache
+        h = dict(headers)
+        if cached and cached[0]:
+            h["If-None-Match"] = f'"{cached[0]}"'
+        asset, size = fetch(client, url, h)
+        requests += 1
+        total += size
+        cache[url] = (asset.get_etag()[0], "immutable" in asset.headers.get("Cache-Control", ""))
+        asset.close()
+    return requests, total
+
+
+def run(label, page, encoding, visits, use_manifest):
+    manifest = app.extensions["asset_manifest"]
+    saved = manifest.urls
+    if not use_manifest:
+        manifest.urls = {}  # url_for falls back to the plain filenames
+    try:
+        with app.test_client() as client:
+            with client.session_transaction() as sess:
+                sess["user"] = "student@example.com"
+            cache = {}
+            cold = visit(client, page, encoding, cache)
+            warm = [visit(client, page, encoding, cache) for _ in range(visits)]
+    finally:
+        manifest.urls = saved
+    warm_req = sum(r for r, _ in warm) / visits
+    warm_bytes = sum(b for _, b in warm) / visits
+    print(f"{label:<28} cold {cold[0]:2d} req {cold[1]:8,d} B | repeat {warm_req:4.1f} req {warm_bytes:10,.0f} B")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--page", default="/login")
+    parser.add_argument("--visits", type=int, default=5)
+    args = parser.parse_args()
+
+    manifest = app.extensions["asset_manifest"]
+    for logical, hashed in sorted(manifest.urls.items()):
+        sizes = ", ".join(f"{enc} {len(body):,d} B" for enc, body in manifest.assets[hashed].variants.items())
+        print(f"{logical} -> {hashed}: {sizes}")
+    print()
+    run("plain static", args.page, "", args.visits, use_manifest=False)
+    run("fingerprinted, gzip", args.page, "gzip", args.visits, use_manifest=True)
+    run("fingerprinted, br+gzip", args.page, "br, gzip", args.visits, use_manifest=True)
+
+
+if __name__ == "__main__":
+    main()
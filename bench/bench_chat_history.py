@@ -0,0 +1,169 @@
+"""Chat history: loading whole conversations vs the hot tail and paged history.
+
+    python bench/bench_chat_history.py --users 10000 --messages 1000 --sample 200
+
+Seeds ``--users`` students with ``--messages`` chat messages each, then for
+``--sample`` of them (with the app's default context budget) compares:
+
+* the chat page: loading the whole ``messages`` relationship (what the view
+  did) and the HTML it takes to show all of it, vs ``/chat`` with the last
+  ``CHAT_PAGE_SIZE`` messages and one ``/chat/history`` page;
+* a chat turn without the model: append the question, build the prompt,
+  append the reply, from the relationship vs from ``ChatHistory``;
+* memory: whole conversations kept as dicts per student vs the hot entries
+  (measured with tracemalloc over the sample and scaled to ``--users``; the
+  hot tier never holds more than ``CHAT_HOT_USERS`` students).
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+TMP = tempfile.mkdtemp(prefix="pf-history-")
+DB_URL = f"sqlite:///{os.path.join(TMP, 'history.db')}"
+os.environ.update(DATABASE_URL=DB_URL, SESSION_BACKEND="memory", CATALOG_CACHE_DIR=os.path.join(TMP, "catalog"),
+                  SNAPSHOT_DIR=os.path.join(TMP, "snapshot"))
+os.environ.pop("OPENAI_API_KEY", None)
+
+from flask import render_template  # noqa: E402
+
+from chat_context import ContextBuilder  # noqa: E402
+from module import ChatMessage, User, db  # noqa: E402
+from seed_users import email, seed  # noqa: E402
+
+SYSTEM_PROMPT = "You are a helpful AI career counselor for students in Jammu & Kashmir."
+QUESTION = "Which colleges in Srinagar offer engineering?"
+
+
+def whole_conversation(user):
+    """The user's messages the way the views used to read them: the whole relationship."""
+    return [{"role": m.role, "content": m.content} for m in user.messages]
+
+
+def per_user(seconds, n):
+    return f"{seconds / n * 1000:8.2f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--sample", type=int, default=200)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    seed(DB_URL, args.users, args.messages)
+    print(f"seeded {args.users:,} users x {args.messages:,} messages in {time.perf_counter() - start:.0f}s\n")
+
+    import app as webapp  # noqa: E402
+
+    app = webapp.create_app()
+    history = webapp.chat_history
+    sample = random.Random(2).sample(range(args.users), min(args.sample, args.users))
+    with app.app_context():
+        ids = {u.email: u.id for u in User.query.filter(User.email.in_([email(i) for i in sample]))}
+        user_ids = [ids[email(i)] for i in sample]
+        db.session.remove()
+
+    # ---------- chat page ----------
+    with app.test_request_context():
+        full_bytes = 0
+        start = time.perf_counter()
+        for user_id in user_ids:
+            user = db.session.get(User, user_id)
+            full_bytes += len(render_template("chat.html", chat_history=whole_conversation(user), has_more=False))
+            db.session.expunge_all()
+        full_s = time.perf_counter() - start
+
+    client = app.test_client()
+    page_bytes = older_bytes = 0
+    page_s = older_s = 0.0
+    for i, user_id in zip(sample, user_ids):
+        with client.session_transaction() as sess:
+            sess["user"] = email(i)
+        start = time.perf_counter()
+        resp = client.get("/chat")
+        page_s += time.perf_counter() - start
+        page_bytes += len(resp.get_data())
+        start = time.perf_counter()
+        resp = client.get("/chat/history", query_string={"limit": 50})
+        older_s += time.perf_counter() - start
+        older_bytes += len(resp.get_data())
+    n = len(user_ids)
+    print(f"{'chat page, per student':<44}{'time':>11}{'bytes':>12}")
+    print(f"{'whole conversation loaded and rendered':<44}{per_user(full_s, n)}{full_bytes // n:>12,}")
+    print(f"{'/chat, last %d messages' % history.recent:<44}{per_user(page_s, n)}{page_bytes // n:>12,}")
+    print(f"{'/chat/history, one page of 50':<44}{per_user(older_s, n)}{older_bytes // n:>12,}")
+
+    # ---------- a chat turn ----------
+    builder = ContextBuilder(budget=int(os.getenv("CHAT_CONTEXT_TOKENS", 2000)))
+    with app.app_context():
+        start = time.perf_counter()
+        for user_id in user_ids:
+            user = db.session.get(User, user_id)
+            user.messages.append(ChatMessage(role="user", content=QUESTION))
+            db.session.commit()
+            builder.build(SYSTEM_PROMPT, whole_conversation(user), (user.chat_summary_upto, user.chat_summary))
+            user.messages.append(ChatMessage(role="assistant", content="…"))
+            db.session.commit()
+            db.session.expunge_all()
+        relationship_s = time.perf_counter() - start
+
+        history.stats.update(hits=0, loads=0)
+        passes = []
+        for _ in range(2):  # the first pass loads the hot entries, the second hits them
+            start = time.perf_counter()
+            for user_id in user_ids:
+                user = db.session.get(User, user_id)
+                history.append(user_id, "user", QUESTION)
+                offset, tail = history.tail(user_id, user.chat_summary_upto)
+                _, info = builder.build(SYSTEM_PROMPT, [{"role": m["role"], "content": m["content"]} for m in tail],
+                                        (user.chat_summary_upto, user.chat_summary), offset=offset)
+                if info["resummarized"]:
+                    user.chat_summary_upto, user.chat_summary = info["summary"]
+                history.append(user_id, "assistant", "…")
+                db.session.expunge_all()
+            passes.append(time.perf_counter() - start)
+    print(f"\n{'chat turn without the model, per student':<44}{'time':>11}")
+    print(f"{'whole relationship':<44}{per_user(relationship_s, n)}")
+    print(f"{'ChatHistory, cold':<44}{per_user(passes[0], n)}")
+    print(f"{'ChatHistory, hot':<44}{per_user(passes[1], n)}   {history.stats}")
+
+    # ---------- memory ----------
+    with app.app_context():
+        tracemalloc.start()
+        conversations = {}
+        for user_id in user_ids:
+            conversations[user_id] = whole_conversation(db.session.get(User, user_id))
+            db.session.expunge_all()
+        whole = tracemalloc.get_traced_memory()[0]
+        del conversations
+        tracemalloc.stop()
+
+        history._hot.clear()
+        tracemalloc.start()
+        for user_id in user_ids:
+            user = db.session.get(User, user_id)
+            history.tail(user_id, user.chat_summary_upto)
+            db.session.expunge_all()
+        hot = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+    scale = args.users / n
+    held = min(args.users, history.max_users) / n
+    print(f"\n{'memory':<44}{'per student':>14}{'all students':>14}")
+    print(f"{'whole conversations as dicts':<44}{whole / n / 1024:11.1f} KB{whole * scale / 2 ** 20:11.1f} MB")
+    print(f"{'hot tier (%s students max)' % f'{history.max_users:,}':<44}{hot / n / 1024:11.1f} KB"
+          f"{hot * held / 2 ** 20:11.1f} MB")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    finally:
+        shutil.rmtree(TMP, ignore_errors=True)
@@ -0,0 +1,122 @@
+"""Per-worker memory: a parsed JSON catalog in every worker vs one memory-mapped columnar catalog.
+
+    python bench/bench_columnar.py --colleges 100000 --workers 4
+
+Generates a catalog, then starts ``--workers`` processes per mode that each
+load it the way an app worker does, run a few listing / detail / nearest
+queries, and report their RSS and PSS (``/proc/self/smaps_rollup``: shared
+pages are split between the processes mapping them) while all of them are
+alive. ``json`` is the old startup (``json.load`` kept as ``colleges_data``
+plus an in-memory ``Catalog``); ``columnar`` maps the compiled catalog.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from columnar import open_catalog  # noqa: E402
+from gen_catalog import write as write_catalog  # noqa: E402
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+WORKER = r"""
+import json, os, random, sys, time
+sys.path.insert(0, sys.argv[1])
+
+def memory():
+    out = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in ("Rss", "Pss"):
+                out[key.lower()] = int(rest.split()[0]) / 1024
+    return out
+
+from catalog import CatalogLoader
+from columnar import open_catalog
+
+mode, path, cache = sys.argv[2], sys.argv[3], sys.argv[4]
+base = memory()
+start = time.perf_counter()
+if mode == "json":
+    with open(path, "r", encoding="utf-8") as f:
+        colleges_data = json.load(f)
+    loader = CatalogLoader(path, records=colleges_data)
+else:
+    loader = CatalogLoader(path, factory=lambda p, v: open_catalog(p, v, cache_dir=cache))
+load = time.perf_counter() - start
+
+catalog = loader.current
+rnd = random.Random(os.getpid())
+start = time.perf_counter()
+for _ in range(200):
+    catalog.page(page=rnd.randint(1, 5), per_page=6, search=rnd.choice(["", "college", "tech"]))
+    college = catalog.get(rnd.randint(1, len(catalog)))
+    if college:
+        catalog.nearby(college, k=3)
+queries = (time.perf_counter() - start) / 200
+print(json.dumps(dict(memory(), base=base, load=load, query=queries)), flush=True)
+sys.stdin.readline()  # stay alive until every worker has reported
+"""
+
+
+def run(mode, path, cache, workers):
+    procs = [
+        subprocess.Popen([sys.executable, "-c", WORKER, ROOT, mode, path, cache],
+                         stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        for _ in range(workers)
+    ]
+    reports = [json.loads(p.stdout.readline()) for p in procs]
+    # PSS of earlier reporters shrinks as later workers map the same pages; re-read with all alive
+    final = []
+    for p, report in zip(procs, reports):
+        with open(f"/proc/{p.pid}/smaps_rollup") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in ("Rss", "Pss"):
+                    report[key.lower()] = int(rest.split()[0]) / 1024
+        final.append(report)
+    for p in procs:
+        p.communicate("\n")
+    return final
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--colleges", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--shape", choices=["colleges", "jk"], default="colleges")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="pf-columnar-") as tmp:
+        path = write_catalog(os.path.join(tmp, "colleges.json"), args.colleges, shape=args.shape,
+                             seed=args.seed, coords=True)
+        cache = os.path.join(tmp, "catalog")
+        print(f"{args.colleges:,} colleges, {os.path.getsize(path) / 2 ** 20:.1f} MB of JSON, {args.workers} workers")
+
+        start = time.perf_counter()
+        open_catalog(path, cache_dir=cache)
+        compiled = next(os.path.join(cache, entry) for entry in os.listdir(cache) if not entry.startswith("."))
+        size = sum(os.path.getsize(os.path.join(compiled, name)) for name in os.listdir(compiled))
+        print(f"compile once: {time.perf_counter() - start:.2f}s, {size / 2 ** 20:.1f} MB on disk\n")
+
+        totals = {}
+        for mode in ("json", "columnar"):
+            reports = run(mode, path, cache, args.workers)
+            for i, r in enumerate(reports):
+                print(f"{mode:<9} worker {i}: rss {r['rss']:7.1f} MB (catalog +{r['rss'] - r['base']['rss']:6.1f})"
+                      f"  pss {r['pss']:7.1f} MB  load {r['load'] * 1000:7.1f} ms  query {r['query'] * 1e6:7.0f} us")
+            totals[mode] = (sum(r["rss"] for r in reports), sum(r["pss"] for r in reports))
+            print()
+        for mode, (rss, pss) in totals.items():
+            print(f"{mode:<9} all workers: rss {rss:8.1f} MB  pss {pss:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
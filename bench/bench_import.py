@@ -0,0 +1,67 @@
+"""Bulk import memory: ``json.load`` of the whole upload vs the streaming importer.
+
+    python bench/bench_import.py --records 1000000        # ~500 MB JSON array
+
+Writes a synthetic catalog (``gen_catalog.py``) as a JSON array and as
+NDJSON, then imports each in a fresh subprocess and reports wall time and
+peak RSS (``ru_maxrss``), next to a plain ``json.load`` of the same file.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+
+from gen_catalog import generate, write  # noqa: E402
+
+CHILD = r"""
+import json, resource, sys, time
+sys.path.insert(0, sys.argv[1])
+from college_import import import_colleges
+how, src, dest = sys.argv[2:5]
+start = time.perf_counter()
+with open(src, "rb") as f:
+    if how == "json.load":
+        count = len(json.load(f))
+    else:
+        count, _ = import_colleges(f, dest)
+elapsed = time.perf_counter() - start
+print(json.dumps({"count": count, "seconds": elapsed, "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+"""
+
+
+def measure(how, src, dest):
+    out = subprocess.run([sys.executable, "-c", CHILD, os.path.dirname(BENCH_DIR), how, src, dest],
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=200_000)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="pf-import-")
+    try:
+        array = write(os.path.join(tmp, "upload.json"), args.records)
+        ndjson = os.path.join(tmp, "upload.ndjson")
+        with open(ndjson, "w", encoding="utf-8") as f:
+            for record in generate(args.records):
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        print(f"{args.records:,} records, {os.path.getsize(array) / 1e6:.0f} MB")
+        for i, (label, how, src) in enumerate((("json.load (array)", "json.load", array),
+                                               ("streaming import (array)", "import", array),
+                                               ("streaming import (NDJSON)", "import", ndjson))):
+            r = measure(how, src, os.path.join(tmp, f"catalog{i}.json"))
+            print(f"{label:<28} {r['seconds']:7.2f}s  peak RSS {r['peak_rss_mb']:8.1f} MB")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
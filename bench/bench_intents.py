@@ -0,0 +1,72 @@
+"""Offline chat fallback: accuracy and throughput, compiled engine vs the old loop.
+
+    python bench/bench_intents.py
+
+Scores both matchers on bench/intents_labelled.json (``intent: null`` means
+"no specific intent", i.e. the rotating general reply) and times them on the
+same messages.
+"""
+import json
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+
+from intents import IntentEngine  # noqa: E402
+
+# what chat_api() did before: rebuilt per request, first substring hit wins
+LEGACY_NAMES = ["medical", "engineering", "civil_services", "law", "commerce",
+                "arts_design", "it_cs", "govt_exams", "soft_skills", "scholarships"]
+
+
+def legacy_match(user_message):
+    keyword_map = {
+        ("neet", "medical", "biology", "mbbs"): 0,
+        ("jee", "engineering", "physics", "math"): 1,
+        ("upsc", "civil services", "ias", "ias/ips"): 2,
+        ("clat", "law", "llb"): 3,
+        ("ca", "commerce", "cs", "account"): 4,
+        ("arts", "design", "painting", "fine"): 5,
+        ("python", "coding", "data science", "machine", "ai", "web"): 6,
+        ("jkpsc", "state", "psc", "government exam"): 7,
+        ("scholarship", "pmsss", "financial", "grant"): 9,
+    }
+    user_low = user_message.lower()
+    for keys, idx in keyword_map.items():
+        for k in keys:
+            if k in user_low:
+                return LEGACY_NAMES[idx]
+    return None
+
+
+def throughput(fn, messages, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for m in messages:
+            fn(m)
+    return rounds * len(messages) / (time.perf_counter() - start)
+
+
+def main():
+    with open(os.path.join(HERE, "intents_labelled.json"), encoding="utf-8") as f:
+        labelled = json.load(f)
+    engine = IntentEngine.load(os.path.join(HERE, "..", "data", "intents.json"))
+
+    def engine_match(message):
+        idx = engine.match(message)
+        return None if idx is None else engine.intents[idx]["name"]
+
+    messages = [row["message"] for row in labelled]
+    for name, fn in (("legacy loop", legacy_match), ("intent engine", engine_match)):
+        wrong = [(row["message"], row["intent"], fn(row["message"])) for row in labelled if fn(row["message"]) != row["intent"]]
+        accuracy = 1 - len(wrong) / len(labelled)
+        rate = throughput(fn, messages, 200)
+        print(f"{name:14} accuracy {accuracy:6.1%} ({len(labelled) - len(wrong)}/{len(labelled)})   {rate:10,.0f} msgs/s")
+        for message, want, got in wrong:
+            print(f"    {message!r}: expected {want}, got {got}")
+
+
+if __name__ == "__main__":
+    main()
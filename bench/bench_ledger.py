@@ -0,0 +1,124 @@
+"""Application writes and exports: a commit per click vs the group-committed ledger.
+
+    python bench/bench_ledger.py --threads 16 --applications 4000 --applicants 100000
+
+``--threads`` threads apply ``--applications`` times in total (a quarter of
+them repeat clicks) against a fresh sqlite database, first the old way (a
+duplicate query, then one insert + commit per application) and then through
+``ApplicationLedger``. ``--synchronous FULL`` makes sqlite fsync every commit,
+as a server database flushing its log would. Then one college gets
+``--applicants`` applications and is exported with ``ledger.export`` while
+tracemalloc records the peak, next to loading the same rows with ``.all()``.
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+TMP = tempfile.mkdtemp(prefix="pf-ledger-")
+os.environ.update(DATABASE_URL=f"sqlite:///{os.path.join(TMP, 'ledger.db')}", SESSION_BACKEND="memory",
+                  CATALOG_CACHE_DIR=os.path.join(TMP, "catalog"), SNAPSHOT_DIR=os.path.join(TMP, "snapshot"))
+
+from sqlalchemy import event, insert, select  # noqa: E402
+from sqlalchemy.exc import IntegrityError  # noqa: E402
+
+from app import create_app  # noqa: E402
+from ledger import ApplicationLedger  # noqa: E402
+from module import Application, User, db  # noqa: E402
+
+app = create_app()
+
+
+def per_click(user_id, college_id):
+    # the view before the ledger: check, insert, commit
+    if Application.query.filter_by(user_id=user_id, college_id=college_id).first():
+        db.session.rollback()
+        return False
+    db.session.add(Application(user_id=user_id, college_id=college_id))
+    try:
+        db.session.commit()
+    except IntegrityError:  # a concurrent repeat click got there first
+        db.session.rollback()
+        return False
+    return True
+
+
+def burst(label, apply, work, threads):
+    def run(items):
+        with app.app_context():
+            for user_id, college_id in items:
+                apply(user_id, college_id)
+            db.session.remove()
+
+    workers = [threading.Thread(target=run, args=(work[i::threads],)) for i in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<24} {len(work) / elapsed:9.0f} applications/s  ({elapsed:.2f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--applications", type=int, default=4000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--applicants", type=int, default=100_000)
+    parser.add_argument("--synchronous", choices=["OFF", "NORMAL", "FULL"], default="NORMAL")
+    args = parser.parse_args()
+
+    with app.app_context():
+        event.listen(db.engine, "connect", lambda conn, _: conn.execute(f"PRAGMA synchronous={args.synchronous}"))
+        db.engine.dispose()
+        with db.engine.begin() as conn:
+            conn.execute(insert(User), [{"email": f"ledger{i}@example.com", "password": "x", "name": f"Student {i}"}
+                                        for i in range(max(args.users, args.applicants))])
+            user_ids = conn.execute(select(User.id).order_by(User.id)).scalars().all()
+
+    rnd = random.Random(1)
+    fresh = [(rnd.choice(user_ids[:args.users]), rnd.randint(1, 500)) for _ in range(args.applications * 3 // 4)]
+    work = fresh + rnd.choices(fresh, k=args.applications - len(fresh))
+    rnd.shuffle(work)
+
+    burst("commit per application", per_click, work, args.threads)
+    with app.app_context():
+        db.session.query(Application).delete()
+        db.session.commit()
+    ledger = ApplicationLedger(db)
+    burst("group-committed ledger", ledger.apply, work, args.threads)
+    commits = ledger.stats["commits"]
+    print(f"  {ledger.stats['applied']} applied in {commits} commits "
+          f"(avg {ledger.stats['applied'] / max(commits, 1):.1f}, largest {ledger.stats['largest_batch']})")
+
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.execute(insert(Application), [{"user_id": u, "college_id": 999_999}
+                                               for u in user_ids[:args.applicants]])
+        tracemalloc.start()
+        start = time.perf_counter()
+        size = sum(len(piece) for piece in ledger.export(999_999, "csv"))
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.reset_peak()
+        print(f"\nexport {args.applicants:,} applicants: {size / 2 ** 20:.1f} MB of CSV in {elapsed:.2f}s, "
+              f"peak {peak / 2 ** 20:.1f} MB")
+        rows = db.session.query(Application, User).join(User).filter(Application.college_id == 999_999).all()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"the same rows loaded with .all(): {len(rows):,} rows, peak {peak / 2 ** 20:.1f} MB")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    finally:
+        shutil.rmtree(TMP, ignore_errors=True)
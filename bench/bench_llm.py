@@ -0,0 +1,141 @@
+"""Chat completions under a degraded upstream: bare ``openai`` calls vs ``ChatClient``.
+
+    python bench/bench_llm.py --calls 60 --threads 8 --stall 5
+
+Starts ``fake_openai.py`` and, for each scenario, makes ``--calls`` chat
+completions from ``--threads`` threads, first with the bare
+``openai.ChatCompletion.create`` the views used to call (no deadline) and
+then through ``ChatClient``. A failed call counts as an offline fallback. The
+scenarios are a healthy upstream, 30% 502/503 errors, 20% of requests
+stalling for ``--stall`` seconds, and an outage where every request stalls
+for the first ``--outage`` seconds (calls paced ``--pace`` seconds apart per
+thread). For each one the table shows the calls answered by the model,
+p50/p99 call latency (fallbacks included) and the breaker transitions.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import openai  # noqa: E402
+
+from llm_client import ChatClient, CircuitBreaker  # noqa: E402
+from load_users import free_port, percentile, wait_for  # noqa: E402
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+MESSAGES = [{"role": "user", "content": "How should I prepare for NEET?"}]
+HEALTHY = {"failure_rate": 0.0, "stall_rate": 0.0, "error_statuses": [500]}
+
+
+def configure(port, **options):
+    req = urllib.request.Request(f"http://127.0.0.1:{port}/_fake/config", data=json.dumps(options).encode(),
+                                 headers={"Content-Type": "application/json"})
+    urllib.request.urlopen(req).read()
+
+
+def drive(call, calls, threads, during=None):
+    """Run ``calls`` calls on ``threads`` threads; ``during(i)`` runs before call ``i``."""
+    latencies, answered = [], []
+    lock = threading.Lock()
+    counter = iter(range(calls))
+
+    def worker():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            if during:
+                during(i)
+            start = time.perf_counter()
+            try:
+                call()
+                ok = True
+            except Exception:
+                ok = False  # the view would answer from the offline fallback
+            with lock:
+                latencies.append(time.perf_counter() - start)
+                answered.append(ok)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return latencies, answered
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=60)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--stall", type=float, default=5.0, help="seconds a stalled upstream request hangs")
+    parser.add_argument("--read-timeout", type=float, default=1.0, help="ChatClient read deadline")
+    parser.add_argument("--breaker-reset", type=float, default=1.0, help="seconds before a half-open probe")
+    parser.add_argument("--outage", type=float, default=3.0, help="seconds the outage scenario lasts")
+    parser.add_argument("--pace", type=float, default=0.5, help="seconds between a thread's calls in the outage")
+    args = parser.parse_args()
+
+    port = free_port()
+    fake = subprocess.Popen([sys.executable, os.path.join(BENCH_DIR, "fake_openai.py"), "--port", str(port),
+                             "--quiet", "--delay", "0.002", "--first-delay", "0.02", "--stall", str(args.stall),
+                             "--seed", "1"])
+    try:
+        wait_for(port)
+        openai.api_key = "bench"
+        openai.api_base = f"http://127.0.0.1:{port}/v1"
+
+        outage_state = {}
+        outage_lock = threading.Lock()
+
+        def outage(i):
+            # every request hangs until --outage seconds after the first call, then the upstream is back
+            with outage_lock:
+                if i == 0:
+                    configure(port, stall_rate=1.0)
+                    outage_state["end"] = time.monotonic() + args.outage
+                elif "end" in outage_state and time.monotonic() >= outage_state["end"]:
+                    configure(port, **HEALTHY)
+                    del outage_state["end"]
+            if i >= args.threads:
+                time.sleep(args.pace)
+
+        scenarios = [
+            ("healthy", {}, None),
+            ("30% 502/503", {"failure_rate": 0.3, "error_statuses": [502, 503]}, None),
+            (f"20% stall {args.stall:g}s", {"stall_rate": 0.2}, None),
+            (f"outage {args.outage:g}s, recovery", {}, outage),
+        ]
+        print(f"{'scenario':<24} {'caller':<11} {'model':>7} {'p50':>8} {'p99':>8}  breaker")
+        for name, options, during in scenarios:
+            for caller in ("bare", "ChatClient"):
+                configure(port, **dict(HEALTHY, **options))
+                if caller == "bare":
+                    openai.requestssession = None
+
+                    def call():
+                        return openai.ChatCompletion.create(model="gpt-3.5-turbo", messages=MESSAGES)
+                    client = None
+                else:
+                    client = ChatClient("gpt-3.5-turbo", read_timeout=args.read_timeout, backoff=0.05,
+                                        breaker=CircuitBreaker(failure_threshold=5, reset_timeout=args.breaker_reset))
+
+                    def call(client=client):
+                        return client.complete(MESSAGES)
+                latencies, answered = drive(call, args.calls, args.threads, during)
+                breaker = ", ".join(f"{k} {v}" for k, v in client.breaker.transitions.items() if v) if client else "-"
+                print(f"{name:<24} {caller:<11} {sum(answered):>3}/{len(answered):<3} "
+                      f"{percentile(latencies, 50) * 1000:6.0f}ms {percentile(latencies, 99) * 1000:6.0f}ms  {breaker or '-'}")
+    finally:
+        fake.terminate()
+        fake.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Metrics overhead: cost of recording on the hot path and of a scrape.
+
+    python bench/bench_metrics.py --threads 8 --ops 200000
+
+Each thread records ``--ops`` counter increments and histogram observations;
+the totals are checked after merging, then a scrape is timed.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from metrics import Metrics  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=200_000)
+    args = parser.parse_args()
+
+    m = Metrics()
+    m.histogram("latency_seconds", "bench")
+
+    def work(i):
+        endpoint = f"endpoint{i % 4}"
+        for n in range(args.ops):
+            m.inc("requests_total", endpoint=endpoint)
+            m.observe("latency_seconds", (n % 100) / 1000, endpoint=endpoint)
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(args.threads)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    counters, histograms = m.snapshot()
+    total = sum(v for (name, _), v in counters.items() if name == "requests_total")
+    assert total == args.threads * args.ops, total
+    start = time.perf_counter()
+    text = m.render()
+    scrape = time.perf_counter() - start
+
+    ops = args.threads * args.ops
+    print(f"{args.threads} threads x {args.ops:,} (inc + observe): {elapsed / ops * 1e9:6.0f} ns per pair, totals exact")
+    print(f"scrape: {scrape * 1000:.2f} ms, {len(text.splitlines())} lines")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Nearest-colleges benchmark: grid index vs the old same-district scan.
+
+    python bench/bench_nearby.py --colleges 100000 --queries 2000
+
+Builds a synthetic catalog spread over J&K, checks the grid answers against a
+brute-force haversine sort, then times both lookups per query.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from catalog import Catalog  # noqa: E402
+from geo import haversine_km  # noqa: E402
+
+DISTRICTS = ["Srinagar", "Jammu", "Anantnag", "Baramulla", "Kupwara", "Pulwama", "Udhampur", "Kathua", "Doda", "Rajouri"]
+TYPES = ["Government", "Private"]
+FIELDS = ["Engineering", "Medical", "Arts", "Science", "Commerce", "Law", "Management"]
+
+
+def synthetic(n, seed=7):
+    rnd = random.Random(seed)
+    return [
+        {
+            "id": i,
+            "name": f"College {i}",
+            "district": rnd.choice(DISTRICTS),
+            "type": rnd.choice(TYPES),
+            "fields": ", ".join(rnd.sample(FIELDS, 2)),
+            "lat": round(rnd.uniform(32.3, 35.0), 5),
+            "lng": round(rnd.uniform(73.5, 76.5), 5),
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+def district_scan(records, college, k=3):
+    # what college_detail() did before the index
+    return [c for c in records if c.get("district") == college.get("district") and c.get("id") != college["id"]][:k]
+
+
+def brute_force(records, lat, lng, k):
+    return sorted((haversine_km(lat, lng, c["lat"], c["lng"]), c["id"]) for c in records)[:k]
+
+
+def timed(fn, queries):
+    start = time.perf_counter()
+    for q in queries:
+        fn(q)
+    return (time.perf_counter() - start) / len(queries) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--colleges", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=2_000)
+    parser.add_argument("-k", type=int, default=3)
+    args = parser.parse_args()
+
+    records = synthetic(args.colleges)
+    start = time.perf_counter()
+    catalog = Catalog(records)
+    print(f"catalog build: {time.perf_counter() - start:.2f}s for {len(catalog)} colleges ({catalog.geo.cell_km:.2f} km cells)")
+
+    rnd = random.Random(1)
+    sample = [catalog.records[rnd.randrange(len(catalog))] for _ in range(args.queries)]
+
+    for college in sample[:25]:
+        got = catalog.nearest(college["lat"], college["lng"], k=args.k)
+        want = brute_force(catalog.records, college["lat"], college["lng"], args.k)
+        # the planar projection may only reorder near-ties
+        assert all(abs(g[0] - w[0]) < 0.05 for g, w in zip(got, want)), (college["id"], got, want)
+    print("grid results match brute force")
+
+    grid_us = timed(lambda c: catalog.nearby(c, k=args.k), sample)
+    radius_us = timed(lambda c: catalog.nearest(c["lat"], c["lng"], k=10, radius_km=15, ctype="Private"), sample)
+    scan_us = timed(lambda c: district_scan(catalog.records, c, k=args.k), sample[: max(args.queries // 10, 1)])
+    brute_us = timed(lambda c: brute_force(catalog.records, c["lat"], c["lng"], args.k), sample[:20])
+
+    print(f"{f'grid k={args.k}:':25}{grid_us:9.1f} us/query")
+    print(f"grid k=10 r=15km type:   {radius_us:9.1f} us/query")
+    print(f"district scan (old):     {scan_us:9.1f} us/query")
+    print(f"brute-force kNN:         {brute_us:9.1f} us/query")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Parents pages: render per request vs the pre-rendered page cache.
+
+    python bench/bench_pages.py --requests 2000
+
+Times ``--requests`` GETs of each parents page through the Flask test client
+three ways: rendering the template every time (what the views used to do),
+served from the page cache, and a repeat view answered with a 304.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from flask import render_template  # noqa: E402
+
+import app as webapp  # noqa: E402
+
+app = webapp.create_app()
+parents_pages = webapp.parents_pages
+
+PAGES = {
+    "/parents_dashboard": ("parents_dashboard.html", "dashboard"),
+    "/parents/courses": ("parents_courses.html", "courses"),
+    "/parents/scholarships": ("parents_scholarships.html", "scholarships"),
+    "/parents/quotas": ("parents_quota.html", "quotas"),
+    "/parents/occupation": ("occupation_guidance.html", "occupation"),
+}
+HEADERS = {"Accept-Encoding": "br, gzip"}
+
+
+def timed(fn, n):
+    start = time.perf_counter()
+    size = 0
+    for _ in range(n):
+        size += fn()
+    return (time.perf_counter() - start) / n * 1e6, size / n
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    client = app.test_client()
+    print(f"{'page':<24}{'render/req':>18}{'cached':>18}{'304':>18}")
+    for path, (template, section) in PAGES.items():
+        def render():
+            parents_pages.render = lambda template, section: render_template(template, **parents_pages.data[section])
+            try:
+                return len(client.get(path, headers=HEADERS).get_data())
+            finally:
+                del parents_pages.render  # back to the class method
+
+        def cached():
+            return len(client.get(path, headers=HEADERS).get_data())
+
+        etag = client.get(path, headers=HEADERS).headers["ETag"]
+
+        def revalidate():
+            resp = client.get(path, headers=dict(HEADERS, **{"If-None-Match": etag}))
+            assert resp.status_code == 304
+            return 0
+
+        cols = [timed(fn, args.requests) for fn in (render, cached, revalidate)]
+        print(f"{path:<24}" + "".join(f"{us:9.1f}us {size:6,.0f}B" for us, size in cols))
+    print(parents_pages.stats)
+
+
+if __name__ == "__main__":
+    main()
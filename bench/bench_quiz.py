@@ -0,0 +1,84 @@
+"""Quiz scoring benchmark: per-sheet keyword loops vs the vectorised scorer.
+
+    python bench/bench_quiz.py --sheets 100000
+
+Generates answer sheets from the quiz's option values, checks both scorers
+agree, then times them (and the streaming CSV path end to end).
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from quiz_scoring import QuizScorer  # noqa: E402
+
+OPTIONS = ["math", "coding", "problem", "biology", "health", "helping", "drawing", "creative", "design",
+           "business", "leadership", "money", "reading", "research", "teaching", "innovation", "team", "alone"]
+
+
+def legacy_score(answers):
+    # what quiz() did per request before the rule table
+    scores = {
+        "Engineering/Tech": 0,
+        "Medicine/Biology": 0,
+        "Arts/Design": 0,
+        "Business/Management": 0,
+        "Education/Research": 0,
+    }
+    for ans in answers:
+        a = (ans or "").lower()
+        if any(x in a for x in ["math", "coding", "problem"]):
+            scores["Engineering/Tech"] += 2
+        if any(x in a for x in ["biology", "helping", "health"]):
+            scores["Medicine/Biology"] += 2
+        if any(x in a for x in ["drawing", "creative", "design"]):
+            scores["Arts/Design"] += 2
+        if any(x in a for x in ["leadership", "business", "money"]):
+            scores["Business/Management"] += 2
+        if any(x in a for x in ["reading", "teaching", "research"]):
+            scores["Education/Research"] += 2
+    return max(scores, key=scores.get), scores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sheets", type=int, default=100_000)
+    args = parser.parse_args()
+
+    rnd = random.Random(3)
+    sheets = [[rnd.choice(OPTIONS) for _ in range(10)] for _ in range(args.sheets)]
+    scorer = QuizScorer.load()
+
+    start = time.perf_counter()
+    legacy = [legacy_score(s) for s in sheets]
+    legacy_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matrix = scorer.score_matrix(sheets)
+    best = scorer.best(matrix)
+    vector_s = time.perf_counter() - start
+
+    for (want_field, want_scores), field, row in zip(legacy, best, matrix.tolist()):
+        # the legacy max() picked the first category even when nothing scored
+        assert field == (want_field if any(want_scores.values()) else None) and row == list(want_scores.values())
+
+    csv_text = "student,q1,q2,q3,q4,q5,q6,q7,q8,q9,q10\n" + "".join(
+        f"{i}," + ",".join(s) + "\n" for i, s in enumerate(sheets)
+    )
+    start = time.perf_counter()
+    out_bytes = sum(len(chunk) for chunk in scorer.score_csv(io.StringIO(csv_text)))
+    csv_s = time.perf_counter() - start
+
+    n = args.sheets
+    print(f"{n:,} sheets, results identical")
+    print(f"legacy loop:     {legacy_s:7.3f}s  ({n / legacy_s:12,.0f} sheets/s)")
+    print(f"numpy matrix:    {vector_s:7.3f}s  ({n / vector_s:12,.0f} sheets/s)")
+    print(f"CSV in -> out:   {csv_s:7.3f}s  ({n / csv_s:12,.0f} sheets/s, {out_bytes / 1e6:.1f} MB out)")
+
+
+if __name__ == "__main__":
+    main()
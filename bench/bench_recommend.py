@@ -0,0 +1,67 @@
+"""Recommendation benchmark: substring scan per view vs the recommendation index.
+
+    python bench/bench_recommend.py --colleges 100000 --students 2000
+
+Times the old per-request ``field in fields`` scan, the index build, and
+ranking quiz score vectors with a cold and a warm profile cache. Also counts
+how many colleges the old scan found for each quiz label (it finds none: the
+labels never appear verbatim in the catalog).
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bench_nearby import synthetic  # noqa: E402
+from bench_quiz import OPTIONS  # noqa: E402
+from catalog import Catalog  # noqa: E402
+from quiz_scoring import QuizScorer  # noqa: E402
+from recommend import Recommender  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--colleges", type=int, default=100_000)
+    parser.add_argument("--students", type=int, default=2000)
+    args = parser.parse_args()
+
+    catalog = Catalog(synthetic(args.colleges))
+    scorer = QuizScorer.load()
+    rnd = random.Random(5)
+    sheets = [[rnd.choice(OPTIONS) for _ in range(10)] for _ in range(args.students)]
+    matrix = scorer.score_matrix(sheets)
+    profiles = [dict(zip(scorer.categories, row)) for row in matrix.tolist()]
+    fields = scorer.best(matrix)
+
+    start = time.perf_counter()
+    found = {}
+    for field in filter(None, fields):
+        found[field] = len([c for c in catalog.records if field.lower() in c.get("fields", "").lower()])
+    scan_s = time.perf_counter() - start
+
+    recommender = Recommender.load(scorer.categories, cache_size=args.students)
+    start = time.perf_counter()
+    recommender.build(catalog)
+    build_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    counts = [len(recommender.recommend(catalog, scores=p)) for p in profiles]
+    cold_s = time.perf_counter() - start
+    start = time.perf_counter()
+    for p in profiles:
+        recommender.recommend(catalog, scores=p)
+    warm_s = time.perf_counter() - start
+
+    n = args.students
+    print(f"{args.colleges:,} colleges, {n:,} students, {len(set(map(tuple, matrix.tolist()))):,} distinct profiles")
+    print(f"old scan per view:    {scan_s / n * 1000:8.3f} ms  matches per label {found}")
+    print(f"index build:          {build_s * 1000:8.1f} ms  (once per catalog version)")
+    print(f"ranked, cold cache:   {cold_s / n * 1000:8.3f} ms  avg {sum(counts) / n:,.0f} colleges per student")
+    print(f"ranked, warm cache:   {warm_s / n * 1000:8.3f} ms  {recommender.stats}")
+
+
+if __name__ == "__main__":
+    main()
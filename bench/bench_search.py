@@ -0,0 +1,72 @@
+"""College search: the substring filter on names vs the ranked full-text index.
+
+    python bench/bench_search.py --colleges 100000 --repeat 20
+
+Builds a synthetic catalog, then times each query through
+``Catalog.page(search=...)`` (case-insensitive substring of the name, catalog
+order) and ``SearchIndex.search`` (ranked top 10 with highlights), showing
+how many colleges each finds. Misspelt queries find nothing by substring.
+Also times the full index build and an incremental update after
+``--changes`` colleges are edited through ``Catalog.with_changes``.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from catalog import Catalog  # noqa: E402
+from gen_catalog import generate  # noqa: E402
+from search import CollegeSearch, SearchIndex  # noqa: E402
+
+QUERIES = [
+    "srinagar", "srinager", "engineering", "enginering", "college of engineering srinagar", "mbbs",
+    "hostel library", "hostl", "institute 5123", "techn",
+]
+
+
+def timed(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--colleges", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--changes", type=int, default=500)
+    args = parser.parse_args()
+
+    catalog = Catalog(generate(args.colleges, seed=1))
+    start = time.perf_counter()
+    index = SearchIndex(catalog)
+    build_s = time.perf_counter() - start
+    print(f"{args.colleges:,} colleges: index built in {build_s:.2f}s, {len(index._ids):,} terms, "
+          f"{(index._docs.nbytes + index._impacts.nbytes) / 2 ** 20:.1f} MB of postings\n")
+
+    print(f"{'query':<34} {'substring':>9} {'ms':>7}   {'ranked':>7} {'ms':>7}  top result")
+    for query in QUERIES:
+        (_, found, _), substring_s = timed(lambda: catalog.page(search=query), args.repeat)
+        (hits, total), ranked_s = timed(lambda: index.search(query, limit=10), args.repeat)
+        top = hits[0].record["name"] if hits else "-"
+        print(f"{query:<34} {found:>9,} {substring_s * 1000:7.2f}   {total:>7,} {ranked_s * 1000:7.2f}  {top}")
+
+    search = CollegeSearch()
+    search.build(catalog)
+    edits = [dict(catalog.records[pos], description="Renamed campus with a new robotics lab.")
+             for pos in range(0, args.colleges, max(args.colleges // args.changes, 1))][:args.changes]
+    changed = catalog.with_changes(edits)
+    start = time.perf_counter()
+    search.build(changed)
+    update_s = time.perf_counter() - start
+    (_, total), _ = timed(lambda: search.search(changed, "robotics"), 1)
+    print(f"\nincremental update of {len(edits)} colleges: {update_s * 1000:.1f} ms "
+          f"(full build {build_s * 1000:.0f} ms); 'robotics' now finds {total}")
+
+
+if __name__ == "__main__":
+    main()
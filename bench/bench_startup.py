@@ -0,0 +1,134 @@
+"""Worker startup: importing the app, create_app() cold and warm, time to first response.
+
+    python bench/bench_startup.py --colleges 100000 --repeat 3
+
+Each measurement runs in a fresh interpreter, like a new gunicorn worker.
+``import app`` is timed with a check that it loaded no OpenAI SDK and wrote
+nothing to the working tree. ``create_app()`` is timed on a generated
+catalog with empty snapshot / catalog directories (the first boot after a
+deploy or a catalog change) and again with the ones that boot left behind.
+Finally ``gunicorn 'app:create_app()'`` is started both ways and polled
+until ``/login`` answers 200.
+"""
+import argparse
+import http.client
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from gen_catalog import write as write_catalog  # noqa: E402
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+TMP = tempfile.mkdtemp(prefix="pf-startup-")
+
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+if "--create" in sys.argv:
+    app.create_app()
+done = time.perf_counter()
+print(json.dumps({"import": imported - start, "create_app": done - imported, "openai": "openai" in sys.modules,
+                  "snapshots": app.snapshots.stats if "--create" in sys.argv else None}))
+"""
+
+
+def tree(path):
+    found = set()
+    for dirpath, dirnames, filenames in os.walk(path):
+        dirnames[:] = [d for d in dirnames if d not in ("__pycache__", ".git")]
+        found.update(os.path.join(dirpath, name) for name in filenames)
+    return found
+
+
+def child(env, create):
+    out = subprocess.run([sys.executable, "-c", CHILD] + (["--create"] if create else []),
+                         cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def first_response(env, timeout=120):
+    """Seconds from starting gunicorn until ``/login`` returns 200."""
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-w", "1", "-b", f"127.0.0.1:{port}", "--log-level", "warning",
+         "app:create_app()"],
+        cwd=ROOT, env=env, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+                conn.request("GET", "/login")
+                if conn.getresponse().status == 200:
+                    return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.02)
+        raise RuntimeError("server did not answer")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--colleges", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    path = write_catalog(os.path.join(TMP, "colleges.json"), args.colleges, seed=1, coords=True)
+    env = dict(os.environ, COLLEGES_FILE=path, DATABASE_URL=f"sqlite:///{os.path.join(TMP, 'startup.db')}",
+               SESSION_PATH=os.path.join(TMP, "sessions.sqlite3"))
+    env.pop("OPENAI_API_KEY", None)
+
+    before = tree(ROOT)
+    runs = [child(env, create=False) for _ in range(args.repeat)]
+    written = sorted(tree(ROOT) - before)
+    print(f"import app            {statistics.median(r['import'] for r in runs) * 1000:8.0f} ms   "
+          f"openai loaded: {any(r['openai'] for r in runs)}, files written: {len(written)}")
+    for name in written:
+        print(f"    {os.path.relpath(name, ROOT)}")
+
+    print(f"\n{args.colleges:,} colleges")
+    print(f"{'':<22}{'import':>10}{'create_app':>12}{'snapshots':>34}")
+    for label in ("cold", "warm"):
+        runs = []
+        for n in range(args.repeat):
+            dirs = os.path.join(TMP, "cold", str(n)) if label == "cold" else os.path.join(TMP, "warm")
+            run_env = dict(env, SNAPSHOT_DIR=os.path.join(dirs, "snapshot"), CATALOG_CACHE_DIR=os.path.join(dirs, "catalog"))
+            if label == "warm" and n == 0:
+                child(run_env, create=True)  # leaves the snapshots behind
+            runs.append(child(run_env, create=True))
+        print(f"create_app, {label:<11}{statistics.median(r['import'] for r in runs) * 1000:8.0f} ms"
+              f"{statistics.median(r['create_app'] for r in runs) * 1000:9.0f} ms   {runs[-1]['snapshots']}")
+
+    print()
+    for label in ("cold", "warm"):
+        dirs = os.path.join(TMP, "serve-" + label)
+        run_env = dict(env, SNAPSHOT_DIR=os.path.join(dirs, "snapshot"), CATALOG_CACHE_DIR=os.path.join(dirs, "catalog"))
+        if label == "warm":
+            child(run_env, create=True)
+        print(f"first response, {label:<6}{first_response(run_env) * 1000:8.0f} ms")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    finally:
+        shutil.rmtree(TMP, ignore_errors=True)
@@ -0,0 +1,137 @@
+"""Local stand-in for the OpenAI chat completions API.
+
+    python bench/fake_openai.py --port 8001 --delay 0.05
+    OPENAI_API_KEY=test OPENAI_API_BASE=http://127.0.0.1:8001/v1 python app.py
+
+Answers ``POST /v1/chat/completions`` with a canned reply, either as one JSON
+body or, for ``"stream": true``, as SSE chunks sent one word at a time with
+``--delay`` seconds between them (and ``--first-delay`` before the first), so
+streaming and time-to-first-byte can be checked without network access.
+``--failure-rate`` answers that fraction of requests with an error status
+from ``--error-statuses`` instead, and ``--stall-rate`` makes that fraction
+hang for ``--stall`` seconds before the first byte. ``POST /_fake/config``
+with a JSON object of the same option names (``failure_rate``, ``stall``,
+...) changes them while the server runs, e.g. to start and end an outage.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY = (
+    "Start with NCERT textbooks, make a weekly timetable, and take one full mock test "
+    "every Sunday. Review every mistake, and keep a short formula notebook for revision."
+)
+
+
+def completion(model, content):
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": len(content.split()), "total_tokens": len(content.split())},
+    }
+
+
+def chunk(model, delta, finish_reason=None):
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    options = None
+    rnd = random.Random()
+    rnd_lock = threading.Lock()
+
+    def _roll(self, rate):
+        with self.rnd_lock:
+            return self.rnd.random() < rate
+
+    def log_message(self, fmt, *args):
+        if not self.options.quiet:
+            super().log_message(fmt, *args)
+
+    def _json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        opts = self.options
+        if self.path == "/_fake/config":
+            for key, value in body.items():
+                if not hasattr(opts, key):
+                    return self._json(400, {"error": {"message": f"unknown option {key}"}})
+                setattr(opts, key, value)
+            return self._json(200, vars(opts))
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self._json(404, {"error": {"message": "not found"}})
+        model = body.get("model", "gpt-3.5-turbo")
+
+        if opts.stall_rate and self._roll(opts.stall_rate):
+            time.sleep(opts.stall)
+        time.sleep(opts.first_delay)
+        if opts.failure_rate and self._roll(opts.failure_rate):
+            with self.rnd_lock:
+                status = self.rnd.choice(opts.error_statuses)
+            return self._json(status, {"error": {"message": "injected failure", "type": "server_error"}})
+        if not body.get("stream"):
+            time.sleep(opts.delay * len(REPLY.split()))
+            return self._json(200, completion(model, REPLY))
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def send(obj):
+            data = b"data: " + (obj if isinstance(obj, bytes) else json.dumps(obj).encode()) + b"\n\n"
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+        send(chunk(model, {"role": "assistant"}))
+        for i, word in enumerate(REPLY.split(" ")):
+            if i:
+                time.sleep(opts.delay)
+            send(chunk(model, {"content": (" " if i else "") + word}))
+        send(chunk(model, {}, finish_reason="stop"))
+        send(b"[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--delay", type=float, default=0.05, help="seconds between streamed deltas")
+    parser.add_argument("--first-delay", type=float, default=0.2, help="seconds before the first byte")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of requests answered with an error")
+    parser.add_argument("--error-statuses", type=int, nargs="+", default=[500], help="statuses used for failures")
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="fraction of requests that hang first")
+    parser.add_argument("--stall", type=float, default=30.0, help="seconds a stalled request hangs")
+    parser.add_argument("--seed", type=int, default=None, help="seed for failure injection")
+    parser.add_argument("--quiet", action="store_true")
+    Handler.options = parser.parse_args()
+    Handler.rnd.seed(Handler.options.seed)
+    server = ThreadingHTTPServer((Handler.options.host, Handler.options.port), Handler)
+    print(f"fake OpenAI listening on http://{Handler.options.host}:{Handler.options.port}/v1")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Synthetic college catalogs shaped like the real data files.
+
+    python bench/gen_catalog.py --records 100000 --shape colleges --out /tmp/colleges_100k.json
+    python bench/gen_catalog.py --records 1000000 --shape jk --out /tmp/jk_1m.json
+
+``--shape colleges`` mirrors ``colleges.json`` (description, courses,
+facilities, contact details; ``--coords`` adds lat/lng); ``--shape jk``
+mirrors ``data/colleges_jk.json`` (id, name, district, type, fields and
+coordinates). Output is deterministic
+for a given ``--seed`` and is written one record at a time, so a million
+records never sit in memory.
+"""
+import argparse
+import json
+import os
+import random
+
+DISTRICTS = {
+    # district -> approximate centre (lat, lng)
+    "Srinagar": (34.08, 74.80), "Jammu": (32.73, 74.86), "Anantnag": (33.73, 75.15),
+    "Baramulla": (34.20, 74.34), "Kupwara": (34.53, 74.26), "Pulwama": (33.87, 74.90),
+    "Budgam": (33.94, 74.65), "Ganderbal": (34.22, 74.78), "Shopian": (33.72, 74.83),
+    "Kulgam": (33.64, 75.02), "Bandipora": (34.42, 74.65), "Udhampur": (32.92, 75.14),
+    "Kathua": (32.37, 75.52), "Samba": (32.56, 75.12), "Reasi": (33.08, 74.83),
+    "Rajouri": (33.38, 74.31), "Poonch": (33.77, 74.09), "Doda": (33.15, 75.55),
+    "Kishtwar": (33.31, 75.77), "Ramban": (33.24, 75.19),
+}
+TYPES = ["Government", "Private", "Autonomous", "Deemed"]
+FIELD_SETS = [
+    "Arts, Science, Commerce", "Engineering, Technology", "Medical, Paramedical", "Engineering, Sciences",
+    "Agriculture, Veterinary", "Science, Commerce", "Science", "Law", "Engineering", "Management Studies",
+    "Engineering, Science, Management", "Arts, Science, Commerce, Professional Programs", "Arts, Science",
+    "Engineering/Technology", "Science, Commerce, Computer Applications", "Agriculture, Veterinary, Horticulture",
+]
+KINDS = {
+    "Engineering": ["CSE", "Mechanical", "Civil", "Electrical", "ECE"],
+    "Medical": ["MBBS", "BDS", "Nursing", "Pharmacy"],
+    "Arts": ["BA English", "BA History", "BA Political Science"],
+    "Science": ["BSc Physics", "BSc Chemistry", "BSc Botany", "BCA"],
+    "Commerce": ["BCom", "BBA"],
+    "Law": ["BA LLB", "LLM"],
+    "Management": ["BBA", "MBA"],
+    "Agriculture": ["BSc Agriculture", "BVSc"],
+}
+FACILITIES = ["Library", "Hostel", "Labs", "Sports Complex", "Wi-Fi Campus", "Cafeteria", "Auditorium", "Transport"]
+PREFIXES = ["Government Degree College", "Institute of Technology", "College of Engineering", "Medical College",
+            "Women's College", "Institute of Management", "School of Sciences", "College of Education"]
+
+
+def record(i, shape, rnd, coords=False):
+    district = rnd.choice(list(DISTRICTS))
+    fields = rnd.choice(FIELD_SETS)
+    rec = {
+        "id": i,
+        "name": f"{rnd.choice(PREFIXES)} {district} {i}",
+        "district": district,
+        "type": rnd.choice(TYPES),
+        "fields": fields,
+    }
+    if shape == "jk" or coords:
+        lat, lng = DISTRICTS[district]
+        rec["lat"] = round(lat + rnd.uniform(-0.25, 0.25), 4)
+        rec["lng"] = round(lng + rnd.uniform(-0.25, 0.25), 4)
+    if shape == "jk":
+        return rec
+    courses = [c for key, options in KINDS.items() if key in fields for c in options]
+    slug = f"college{i}"
+    rec.update({
+        "description": f"{rec['type']} institution in {district} offering {fields.lower()} programmes.",
+        "courses_offered": rnd.sample(courses, min(len(courses), 3)) if courses else ["General"],
+        "facilities": rnd.sample(FACILITIES, 3),
+        "contact": f"+91-19{rnd.randint(0, 9)}-{rnd.randint(2000000, 2999999)}",
+        "email": f"info@{slug}.ac.in",
+        "address": f"{district}, J&K",
+        "website": f"http://{slug}.ac.in",
+    })
+    return rec
+
+
+def generate(n, shape="colleges", seed=7, coords=False):
+    rnd = random.Random(seed)
+    for i in range(1, n + 1):
+        yield record(i, shape, rnd, coords)
+
+
+def write(path, n, shape="colleges", seed=7, coords=False):
+    tmp = path + ".part"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write("[\n")
+        for i, rec in enumerate(generate(n, shape, seed, coords)):
+            f.write((",\n" if i else "") + json.dumps(rec, ensure_ascii=False))
+        f.write("\n]\n")
+    os.replace(tmp, path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=10_000)
+    parser.add_argument("--shape", choices=["colleges", "jk"], default="colleges")
+    parser.add_argument("--coords", action="store_true", help="add lat/lng to the colleges shape")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args()
+    write(args.out, args.records, args.shape, args.seed, args.coords)
+    print(f"wrote {args.records:,} {args.shape} records to {args.out} ({os.path.getsize(args.out) / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Login + dashboard load test against gunicorn with 1..N workers.
+
+    python bench/load_users.py --workers 1 4 --clients 16 --duration 10
+
+For each worker count this starts ``gunicorn 'app:create_app()'`` on a fresh sqlite
+database, registers ``--users`` accounts, then runs ``--clients`` threads that
+log in and load the dashboard in a loop. Because users and sessions live in
+sqlite files shared by the workers, a login served by one worker is valid on
+every other worker (``SESSION_BACKEND=cookie`` compares against signed
+cookies). Prints requests/s and p50/p99 latency per step; ``--json`` writes
+the numbers to a file.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server on port {port} did not come up")
+
+
+def request(conn, method, path, body=None, cookie=None):
+    headers = {}
+    if body is not None:
+        body = urlencode(body)
+        headers["Content-Type"] = "application/x-www-form-urlencoded"
+    if cookie:
+        headers["Cookie"] = cookie
+    conn.request(method, path, body=body, headers=headers)
+    resp = conn.getresponse()
+    resp.read()
+    set_cookie = resp.getheader("Set-Cookie")
+    return resp.status, set_cookie.split(";", 1)[0] if set_cookie else cookie
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def run(workers, args):
+    tmp = tempfile.mkdtemp(prefix="pf-load-")
+    port = free_port()
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'load.db')}",
+               SESSION_PATH=os.path.join(tmp, "sessions.sqlite3"))
+    env.pop("OPENAI_API_KEY", None)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-w", str(workers), "-b", f"127.0.0.1:{port}", "--log-level", "warning", "app:create_app()"],
+        cwd=ROOT, env=env,
+    )
+    try:
+        wait_for(port)
+        accounts = [(f"load{i}@example.com", f"pw{i}") for i in range(args.users)]
+        conn = http.client.HTTPConnection("127.0.0.1", port)
+        for email, pw in accounts:
+            request(conn, "POST", "/register", {"email": email, "password": pw, "confirm_password": pw})
+        conn.close()
+
+        latencies = {"login": [], "dashboard": []}
+        errors = []
+        stop = time.time() + args.duration
+        lock = threading.Lock()
+
+        def client(seed):
+            rnd = random.Random(seed)
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            local = {"login": [], "dashboard": []}
+            while time.time() < stop:
+                email, pw = rnd.choice(accounts)
+                t0 = time.perf_counter()
+                status, cookie = request(conn, "POST", "/login", {"email": email, "password": pw})
+                t1 = time.perf_counter()
+                if status != 302:
+                    errors.append(("login", status))
+                    continue
+                status, _ = request(conn, "GET", "/dashboard", cookie=cookie)
+                t2 = time.perf_counter()
+                if status != 200:
+                    errors.append(("dashboard", status))
+                local["login"].append(t1 - t0)
+                local["dashboard"].append(t2 - t1)
+            with lock:
+                for k, v in local.items():
+                    latencies[k].extend(v)
+
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(args.clients)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        result = {"workers": workers, "clients": args.clients, "duration_s": args.duration, "errors": len(errors)}
+        for step, values in latencies.items():
+            result[step] = {
+                "requests": len(values),
+                "rps": round(len(values) / args.duration, 1),
+                "p50_ms": round(percentile(values, 50) * 1000, 2),
+                "p99_ms": round(percentile(values, 99) * 1000, 2),
+            }
+        return result
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = []
+    for workers in args.workers:
+        r = run(workers, args)
+        results.append(r)
+        print(
+            f"workers={workers:<2} login {r['login']['rps']:7.1f} req/s p50 {r['login']['p50_ms']:7.1f}ms p99 {r['login']['p99_ms']:7.1f}ms"
+            f" | dashboard {r['dashboard']['rps']:7.1f} req/s p50 {r['dashboard']['p50_ms']:6.1f}ms p99 {r['dashboard']['p99_ms']:6.1f}ms"
+            f" | errors {r['errors']}"
+        )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+"""End-to-end benchmark suite: synthetic catalog + seeded users + fake LLM + gunicorn.
+
+    python bench/run_suite.py --sizes 1000 100000 --users 500 --messages 200 \\
+        --clients 8 --duration 10 --json results.json --compare previous.json
+
+For each catalog size this generates a catalog (``gen_catalog.py``), seeds a
+fresh database (``seed_users.py``), starts the fake OpenAI server
+(``fake_openai.py``, with ``--llm-delay`` and ``--llm-failure-rate``) and
+``gunicorn 'app:create_app()'`` pointed at all three. It then drives one route at a time
+with ``--clients`` logged-in clients for ``--duration`` seconds, followed by a
+mixed phase, and records throughput, p50/p99 latency, errors and the peak RSS
+of the server processes during each phase. ``--json`` writes the results with
+the git commit they were taken at; ``--compare`` prints the change against an
+earlier results file.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from gen_catalog import DISTRICTS, write as write_catalog  # noqa: E402
+from load_users import ROOT, free_port, percentile, wait_for  # noqa: E402
+from seed_users import PASSWORD, QUESTIONS, email, seed  # noqa: E402
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+QUIZ_OPTIONS = ["math", "coding", "biology", "health", "drawing", "design", "business", "money", "reading", "research"]
+SEARCH_TERMS = ["", "", "college", "institute", "srinagar", "tech", "srinager", "enginering"]
+ROUTES = ["colleges", "college_detail", "recommended_colleges", "quiz", "chat_api"]
+MIX = {"colleges": 4, "college_detail": 4, "recommended_colleges": 2, "quiz": 1, "chat_api": 1}
+
+
+class Client:
+    def __init__(self, port, rnd, size):
+        self.conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        self.rnd = rnd
+        self.size = size
+        self.cookie = None
+
+    def request(self, method, path, form=None, payload=None):
+        headers = {}
+        body = None
+        if form is not None:
+            body = urlencode(form)
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        elif payload is not None:
+            body = json.dumps(payload)
+            headers["Content-Type"] = "application/json"
+        if self.cookie:
+            headers["Cookie"] = self.cookie
+        self.conn.request(method, path, body=body, headers=headers)
+        resp = self.conn.getresponse()
+        resp.read()
+        set_cookie = resp.getheader("Set-Cookie")
+        if set_cookie:
+            self.cookie = set_cookie.split(";", 1)[0]
+        return resp.status
+
+    def login(self, user):
+        return self.request("POST", "/login", form={"email": email(user), "password": PASSWORD})
+
+    def hit(self, route):
+        rnd = self.rnd
+        if route == "colleges":
+            params = {"search": rnd.choice(SEARCH_TERMS), "page": rnd.randint(1, 5)}
+            if rnd.random() < 0.5:
+                params["district"] = rnd.choice(list(DISTRICTS)).lower()
+            return self.request("GET", "/colleges?" + urlencode(params))
+        if route == "college_detail":
+            return self.request("GET", f"/college/{rnd.randint(1, self.size)}")
+        if route == "recommended_colleges":
+            return self.request("GET", "/recommended_colleges")
+        if route == "quiz":
+            form = {f"q{i}": rnd.choice(QUIZ_OPTIONS) for i in range(1, 11)}
+            return self.request("POST", "/quiz", form=form)
+        if route == "chat_api":
+            # half repeated questions (reply cache), half new ones (upstream call)
+            message = rnd.choice(QUESTIONS)
+            if rnd.random() < 0.5:
+                message += f" ({rnd.random():.6f})"
+            return self.request("POST", "/chat/api", payload={"message": message})
+        raise ValueError(route)
+
+
+def process_tree(pid):
+    """``pid`` and all its descendants, from /proc."""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    tree, todo = [], [pid]
+    while todo:
+        p = todo.pop()
+        tree.append(p)
+        todo.extend(children.get(p, []))
+    return tree
+
+
+def rss_mb(pids):
+    total = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1])
+                        break
+        except OSError:
+            pass
+    return total / 1024
+
+
+class RssMonitor(threading.Thread):
+    def __init__(self, pid, interval=0.2):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0.0
+        self._done = threading.Event()
+
+    def reset(self):
+        self.peak = 0.0
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            self.peak = max(self.peak, rss_mb(process_tree(self.pid)))
+
+    def stop(self):
+        self._done.set()
+
+
+def drive(port, size, users, routes, clients, duration, seed):
+    """Run ``clients`` threads over ``routes`` (weighted by MIX) for ``duration`` seconds."""
+    latencies = {r: [] for r in routes}
+    errors = {r: 0 for r in routes}
+    lock = threading.Lock()
+    weights = [MIX[r] for r in routes]
+    stop = time.time() + duration
+
+    def client(i):
+        rnd = random.Random(seed * 1000 + i)
+        c = Client(port, rnd, size)
+        c.login(i % users)
+        local = {r: [] for r in routes}
+        local_errors = {r: 0 for r in routes}
+        while time.time() < stop:
+            route = rnd.choices(routes, weights)[0]
+            start = time.perf_counter()
+            try:
+                status = c.hit(route)
+            except (OSError, http.client.HTTPException):
+                status = 0
+                c.conn.close()
+            local[route].append(time.perf_counter() - start)
+            if status >= 400 or status == 0:
+                local_errors[route] += 1
+        with lock:
+            for r in routes:
+                latencies[r].extend(local[r])
+                errors[r] += local_errors[r]
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, errors
+
+
+def run_size(size, args):
+    tmp = tempfile.mkdtemp(prefix="pf-suite-")
+    results = []
+    servers = []
+    try:
+        catalog = write_catalog(os.path.join(tmp, "colleges.json"), size, shape="colleges", coords=True)
+        db_url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        seed(db_url, args.users, args.messages)
+
+        llm_port = free_port()
+        llm_cmd = [sys.executable, os.path.join(BENCH_DIR, "fake_openai.py"), "--port", str(llm_port), "--quiet",
+                   "--delay", str(args.llm_delay), "--first-delay", str(args.llm_delay),
+                   "--failure-rate", str(args.llm_failure_rate), "--seed", str(args.seed)]
+        servers.append(subprocess.Popen(llm_cmd))
+
+        port = free_port()
+        env = dict(os.environ, DATABASE_URL=db_url, COLLEGES_FILE=catalog,
+                   SESSION_PATH=os.path.join(tmp, "sessions.sqlite3"), SNAPSHOT_DIR=os.path.join(tmp, "snapshot"),
+                   OPENAI_API_KEY="bench", OPENAI_API_BASE=f"http://127.0.0.1:{llm_port}/v1")
+        server = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-w", str(args.workers), "--threads", str(args.threads),
+             "-b", f"127.0.0.1:{port}", "--timeout", "120", "--log-level", "warning", "app:create_app()"],
+            cwd=ROOT, env=env, stderr=None if args.verbose else subprocess.DEVNULL,
+        )
+        servers.append(server)
+        wait_for(llm_port)
+        wait_for(port, timeout=300)
+        drive(port, size, args.users, ["colleges"], 1, 1, args.seed)  # warm up every worker a little
+
+        monitor = RssMonitor(server.pid)
+        monitor.start()
+        phases = [[r] for r in args.routes] + ([list(args.routes)] if len(args.routes) > 1 else [])
+        for routes in phases:
+            monitor.reset()
+            latencies, errors = drive(port, size, args.users, routes, args.clients, args.duration, args.seed)
+            label = routes[0] if len(routes) == 1 else "mixed"
+            for route in routes:
+                values = latencies[route]
+                results.append({
+                    "size": size, "phase": label, "route": route,
+                    "requests": len(values), "rps": round(len(values) / args.duration, 1),
+                    "p50_ms": round(percentile(values, 50) * 1000, 2),
+                    "p99_ms": round(percentile(values, 99) * 1000, 2),
+                    "errors": errors[route], "peak_rss_mb": round(monitor.peak, 1),
+                })
+                print_row(results[-1])
+        monitor.stop()
+        return results
+    finally:
+        for proc in reversed(servers):
+            proc.terminate()
+            proc.wait()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def print_row(r, previous=None):
+    line = (f"{r['size']:>9,} {r['phase']:<22} {r['route']:<22} {r['rps']:8.1f} req/s"
+            f"  p50 {r['p50_ms']:8.1f}ms  p99 {r['p99_ms']:8.1f}ms  err {r['errors']:4d}  rss {r['peak_rss_mb']:7.1f}MB")
+    if previous:
+        def delta(key):
+            return (r[key] - previous[key]) / previous[key] * 100 if previous[key] else 0.0
+        line += f"  | rps {delta('rps'):+6.1f}% p99 {delta('p99_ms'):+6.1f}% rss {delta('peak_rss_mb'):+6.1f}%"
+    print(line)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100_000])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=200, help="chat messages seeded per user")
+    parser.add_argument("--routes", nargs="+", choices=ROUTES, default=ROUTES)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10, help="seconds per phase")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=4, help="gunicorn threads per worker")
+    parser.add_argument("--llm-delay", type=float, default=0.01, help="fake LLM seconds per word")
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--verbose", action="store_true", help="show the app server's log output")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="earlier --json output to compare against")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        results.extend(run_size(size, args))
+
+    report = {
+        "commit": git_commit(),
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "params": {k: v for k, v in vars(args).items() if k not in ("json", "compare", "verbose")},
+        "results": results,
+    }
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+        before = {(r["size"], r["phase"], r["route"]): r for r in old["results"]}
+        print(f"\ncompared with {old.get('commit')} ({old.get('date')}):")
+        for r in results:
+            print_row(r, before.get((r["size"], r["phase"], r["route"])))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Seed a database with benchmark users, quiz results and long chat histories.
+
+    python bench/seed_users.py --db sqlite:////tmp/bench.db --users 1000 --messages 200
+
+Creates the app's tables in ``--db`` (any SQLAlchemy URL) and inserts users
+``bench<i>@example.com`` (password ``bench``) with a random quiz result and
+``--messages`` alternating user/assistant chat messages each, in bulk. The
+password hash is computed once and shared, so seeding stays fast.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from flask import Flask  # noqa: E402
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+from module import ChatMessage, User, db  # noqa: E402
+from quiz_scoring import QuizScorer  # noqa: E402
+
+PASSWORD = "bench"
+QUESTIONS = [
+    "How should I prepare for NEET?", "Which colleges in Srinagar offer engineering?",
+    "What are the scholarship options after 12th?", "Is commerce a good choice for me?",
+    "How do I get into NIT Srinagar?", "What career can I choose after BSc?",
+]
+ANSWER = ("Start with the NCERT syllabus, make a weekly timetable and take regular mock tests. "
+          "Shortlist colleges by field and district, and check admission dates early.")
+
+
+def email(i):
+    return f"bench{i}@example.com"
+
+
+def seed(url, users, messages, seed=11, batch=500):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = url
+    db.init_app(app)
+    rnd = random.Random(seed)
+    categories = QuizScorer.load().categories
+    password = generate_password_hash(PASSWORD)
+    with app.app_context():
+        db.create_all()
+        start_id = (db.session.query(db.func.max(User.id)).scalar() or 0) + 1
+        for first in range(0, users, batch):
+            rows, chat = [], []
+            for i in range(first, min(first + batch, users)):
+                uid = start_id + i
+                scores = {c: rnd.randrange(0, 21, 2) for c in categories}
+                rows.append({
+                    "id": uid, "email": email(i), "password": password, "name": f"Bench User {i}",
+                    "recommended_field": max(scores, key=scores.get), "quiz_scores": json.dumps(scores),
+                    "chat_summary_upto": 0,
+                })
+                for m in range(messages):
+                    if m % 2 == 0:
+                        chat.append({"user_id": uid, "role": "user", "content": rnd.choice(QUESTIONS)})
+                    else:
+                        chat.append({"user_id": uid, "role": "assistant", "content": ANSWER})
+            db.session.execute(db.insert(User), rows)
+            if chat:
+                db.session.execute(db.insert(ChatMessage), chat)
+            db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", required=True, help="SQLAlchemy URL, e.g. sqlite:////tmp/bench.db")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+    start = time.perf_counter()
+    seed(args.db, args.users, args.messages, args.seed)
+    print(f"seeded {args.users:,} users x {args.messages:,} messages in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
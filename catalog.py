@@ -0,0 +1,429 @@
+"""College catalog with indexes built once at load time.
+
+A ``Catalog`` wraps the list of college dicts and precomputes everything the
+listing/detail pages used to recompute per request: a primary-key map by
+``id``, normalised hash indexes on district / type / fields, facet values with
+counts for the filter dropdowns, and a trigram index on names so a search only
+looks at colleges that can possibly match. Colleges that carry ``lat``/``lng``
+also go into a grid index for nearest-neighbour queries.
+
+``CatalogLoader`` owns the current ``Catalog`` for a JSON file. It watches the
+file in a background thread and, when it changes, parses it and builds a new
+frozen snapshot off the request path, then swaps it in with a single
+assignment. Readers just grab ``loader.current`` and never wait or re-parse.
+Indexes derived from the catalog elsewhere (recommendations) ``subscribe`` to
+the loader and are rebuilt in the same background step.
+"""
+import bisect
+import json
+import logging
+import os
+import threading
+from collections import defaultdict
+from types import MappingProxyType
+
+from geo import GeoIndex, coords
+
+log = logging.getLogger(__name__)
+
+
+def normalize(value):
+    """Fold a facet/search value the same way on both sides of a lookup."""
+    return " ".join(str(value or "").split()).lower()
+
+
+def split_fields(fields):
+    """``"Engineering, Technology"`` / ``"Engineering/Tech"`` -> individual field names."""
+    if isinstance(fields, (list, tuple)):
+        parts = fields
+    else:
+        parts = str(fields or "").replace("/", ",").split(",")
+    return [p.strip() for p in parts if p and p.strip()]
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def freeze(record):
+    """Read-only view of a college dict (lists become tuples)."""
+    return MappingProxyType({
+        key: tuple(value) if isinstance(value, list) else value
+        for key, value in record.items()
+    })
+
+
+class Catalog:
+    # (base version, positions) when made by ``with_changes``, for indexes that update incrementally
+    changed = None
+    # stat key of the file this snapshot was loaded from; equal in every worker that loaded the same file
+    source = None
+
+    def __init__(self, records, version=1):
+        self.version = version
+        self.records = tuple(r if isinstance(r, MappingProxyType) else freeze(r) for r in records)
+        self.by_id = {}
+        self._pos_by_id = {}
+        self._names = []
+        self._name_grams = defaultdict(set)
+        # normalised value -> sorted list of record positions
+        self._index = {"district": defaultdict(list), "type": defaultdict(list), "fields": defaultdict(list)}
+        # normalised value -> first display spelling seen
+        self._display = {"district": {}, "type": {}, "fields": {}}
+
+        points = []
+        for pos, c in enumerate(self.records):
+            if c.get("id") is not None:
+                self.by_id[c["id"]] = c
+                self._pos_by_id[c["id"]] = pos
+            location = coords(c)
+            if location:
+                points.append((pos,) + location)
+            name = normalize(c.get("name"))
+            self._names.append(name)
+            for gram in trigrams(name):
+                self._name_grams[gram].add(pos)
+            self._add("district", c.get("district"), pos)
+            self._add("type", c.get("type"), pos)
+            for field in split_fields(c.get("fields")):
+                self._add("fields", field, pos)
+
+        self._index = {facet: dict(values) for facet, values in self._index.items()}
+        self._sets = {
+            facet: {key: frozenset(positions) for key, positions in values.items()}
+            for facet, values in self._index.items()
+        }
+        self._name_grams = dict(self._name_grams)
+        self.geo = GeoIndex(points)
+        self._build_facets()
+
+    def _build_facets(self):
+        self.facets = {
+            facet: sorted(
+                ((self._display[facet][key], len(positions)) for key, positions in values.items()),
+                key=lambda item: item[0].lower(),
+            )
+            for facet, values in self._index.items()
+        }
+
+    def _add(self, facet, value, pos):
+        key = normalize(value)
+        if not key:
+            return
+        postings = self._index[facet][key]
+        # a record may repeat a field ("Engineering/Engineering"); index it once
+        if not postings or postings[-1] != pos:
+            postings.append(pos)
+        self._display[facet].setdefault(key, str(value).strip())
+
+    def _keys(self, record):
+        yield "district", normalize(record.get("district")), record.get("district")
+        yield "type", normalize(record.get("type")), record.get("type")
+        for field in split_fields(record.get("fields")):
+            yield "fields", normalize(field), field
+
+    def with_changes(self, records):
+        """New snapshot with ``records`` upserted by ``id``; only their index entries are rebuilt.
+
+        Replaced colleges keep their position, new ones are appended. Posting
+        lists, trigram sets and grid cells are copied only where a changed
+        college touches them, so this snapshot stays valid for its readers.
+        """
+        new = Catalog.__new__(Catalog)
+        new.version = self.version + 1
+        rows = list(self.records)
+        new.by_id = dict(self.by_id)
+        new._pos_by_id = dict(self._pos_by_id)
+        new._names = list(self._names)
+        new._name_grams = dict(self._name_grams)
+        new._index = {facet: dict(values) for facet, values in self._index.items()}
+        new._sets = {facet: dict(values) for facet, values in self._sets.items()}
+        new._display = {facet: dict(values) for facet, values in self._display.items()}
+        touched_grams, touched_keys = set(), set()
+        moved = {}  # position -> final location (or None); grid cells are updated once at the end
+
+        def postings(facet, key):
+            if (facet, key) not in touched_keys:
+                new._index[facet][key] = list(new._index[facet].get(key, ()))
+                touched_keys.add((facet, key))
+            return new._index[facet][key]
+
+        def grams(gram):
+            if gram not in touched_grams:
+                new._name_grams[gram] = set(new._name_grams.get(gram, ()))
+                touched_grams.add(gram)
+            return new._name_grams[gram]
+
+        for record in records:
+            record = record if isinstance(record, MappingProxyType) else freeze(record)
+            pos = new._pos_by_id.get(record.get("id"))
+            if pos is None:
+                pos = len(rows)
+                rows.append(record)
+                new._names.append("")
+            else:
+                old = rows[pos]
+                rows[pos] = record
+                for gram in trigrams(new._names[pos]):
+                    grams(gram).discard(pos)
+                for facet, key, _ in self._keys(old):
+                    if key:
+                        entries = postings(facet, key)
+                        i = bisect.bisect_left(entries, pos)
+                        if i < len(entries) and entries[i] == pos:
+                            del entries[i]
+            new.by_id[record["id"]] = record
+            new._pos_by_id[record["id"]] = pos
+            moved[pos] = coords(record)
+            name = normalize(record.get("name"))
+            new._names[pos] = name
+            for gram in trigrams(name):
+                grams(gram).add(pos)
+            for facet, key, display in self._keys(record):
+                if key:
+                    entries = postings(facet, key)
+                    i = bisect.bisect_left(entries, pos)
+                    if i == len(entries) or entries[i] != pos:
+                        entries.insert(i, pos)
+                    new._display[facet].setdefault(key, str(display).strip())
+
+        for gram in touched_grams:
+            if not new._name_grams[gram]:
+                del new._name_grams[gram]
+        for facet, key in touched_keys:
+            if new._index[facet][key]:
+                new._sets[facet][key] = frozenset(new._index[facet][key])
+            else:
+                del new._index[facet][key]
+                new._sets[facet].pop(key, None)
+                new._display[facet].pop(key, None)
+        new.records = tuple(rows)
+        new.changed = (self.version, tuple(sorted(moved)))
+        removed = [(pos,) + coords(self.records[pos]) for pos in moved
+                   if pos < len(self.records) and coords(self.records[pos])]
+        added = [(pos,) + location for pos, location in moved.items() if location]
+        new.geo = self.geo.updated(removed, added)
+        new._build_facets()
+        return new
+
+    def __len__(self):
+        return len(self.records)
+
+    def get(self, college_id):
+        return self.by_id.get(college_id)
+
+    def facet_values(self, facet):
+        return [value for value, _ in self.facets.get(facet, [])]
+
+    def postings(self, facet):
+        """Normalised value -> record positions (catalog order) for one facet."""
+        return self._index.get(facet, {})
+
+    def _search_candidates(self, search):
+        grams = trigrams(search)
+        if not grams:
+            return None
+        postings = sorted((self._name_grams.get(g, set()) for g in grams), key=len)
+        result = set(postings[0])
+        for p in postings[1:]:
+            if not result:
+                break
+            result &= p
+        return result
+
+    def filter(self, search="", district="", ctype="", field=""):
+        """Return matching records in catalog order.
+
+        Equality filters are answered from the hash indexes and intersected
+        smallest-first; ``search`` is a case-insensitive substring match on the
+        name, narrowed through the trigram index before the final check.
+        """
+        return [self.records[pos] for pos in self._filter_positions(search, district, ctype, field)]
+
+    def positions(self, **filters):
+        """Catalog positions of the records ``filter`` would return, in catalog order."""
+        return self._filter_positions(**filters)
+
+    def _filter_positions(self, search="", district="", ctype="", field=""):
+        search = normalize(search)
+        # (size, positions in catalog order, membership set)
+        sources = []
+        for facet, value in (("district", district), ("type", ctype), ("fields", field)):
+            if value:
+                key = normalize(value)
+                sources.append((
+                    len(self._index[facet].get(key, ())),
+                    self._index[facet].get(key, ()),
+                    self._sets[facet].get(key, frozenset()),
+                ))
+        if search:
+            candidates = self._search_candidates(search)
+            if candidates is not None:
+                sources.append((len(candidates), None, candidates))
+
+        if sources:
+            sources.sort(key=lambda s: s[0])
+            _, base, base_set = sources[0]
+            if base is None:
+                base = sorted(base_set)
+            others = [s[2] for s in sources[1:]]
+        elif not search:
+            return range(len(self.records))
+        else:
+            base = range(len(self.records))
+            others = []
+
+        matched = []
+        for pos in base:
+            if others and any(pos not in s for s in others):
+                continue
+            if search and search not in self._names[pos]:
+                continue
+            matched.append(pos)
+        return matched
+
+    def nearest(self, lat, lng, k=5, radius_km=None, ctype="", field="", exclude_id=None):
+        """``[(distance_km, record), ...]`` for the ``k`` closest located colleges."""
+        allowed = None
+        for facet, value in (("type", ctype), ("fields", field)):
+            if value:
+                positions = self._sets[facet].get(normalize(value), frozenset())
+                allowed = positions if allowed is None else allowed & positions
+        exclude = ()
+        if exclude_id in self._pos_by_id:
+            exclude = (self._pos_by_id[exclude_id],)
+        hits = self.geo.nearest(lat, lng, k=k, radius_km=radius_km, allowed=allowed, exclude=exclude)
+        return [(dist, self.records[pos]) for dist, pos in hits]
+
+    def nearby(self, college, k=3):
+        """Closest colleges to ``college``; same-district ones when it has no location."""
+        location = coords(college)
+        if location and self.geo:
+            return [c for _, c in self.nearest(*location, k=k, exclude_id=college.get("id"))]
+        return [
+            c for c in self.filter(district=college.get("district"))
+            if c.get("id") != college.get("id")
+        ][:k]
+
+    def page(self, page=1, per_page=6, **filters):
+        """Filter and slice; returns ``(items, total, total_pages)``.
+
+        Only the records on the requested page are looked up.
+        """
+        matched = self._filter_positions(**filters)
+        total = len(matched)
+        per_page = max(per_page, 1)
+        start = (max(page, 1) - 1) * per_page
+        total_pages = total // per_page + (1 if total % per_page else 0)
+        return [self.records[pos] for pos in matched[start:start + per_page]], total, total_pages
+
+
+def file_key(path):
+    """``(inode, size, mtime_ns)`` of a file, or None when it is missing; changes whenever the file does."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def read_json(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_catalog(path, version=1):
+    """Default ``CatalogLoader`` factory: parse the file into an in-memory ``Catalog``."""
+    return Catalog(read_json(path), version=version)
+
+
+class CatalogLoader:
+    """Versioned, hot-reloadable catalog for one JSON file.
+
+    ``factory(path, version)`` builds each snapshot; ``columnar.open_catalog``
+    is the memory-mapped alternative to the default ``load_catalog``.
+    """
+
+    def __init__(self, path, records=None, poll_interval=2.0, factory=load_catalog):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.factory = factory
+        self._lock = threading.Lock()  # serialises reloads, never taken by readers
+        self._stop = threading.Event()
+        self._thread = None
+        self._key = file_key(path)
+        self._bad_key = None
+        self._listeners = []
+        if records is not None or not self._key:
+            self._current = Catalog(records or [], version=1)
+        else:
+            self._current = factory(path, 1)
+            self._current.source = self._key
+
+    @property
+    def current(self):
+        return self._current
+
+    @property
+    def version(self):
+        return self._current.version
+
+    def reload(self, force=False):
+        """Rebuild the snapshot if the file changed; returns True when swapped."""
+        with self._lock:
+            key = file_key(self.path)
+            if key is None or (key in (self._key, self._bad_key) and not force):
+                return False
+            try:
+                snapshot = self.factory(self.path, self._current.version + 1)
+            except (OSError, ValueError) as e:
+                # half-written or broken file: keep serving the old snapshot
+                log.warning("Could not reload %s: %s", self.path, e)
+                self._bad_key = key
+                return False
+            self._key = snapshot.source = key
+            self._current = snapshot
+            log.info("Loaded %s v%d (%d colleges)", self.path, snapshot.version, len(snapshot))
+            self._notify(snapshot)
+            return True
+
+    def apply(self, records):
+        """Upsert ``records`` into the current snapshot without re-reading the file.
+
+        For callers that have just written the same records to ``path``: only
+        their index entries are rebuilt, and the file's new stat key is
+        adopted so the watcher doesn't reload it again.
+        """
+        with self._lock:
+            snapshot = self._current.with_changes(records)
+            self._key = snapshot.source = file_key(self.path)
+            self._current = snapshot
+            log.info("Applied %d change(s) to %s v%d", len(records), self.path, snapshot.version)
+            self._notify(snapshot)
+            return snapshot
+
+    def subscribe(self, callback):
+        """Call ``callback(catalog)`` now and after every reload, to build derived indexes."""
+        self._listeners.append(callback)
+        callback(self._current)
+        return callback
+
+    def _notify(self, snapshot):
+        for callback in self._listeners:
+            try:
+                callback(snapshot)
+            except Exception:
+                log.exception("Catalog listener %r failed for v%d", callback, snapshot.version)
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            self.reload()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._watch, name="catalog-watch", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
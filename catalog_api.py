@@ -0,0 +1,208 @@
+"""Versioned JSON API over the college catalog.
+
+``CatalogAPI(loader, search).init_app(app)`` registers
+
+* ``GET /api/v1/colleges``: the ``/colleges`` filters (``search``,
+  ``district``, ``type``, ``field``, ``sports_quota=yes|no``) with cursor
+  pagination: ``limit`` items per page and an opaque ``next_cursor`` to pass
+  back as ``cursor``. Without ``search`` colleges come in catalog order and
+  the cursor is a catalog position, so pages stay put while the catalog is
+  edited; with ``search`` they come ranked (with highlight offsets) and the
+  cursor is a rank offset. Colleges with a sports quota are looked up once
+  per catalog snapshot (by the first request that asks), so ``sports_quota``
+  narrows the positions like the other filters instead of every request
+  reading records until it has a page;
+* ``GET /api/v1/colleges/<id>``: one college.
+
+``fields=id,name,district`` picks the keys returned (``LIST_FIELDS`` by
+default for listings, everything for a single college).
+
+Responses carry a strong ETag computed from the catalog snapshot (its
+version and the stat key of the file it came from, so every worker that
+loaded the same file agrees), the query parameters the API reads
+(``QUERY_PARAMS``; anything else is ignored) and the content encoding. A
+matching ``If-None-Match`` is answered with a 304 before the catalog is
+touched. Bodies are serialised with ``orjson`` when it is installed,
+compressed per request with brotli or gzip at the fast levels from
+``assets``, and the last ``cache_size`` encoded bodies are kept, so repeated
+filter combinations cost a dict lookup.
+"""
+import base64
+import bisect
+import binascii
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from flask import Response, request
+
+from assets import compress, negotiate
+
+try:
+    import orjson
+except ImportError:  # optional: the standard library encoder
+    orjson = None
+
+LIST_FIELDS = ("id", "name", "district", "type", "fields")
+QUERY_PARAMS = ("search", "district", "type", "field", "sports_quota", "limit", "cursor", "fields")
+MAX_LIMIT = 100
+DEFAULT_LIMIT = 20
+API_CACHE_CONTROL = "public, no-cache"
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def dumps(payload):
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def encode_cursor(kind, value):
+    return base64.urlsafe_b64encode(f"{kind}{value}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, kind):
+    """The number in a cursor made by ``encode_cursor(kind, n)``; ``BadRequest`` otherwise."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        if raw[:1] == kind and raw[1:].isdigit():
+            return int(raw[1:])
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        pass
+    raise BadRequest("invalid cursor")
+
+
+def pick(record, fields):
+    if fields is None:
+        return dict(record)
+    return {key: record[key] for key in fields if key in record}
+
+
+class CatalogAPI:
+    def __init__(self, loader, search, cache_size=512):
+        self.loader = loader
+        self.search = search
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # etag -> encoded body
+        self._sports = None  # (catalog version, positions of colleges with a sports quota)
+        self._sports_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "not_modified": 0}
+
+    def init_app(self, app, prefix="/api/v1"):
+        app.add_url_rule(f"{prefix}/colleges", "api_colleges", self.list_colleges)
+        app.add_url_rule(f"{prefix}/colleges/<int:college_id>", "api_college", self.get_college)
+
+    def _sports_quota(self, catalog):
+        """Positions of the colleges with a sports quota, read once per catalog version."""
+        sports = self._sports
+        if sports is None or sports[0] != catalog.version:
+            with self._sports_lock:
+                sports = self._sports
+                if sports is None or sports[0] != catalog.version:
+                    sports = (catalog.version, frozenset(
+                        pos for pos, record in enumerate(catalog.records) if record.get("sports_quota")
+                    ))
+                    self._sports = sports
+        return sports[1]
+
+    # ---------- conditional, compressed responses ----------
+    def _respond(self, build):
+        """Run ``build(catalog) -> (status, payload)`` unless the client's copy is current."""
+        catalog = self.loader.current
+        encoding = negotiate(request.accept_encodings)
+        # only what the views read: made-up parameters can't get past the body cache
+        query = "&".join(f"{k}={request.args[k]}" for k in QUERY_PARAMS if k in request.args)
+        key = f"{catalog.version}|{catalog.source}|{request.path}?{query}"
+        etag = f"{hashlib.sha256(key.encode()).hexdigest()[:20]}-{encoding}"
+        if etag in request.if_none_match:
+            self.stats["not_modified"] += 1
+            resp = Response(status=304)
+        else:
+            with self._lock:
+                cached = self._cache.get(etag)
+                if cached is not None:
+                    self._cache.move_to_end(etag)
+                    self.stats["hits"] += 1
+            if cached is None:
+                try:
+                    status, payload = build(catalog)
+                except BadRequest as e:
+                    status, payload = 400, {"error": str(e)}
+                cached = (status, compress(dumps(payload), encoding))
+                with self._lock:
+                    self.stats["misses"] += 1
+                    if status == 200:
+                        self._cache[etag] = cached
+                        if len(self._cache) > self.cache_size:
+                            self._cache.popitem(last=False)
+            status, body = cached
+            resp = Response(body, status=status, mimetype="application/json")
+            if encoding != "identity":
+                resp.headers["Content-Encoding"] = encoding
+        resp.set_etag(etag)
+        resp.headers["Cache-Control"] = API_CACHE_CONTROL
+        resp.vary.add("Accept-Encoding")
+        return resp
+
+    # ---------- views ----------
+    def list_colleges(self):
+        return self._respond(self._list)
+
+    def get_college(self, college_id):
+        def build(catalog):
+            college = catalog.get(college_id)
+            if college is None:
+                return 404, {"error": "college not found"}
+            return 200, {"version": catalog.version, "data": pick(college, self._fields(None))}
+        return self._respond(build)
+
+    def _fields(self, default):
+        raw = request.args.get("fields", "")
+        fields = tuple(dict.fromkeys(f.strip() for f in raw.split(",") if f.strip()))
+        return fields or default
+
+    def _list(self, catalog):
+        args = request.args
+        try:
+            limit = int(args.get("limit", DEFAULT_LIMIT))
+        except ValueError:
+            raise BadRequest("limit must be a number")
+        limit = min(max(limit, 1), MAX_LIMIT)
+        sports = args.get("sports_quota", "").lower()
+        if sports not in ("", "yes", "no"):
+            raise BadRequest("sports_quota must be yes or no")
+        filters = {"district": args.get("district", ""), "ctype": args.get("type", ""), "field": args.get("field", "")}
+        fields = self._fields(LIST_FIELDS)
+        search = args.get("search", "").strip()
+        cursor = args.get("cursor")
+
+        positions = catalog.positions(**filters)
+        if sports:
+            wanted = sports == "yes"
+            quota = self._sports_quota(catalog)
+            positions = [pos for pos in positions if (pos in quota) == wanted]
+
+        if search:
+            within = positions if sports or any(filters.values()) else None
+            offset = decode_cursor(cursor, "o") if cursor else 0
+            hits, total = self.search.search(catalog, search, limit=limit, offset=offset, within=within)
+            items = []
+            for hit in hits:
+                item = pick(hit.record, fields)
+                item["highlights"] = hit.highlights
+                items.append(item)
+            next_offset = offset + len(hits)
+            next_cursor = encode_cursor("o", next_offset) if hits and next_offset < total else None
+        else:
+            start = bisect.bisect_right(positions, decode_cursor(cursor, "p")) if cursor else 0
+            page = positions[start:start + limit]
+            items = [pick(catalog.records[int(pos)], fields) for pos in page]
+            total = len(positions)
+            next_cursor = encode_cursor("p", int(page[-1])) if start + limit < total else None
+
+        return 200, {"version": catalog.version, "data": items, "next_cursor": next_cursor, "total": total}
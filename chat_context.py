@@ -0,0 +1,126 @@
+"""Token-budgeted prompt building for the career chat.
+
+The model used to get the system prompt plus a user's *entire* chat history on
+every turn. ``ContextBuilder`` keeps the prompt under a token budget instead:
+the most recent turns go in verbatim and everything older is folded into a
+rolling summary that the caller stores with the user. The summary is only
+recomputed when the verbatim tail no longer fits; it then jumps forward so the
+tail is back to ``recent_share`` of the budget, so a long conversation pays for
+a new summary every few turns rather than on every message.
+"""
+import threading
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # optional: fall back to a character heuristic
+    _encoding = None
+
+# per-message framing the chat format adds on top of the content
+MESSAGE_OVERHEAD = 4
+
+
+def count_tokens(text):
+    if _encoding is not None:
+        return len(_encoding.encode(text or ""))
+    # ~4 characters per token for English text
+    return max(1, (len(text or "") + 3) // 4)
+
+
+def message_tokens(message):
+    return count_tokens(message.get("content", "")) + MESSAGE_OVERHEAD
+
+
+def truncate_tokens(text, limit):
+    if count_tokens(text) <= limit:
+        return text
+    if _encoding is not None:
+        return _encoding.decode(_encoding.encode(text)[:limit]).rstrip() + "…"
+    return text[: limit * 4].rstrip() + "…"
+
+
+def extractive_summary(previous, turns, max_tokens):
+    """Cheap summariser: keep what the student asked and the first line of each answer."""
+    lines = [previous] if previous else []
+    for turn in turns:
+        content = " ".join((turn.get("content") or "").split())
+        if not content:
+            continue
+        first = content.split(". ")[0]
+        if turn.get("role") == "user":
+            who, first = "Student asked", first[:200]
+        else:
+            who, first = "Counselor said", first[:120]
+        lines.append(f"{who}: {first}")
+    text = "\n".join(lines)
+    # older material goes first when the summary outgrows its share
+    while count_tokens(text) > max_tokens and "\n" in text:
+        text = text.split("\n", 1)[1]
+    return truncate_tokens(text, max_tokens)
+
+
+class ContextBuilder:
+    def __init__(self, budget=2000, summary_tokens=300, recent_share=0.6, summarizer=extractive_summary):
+        self.budget = budget
+        self.summary_tokens = summary_tokens
+        self.recent_share = recent_share
+        self.summarizer = summarizer
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "summaries": 0, "tokens_before": 0, "tokens_after": 0}
+
+    def build(self, system_prompt, history, summary=None, offset=0):
+        """Return ``(messages, info)`` for the user's next completion call.
+
+        ``summary`` is the cached ``(upto, text)`` from the previous call: the
+        first ``upto`` turns of the conversation are folded into ``text``.
+        ``history`` holds the turns from position ``offset`` on, which must be
+        no later than ``upto`` (``ChatHistory.tail`` gives both). ``info``
+        has ``tokens_before`` (the turns passed in) and ``tokens_after`` (what
+        is actually sent) so callers can log the saving, and ``summary`` - the
+        value to cache for next time, new when ``info["resummarized"]``.
+        """
+        system = {"role": "system", "content": system_prompt}
+        costs = [message_tokens(m) for m in history]
+        fixed = message_tokens(system)
+        before = fixed + sum(costs)
+
+        upto, summary = summary or (0, "")
+        upto = min(max(upto - offset, 0), len(history))
+        summary = summary or ""
+        resummarized = False
+
+        if before <= self.budget and not offset:
+            messages, upto, summary = [system] + history, 0, ""
+        else:
+            tail = sum(costs[upto:])
+            room = self.budget - fixed - self.summary_tokens - MESSAGE_OVERHEAD
+            if tail > room:
+                # stale: fold older turns in until the tail is back under recent_share
+                target = max(int(room * self.recent_share), 0)
+                cut = len(history) - 1  # always keep the latest message verbatim
+                kept = costs[cut] if history else 0
+                while cut > upto and kept + costs[cut - 1] <= target:
+                    cut -= 1
+                    kept += costs[cut]
+                summary = self.summarizer(summary, history[upto:cut], self.summary_tokens)
+                upto = cut
+                resummarized = True
+                with self._lock:
+                    self.stats["summaries"] += 1
+            messages = [system]
+            if summary:
+                messages.append({"role": "system", "content": "Earlier in this conversation:\n" + summary})
+            messages += history[upto:]
+
+        after = sum(message_tokens(m) for m in messages)
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["tokens_before"] += before
+            self.stats["tokens_after"] += after
+        return messages, {
+            "tokens_before": before,
+            "tokens_after": after,
+            "summarized": upto + offset,
+            "summary": (upto + offset, summary),
+            "resummarized": resummarized,
+        }
@@ -0,0 +1,166 @@
+"""Tiered chat history: a hot in-memory tail per user over the message table.
+
+``ChatMessage`` rows are the durable, append-only log of every conversation;
+views used to load a user's whole ``messages`` relationship on every turn
+(to append, to count, to build the prompt), so a long conversation cost
+O(history) per message.
+
+``ChatHistory`` keeps, per recently active user, only the messages the next
+turn needs: the tail the model still sees verbatim (everything after the
+rolling summary's ``chat_summary_upto``, see ``chat_context``) and at least
+the last ``recent`` messages for the chat page. Older turns are compacted
+into the summary and left on disk; they are read back a page at a time,
+newest first, by ``page`` (keyset pagination on the message id). Entries of
+idle users are evicted least recently used first once there are more than
+``max_users``.
+
+Each access checks the newest message id of the user with one index probe,
+so a turn appended by another worker reloads the entry instead of serving a
+stale tail.
+"""
+import threading
+from collections import OrderedDict
+
+from sqlalchemy import delete, func, select
+
+from module import ChatMessage
+
+
+def _as_dict(row):
+    msg_id, role, content, created_at = row
+    return {"id": msg_id, "role": role, "content": content,
+            "at": created_at.isoformat(timespec="seconds") + "Z" if created_at else None}
+
+
+class _Hot:
+    __slots__ = ("start", "messages", "count")
+
+    def __init__(self, start, messages, count):
+        self.start = start        # position of messages[0] in the whole conversation
+        self.messages = messages  # dicts, oldest first
+        self.count = count        # messages in the whole conversation
+
+    @property
+    def last_id(self):
+        return self.messages[-1]["id"] if self.messages else None
+
+
+class ChatHistory:
+    def __init__(self, db, recent=30, max_users=10000):
+        self.db = db
+        self.recent = recent
+        self.max_users = max_users
+        self._hot = OrderedDict()  # user_id -> _Hot, least recently used first
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "loads": 0, "stale": 0, "evictions": 0, "appends": 0, "pages": 0}
+
+    # ---------- hot tier ----------
+    def _first(self, start, count):
+        # the hot part begins at ``start``, or earlier to hold the last ``recent`` messages
+        first = count - self.recent
+        if start is not None:
+            first = min(first, start)
+        return max(first, 0)
+
+    def _entry(self, user_id, start=None):
+        """Hot entry holding the messages from position ``start`` on and at least the last ``recent``."""
+        session = self.db.session
+        last_id = session.execute(select(func.max(ChatMessage.id)).where(ChatMessage.user_id == user_id)).scalar()
+        with self._lock:
+            entry = self._hot.get(user_id)
+            if entry is not None:
+                if entry.last_id == last_id and entry.start <= self._first(start, entry.count):
+                    self._hot.move_to_end(user_id)
+                    self.stats["hits"] += 1
+                    return entry
+                self.stats["stale"] += 1
+        # both reads stop at last_id, so a message appended meanwhile can't shift the positions
+        upto_last = (ChatMessage.user_id == user_id, ChatMessage.id <= (last_id or 0))
+        count = session.execute(select(func.count()).select_from(ChatMessage).where(*upto_last)).scalar_one()
+        begin = self._first(start, count)
+        rows = session.execute(
+            select(ChatMessage.id, ChatMessage.role, ChatMessage.content, ChatMessage.created_at)
+            .where(*upto_last)
+            .order_by(ChatMessage.id.desc())
+            .limit(count - begin)
+        ).all()
+        entry = _Hot(begin, [_as_dict(row) for row in reversed(rows)], count)
+        with self._lock:
+            self.stats["loads"] += 1
+            self._hot[user_id] = entry
+            self._hot.move_to_end(user_id)
+            while len(self._hot) > self.max_users:
+                self._hot.popitem(last=False)
+                self.stats["evictions"] += 1
+        return entry
+
+    def tail(self, user_id, upto=0):
+        """``(offset, messages)``: the conversation from position ``offset`` (at most ``upto``) on.
+
+        ``upto`` is how many turns the rolling summary covers; turns before
+        ``offset`` are dropped from memory (they stay in the table).
+        """
+        entry = self._entry(user_id, upto)
+        with self._lock:
+            keep = self._first(upto, entry.count)
+            if keep > entry.start:
+                del entry.messages[:keep - entry.start]
+                entry.start = keep
+            return entry.start, list(entry.messages)
+
+    def recent_messages(self, user_id):
+        """The last ``recent`` messages, oldest first."""
+        entry = self._entry(user_id)
+        with self._lock:
+            return entry.messages[-self.recent:] if self.recent else []
+
+    def count(self, user_id):
+        return self._entry(user_id).count
+
+    def append(self, user_id, role, content):
+        """Store a message, adding it to the user's hot entry; returns its dict."""
+        session = self.db.session
+        message = ChatMessage(user_id=user_id, role=role, content=content)
+        session.add(message)
+        session.flush()
+        item = _as_dict((message.id, role, content, message.created_at))
+        previous = session.execute(
+            select(func.max(ChatMessage.id)).where(ChatMessage.user_id == user_id, ChatMessage.id < message.id)
+        ).scalar()
+        session.commit()
+        with self._lock:
+            self.stats["appends"] += 1
+            entry = self._hot.get(user_id)
+            if entry is not None:
+                if entry.last_id == previous:
+                    entry.messages.append(item)
+                    entry.count += 1
+                else:
+                    # another request added a message we haven't seen; reload on next use
+                    del self._hot[user_id]
+        return item
+
+    def reset(self, user_id, content, role="assistant"):
+        """Delete the conversation and start a new one with ``content``."""
+        session = self.db.session
+        session.execute(delete(ChatMessage).where(ChatMessage.user_id == user_id))
+        with self._lock:
+            self._hot.pop(user_id, None)
+        return self.append(user_id, role, content)
+
+    # ---------- cold tier ----------
+    def page(self, user_id, before=None, limit=50):
+        """Up to ``limit`` messages older than id ``before`` (newest if None), oldest first.
+
+        Returns ``(messages, more)``; pass ``messages[0]["id"]`` as ``before``
+        for the page before.
+        """
+        query = select(ChatMessage.id, ChatMessage.role, ChatMessage.content, ChatMessage.created_at).where(
+            ChatMessage.user_id == user_id
+        )
+        if before is not None:
+            query = query.where(ChatMessage.id < before)
+        rows = self.db.session.execute(query.order_by(ChatMessage.id.desc()).limit(limit + 1)).all()
+        with self._lock:
+            self.stats["pages"] += 1
+        return [_as_dict(row) for row in reversed(rows[:limit])], len(rows) > limit
@@ -0,0 +1,271 @@
+"""Streaming, validated, atomic bulk import of college records.
+
+Uploads may be a JSON array (``[{...}, {...}]``) or NDJSON (one object per
+line). ``iter_records`` reads either in fixed-size chunks and decodes one
+record at a time, so memory is bounded by the largest single record rather
+than the file. Every record is checked by ``validate``; bad rows are
+collected with the line they start on, and nothing is written unless the
+whole upload is clean.
+
+``import_colleges`` writes the new catalog to a temp file next to the target
+and renames it over the original, so a reader sees either the old file or the
+complete new one. In ``replace`` mode the upload becomes the catalog; in
+``upsert`` mode records are merged into the current catalog by ``id`` and only
+the ones that actually changed are returned, for ``CatalogLoader.apply``.
+"""
+import codecs
+import json
+import os
+import tempfile
+
+CHUNK = 64 * 1024
+MAX_RECORD_BYTES = 1024 * 1024
+REQUIRED = ("id", "name")
+TEXT_FIELDS = ("name", "district", "type", "description", "contact", "email", "address", "website")
+
+
+class ImportFailed(ValueError):
+    """The upload had bad rows (``errors`` is a list of ``(line, message)``)."""
+
+    def __init__(self, errors):
+        super().__init__(f"{len(errors)} invalid record(s)")
+        self.errors = errors
+
+
+def validate(record):
+    """List of problems with one college record (empty when it is fine)."""
+    if not isinstance(record, dict):
+        return ["record is not a JSON object"]
+    problems = []
+    for key in REQUIRED:
+        if key not in record:
+            problems.append(f"missing '{key}'")
+    cid = record.get("id")
+    if "id" in record and (not isinstance(cid, int) or isinstance(cid, bool) or cid <= 0):
+        problems.append("'id' must be a positive integer")
+    for key in TEXT_FIELDS:
+        if key in record and record[key] is not None and not isinstance(record[key], str):
+            problems.append(f"'{key}' must be a string")
+    if "name" in record and isinstance(record["name"], str) and not record["name"].strip():
+        problems.append("'name' is empty")
+    fields = record.get("fields")
+    if fields is not None and not isinstance(fields, str) and not (
+        isinstance(fields, list) and all(isinstance(f, str) for f in fields)
+    ):
+        problems.append("'fields' must be a string or a list of strings")
+    for key in ("courses_offered", "facilities"):
+        value = record.get(key)
+        if value is not None and not isinstance(value, list):
+            problems.append(f"'{key}' must be a list")
+    if ("lat" in record) != ("lng" in record):
+        problems.append("'lat' and 'lng' must be given together")
+    elif "lat" in record:
+        lat, lng = record["lat"], record["lng"]
+        if not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in (lat, lng)):
+            problems.append("'lat'/'lng' must be numbers")
+        elif not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            problems.append("'lat'/'lng' out of range")
+    return problems
+
+
+def iter_records(stream, max_record_bytes=MAX_RECORD_BYTES):
+    """Yield ``(line, record, error)`` from a binary JSON-array or NDJSON stream.
+
+    ``error`` is None for a parsed record. NDJSON continues after a broken
+    line; a broken JSON array stops, since there is no safe place to resume.
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder("utf-8-sig")()
+    buf, pos, line, eof = "", 0, 1, False
+
+    def fill():
+        # append the next chunk, dropping what has already been consumed
+        nonlocal buf, pos, eof
+        chunk = stream.read(CHUNK)
+        if not chunk:
+            eof = True
+        buf = buf[pos:] + text.decode(chunk, final=not chunk)
+        pos = 0
+
+    def skip(chars):
+        # advance past ``chars``, counting newlines; False at end of input
+        nonlocal pos, line
+        while True:
+            start = pos
+            while pos < len(buf) and buf[pos] in chars:
+                pos += 1
+            line += buf.count("\n", start, pos)
+            if pos < len(buf):
+                return True
+            if eof:
+                return False
+            fill()
+
+    def close():
+        # past the closing ']': only whitespace may follow
+        nonlocal pos
+        pos += 1
+        return "unexpected data after the closing ']'" if skip(" \t\r\n") else None
+
+    fill()
+    if not skip(" \t\r\n"):
+        return
+    array = buf[pos] == "["
+    if array:
+        pos += 1
+        if not skip(" \t\r\n"):
+            yield line, None, "unexpected end of file (missing ']')"
+            return
+        if buf[pos] == "]":
+            error = close()
+            if error:
+                yield line, None, error
+            return
+
+    while True:
+        if not array:
+            # NDJSON: one record per line, so a bad line can be skipped
+            if not skip(" \t\r\n"):
+                return
+            end = buf.find("\n", pos)
+            while end < 0 and not eof and len(buf) - pos <= max_record_bytes:
+                fill()
+                end = buf.find("\n", pos)
+            end = len(buf) if end < 0 else end
+            if end - pos > max_record_bytes:
+                yield line, None, f"record is larger than {max_record_bytes} bytes"
+                return
+            try:
+                record = json.loads(buf[pos:end])
+            except ValueError as e:
+                yield line, None, f"invalid JSON: {e.msg} (column {e.colno})"
+            else:
+                yield line, record, None
+            pos = end
+            continue
+        while True:
+            try:
+                record, end = decoder.raw_decode(buf, pos)
+                break
+            except ValueError as e:
+                too_big = len(buf) - pos > max_record_bytes
+                if eof or too_big:
+                    msg = f"record is larger than {max_record_bytes} bytes" if too_big and not eof else f"invalid JSON: {e.msg}"
+                    yield line + buf.count("\n", pos, e.pos), None, msg
+                    return
+                fill()
+        yield line, record, None
+        line += buf.count("\n", pos, end)
+        pos = end
+        # exactly one ',' before the next record and none before the ']'
+        if not skip(" \t\r\n"):
+            yield line, None, "unexpected end of file (missing ']')"
+            return
+        if buf[pos] == "]":
+            error = close()
+            if error:
+                yield line, None, error
+            return
+        if buf[pos] != ",":
+            yield line, None, "expected ',' or ']' after a record"
+            return
+        pos += 1
+        if not skip(" \t\r\n"):
+            yield line, None, "unexpected end of file (missing ']')"
+            return
+        if buf[pos] in ",]":
+            yield line, None, "trailing ',' before ']'" if buf[pos] == "]" else "extra ',' between records"
+            return
+
+
+def write_colleges(path, records):
+    """Write ``records`` (any iterable) as a JSON array to ``path`` via temp file + rename."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".import-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write("[\n")
+            for i, record in enumerate(records):
+                f.write((",\n" if i else "") + json.dumps(record, ensure_ascii=False))
+            f.write("\n]\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _checked(stream, errors, max_errors):
+    """Valid records from ``stream``; problems are appended to ``errors``."""
+    seen = set()
+    for line, record, error in iter_records(stream):
+        if error:
+            errors.append((line, error))
+        else:
+            problems = validate(record)
+            if not problems and record["id"] in seen:
+                problems = [f"duplicate id {record['id']}"]
+            if problems:
+                errors.append((line, "; ".join(problems)))
+            else:
+                seen.add(record["id"])
+                yield record
+        if len(errors) >= max_errors:
+            errors.append((line, f"stopped after {max_errors} errors"))
+            return
+
+
+def import_colleges(stream, path, mode="replace", current=None, max_errors=1000):
+    """Import an uploaded binary stream into the catalog file at ``path``.
+
+    Returns ``(count, changed)``: records in the upload and, for ``upsert``,
+    the records that differ from ``current`` (a ``Catalog``). Raises
+    ``ImportFailed`` with every bad row; the file is untouched in that case.
+    """
+    errors = []
+    if mode == "replace":
+        count = 0
+
+        def counted():
+            nonlocal count
+            for record in _checked(stream, errors, max_errors):
+                count += 1
+                yield record
+            if errors:
+                raise ImportFailed(errors)
+
+        write_colleges(path, counted())
+        return count, None
+
+    if mode != "upsert":
+        raise ValueError(f"unknown import mode {mode!r}")
+    count = 0
+    changed = {}
+    for record in _checked(stream, errors, max_errors):
+        count += 1
+        existing = current.get(record["id"]) if current is not None else None
+        if existing is None or _thawed(existing) != record:
+            changed[record["id"]] = record
+    if errors:
+        raise ImportFailed(errors)
+    if changed:
+        existing_ids = set()
+
+        def merged():
+            for record in current.records if current is not None else ():
+                existing_ids.add(record.get("id"))
+                yield changed.get(record.get("id"), _thawed(record))
+            for cid, record in changed.items():
+                if cid not in existing_ids:
+                    yield record
+
+        write_colleges(path, merged())
+    return count, list(changed.values())
+
+
+def _thawed(record):
+    """Plain dict for a frozen catalog record (tuples back to lists), for comparing and writing."""
+    return {key: list(value) if isinstance(value, tuple) else value for key, value in record.items()}
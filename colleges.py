@@ -1,21 +1,24 @@
-import json
 import os
 from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
 
+from catalog import CatalogLoader
+from college_import import ImportFailed, import_colleges, write_colleges
+
 app = Flask(__name__)
 app.secret_key = "supersecretkey"
 
 DATA_FILE = os.path.join(os.path.dirname(__file__), "data", "colleges_jk.json")
 
+# Parsed once; later edits to the file are reloaded in the background
+catalog_loader = CatalogLoader(DATA_FILE).start()
+
 def load_colleges():
-    if not os.path.exists(DATA_FILE):
-        return []
-    with open(DATA_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return catalog_loader.current.records
 
 def save_colleges(data):
-    with open(DATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    # temp file + rename: readers never see a half-written file
+    write_colleges(DATA_FILE, data)
+    catalog_loader.reload()
 
 @app.route("/colleges")
 def colleges_list():
@@ -35,7 +38,7 @@ def colleges_list():
         colleges = [c for c in colleges if not c.get("sports_quota")]
 
     # simple sort by name
-    colleges.sort(key=lambda x: x["name"])
+    colleges = sorted(colleges, key=lambda x: x["name"])
     # pagination (simple)
     page = int(request.args.get("page", 1))
     per_page = 20
@@ -46,27 +49,52 @@ def colleges_list():
 
     return render_template("colleges_list.html", colleges=page_items, page=page, total=total, per_page=per_page)
 
-@app.route("/college/<college_id>")
+@app.route("/college/<int:college_id>")
 def college_detail(college_id):
-    colleges = load_colleges()
-    college = next((c for c in colleges if c["id"] == college_id), None)
+    college = catalog_loader.current.get(college_id)
     if not college:
         flash("College not found", "danger")
         return redirect(url_for("colleges_list"))
-    return render_template("college_detail.html", college=college)
+    nearby = catalog_loader.current.nearby(college, k=3)
+    return render_template("college_detail.html", college=college, nearby=nearby)
 
 # Simple admin endpoint to upload/replace JSON (for local use only; secure in production)
+# Accepts a JSON array or NDJSON, streamed and validated record by record. mode=replace swaps
+# in the upload as the whole catalog; mode=upsert merges it by id and only re-indexes what changed.
 @app.route("/admin/upload_colleges", methods=["GET", "POST"])
 def admin_upload_colleges():
     if request.method == "POST":
+        wants_json = request.accept_mimetypes.best == "application/json"
         file = request.files.get("file")
         if not file:
+            if wants_json:
+                return jsonify({"ok": False, "error": "No file uploaded"}), 400
             flash("No file uploaded", "danger")
             return redirect(url_for("admin_upload_colleges"))
+        mode = request.form.get("mode", "replace")
         try:
-            data = json.load(file)
-            save_colleges(data)
-            flash("College data updated", "success")
-        except Exception as e:
-            flash(f"Failed to parse JSON: {e}", "danger")
+            count, changed = import_colleges(file.stream, DATA_FILE, mode=mode, current=catalog_loader.current)
+        except ImportFailed as e:
+            if wants_json:
+                return jsonify({"ok": False, "errors": [{"line": line, "error": msg} for line, msg in e.errors]}), 400
+            shown = "; ".join(f"line {line}: {msg}" for line, msg in e.errors[:5])
+            more = f" (+{len(e.errors) - 5} more)" if len(e.errors) > 5 else ""
+            flash(f"Import rejected, nothing was changed. {shown}{more}", "danger")
+            return render_template("admin_upload.html", errors=e.errors)
+        except (OSError, ValueError) as e:
+            if wants_json:
+                return jsonify({"ok": False, "error": str(e)}), 400
+            flash(f"Import failed: {e}", "danger")
+            return render_template("admin_upload.html")
+
+        if changed is None:
+            catalog_loader.reload()
+        elif changed:
+            catalog_loader.apply(changed)
+        result = {"ok": True, "mode": mode, "records": count, "version": catalog_loader.version}
+        if changed is not None:
+            result["changed"] = len(changed)
+        if wants_json:
+            return jsonify(result)
+        flash(f"College data updated ({count} records, catalog v{result['version']})", "success")
     return render_template("admin_upload.html")
@@ -0,0 +1,530 @@
+"""Compact, memory-mapped college catalog shared by every worker process.
+
+A ``Catalog`` keeps every college as a Python dict plus Python-level indexes,
+so each gunicorn worker pays for its own copy. ``compile_catalog`` instead
+writes the catalog once into a directory of flat files:
+
+* columns, one value per college: ``ids``, ``lat``/``lng`` (NaN when the
+  college has no usable location), and ``name``/``district``/``type``/
+  ``fields`` as codes into an interned string table (each distinct string is
+  stored once, so a district or type is a 4-byte code per college);
+* facet postings (normalised value -> sorted positions) and the grid cells
+  of the spatial index, as offset + position arrays;
+* normalised names, newline-separated, for substring search;
+* whatever else a record carries (descriptions, courses, ...) as one small
+  JSON object per college, plus its key order.
+
+``ColumnarCatalog`` maps those files read-only, so the pages are shared
+through the OS page cache by every process that opens them, and builds a
+record dict only when one is asked for (a page of results, a detail view).
+It answers the same queries as ``Catalog`` with the same results.
+
+``open_catalog`` names the directory after the source file's stat key under
+a cache directory; the first worker to see a new file compiles it under a
+file lock and the others wait and map the result, so it is compiled once per
+change rather than once per worker.
+"""
+import json
+import logging
+import math
+import mmap
+import operator
+import os
+import re
+import shutil
+import tempfile
+import threading
+from array import array
+from collections import OrderedDict
+from collections.abc import Mapping, Sequence
+
+import numpy as np
+
+from catalog import Catalog, file_key, freeze, normalize, read_json, split_fields
+from college_import import iter_records
+from geo import EARTH_RADIUS_KM, GeoIndex, coords
+
+try:
+    import fcntl
+except ImportError:  # no flock (Windows): workers may compile concurrently, rename keeps it safe
+    fcntl = None
+
+log = logging.getLogger(__name__)
+
+FORMAT = 1
+FACETS = ("district", "type", "fields")
+STRING_COLUMNS = ("name", "district", "type", "fields")
+PER_CELL = 8  # same grid density as GeoIndex
+
+
+# ---------- compiling ----------
+class _StringTable:
+    def __init__(self):
+        self.ids = {}
+        self.offsets = array("q", [0])
+        self.data = bytearray()
+
+    def add(self, text):
+        sid = self.ids.get(text)
+        if sid is None:
+            sid = self.ids[text] = len(self.offsets) - 1
+            self.data += text.encode("utf-8")
+            self.offsets.append(len(self.data))
+        return sid
+
+
+def _in_column(key, value, location):
+    """Whether ``record[key]`` can be rebuilt exactly from the columns."""
+    if key == "id":
+        return type(value) is int and -2 ** 63 <= value < 2 ** 63
+    if key in STRING_COLUMNS:
+        return isinstance(value, str)
+    if key in ("lat", "lng"):
+        return type(value) is float and location is not None and value == location[key == "lng"]
+    return False
+
+
+def compile_catalog(records, directory):
+    """Write ``records`` (any iterable of college dicts) as a columnar catalog into ``directory``."""
+    os.makedirs(directory, exist_ok=True)
+    strings = _StringTable()
+    ids, has_id, lat, lng = array("q"), array("b"), array("d"), array("d")
+    columns = {key: array("i") for key in STRING_COLUMNS}
+    layouts, layout_ids, layout = [], {}, array("i")
+    extras, extra_offsets = bytearray(), array("q", [0])
+    names, name_offsets = bytearray(), array("q", [0])
+    keys = {facet: {} for facet in FACETS}     # normalised value -> code, first seen first
+    display = {facet: [] for facet in FACETS}  # code -> first display spelling
+    pairs = {facet: (array("i"), array("i")) for facet in FACETS}  # (code, position)
+
+    for pos, record in enumerate(records):
+        cid = record.get("id")
+        if cid is not None and not _in_column("id", cid, None):
+            raise ValueError(f"college {pos} has a non-integer id {cid!r}")
+        location = coords(record)
+        order = tuple(record)
+        if order not in layout_ids:
+            layout_ids[order] = len(layouts)
+            layouts.append(order)
+        layout.append(layout_ids[order])
+        ids.append(cid if cid is not None else 0)
+        has_id.append(cid is not None)
+        lat.append(location[0] if location else math.nan)
+        lng.append(location[1] if location else math.nan)
+        for key in STRING_COLUMNS:
+            value = record.get(key)
+            columns[key].append(strings.add(value) if isinstance(value, str) else -1)
+        rest = {key: value for key, value in record.items() if not _in_column(key, value, location)}
+        if rest:
+            extras += json.dumps(rest, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        extra_offsets.append(len(extras))
+        names += normalize(record.get("name")).encode("utf-8") + b"\n"
+        name_offsets.append(len(names))
+
+        seen = set()
+        values = [("district", record.get("district")), ("type", record.get("type"))]
+        values += [("fields", field) for field in split_fields(record.get("fields"))]
+        for facet, value in values:
+            key = normalize(value)
+            if not key or (facet, key) in seen:
+                continue
+            seen.add((facet, key))
+            code = keys[facet].get(key)
+            if code is None:
+                code = keys[facet][key] = len(display[facet])
+                display[facet].append(str(value).strip())
+            pairs[facet][0].append(code)
+            pairs[facet][1].append(pos)
+
+    def save(name, values, dtype):
+        np.save(os.path.join(directory, name + ".npy"), np.asarray(values, dtype=dtype))
+
+    def save_blob(name, data, offsets):
+        with open(os.path.join(directory, name + ".bin"), "wb") as f:
+            f.write(data)
+        save(name + "_offsets", offsets, np.int64)
+
+    count = len(ids)
+    ids_arr = np.asarray(ids, dtype=np.int64)
+    with_id = np.flatnonzero(np.asarray(has_id, dtype=bool))
+    id_order = with_id[np.argsort(ids_arr[with_id], kind="stable")]
+    save("ids", ids_arr, np.int64)
+    save("id_order", id_order, np.int64)
+    save("sorted_ids", ids_arr[id_order], np.int64)
+    save("lat", lat, np.float64)
+    save("lng", lng, np.float64)
+    save("layout", layout, np.int32)
+    for key in STRING_COLUMNS:
+        save(key, columns[key], np.int32)
+    save_blob("strings", strings.data, strings.offsets)
+    save_blob("extras", extras, extra_offsets)
+    save_blob("names", names, name_offsets)
+
+    for facet in FACETS:
+        codes = np.asarray(pairs[facet][0], dtype=np.int64)
+        positions = np.asarray(pairs[facet][1], dtype=np.int32)
+        order = np.argsort(codes, kind="stable")  # positions stay in catalog order within a value
+        counts = np.bincount(codes, minlength=len(display[facet]))
+        save(f"{facet}_positions", positions[order], np.int32)
+        save(f"{facet}_offsets", np.concatenate(([0], np.cumsum(counts))), np.int64)
+
+    meta = {
+        "format": FORMAT,
+        "count": count,
+        "layouts": [list(order) for order in layouts],
+        "facets": {facet: {"keys": list(keys[facet]), "display": display[facet]} for facet in FACETS},
+        "geo": _compile_geo(directory, np.asarray(lat), np.asarray(lng)),
+    }
+    with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    return meta
+
+
+def _cell_keys(cx, cy):
+    # (cx, cy) -> one sortable int64, ordered like the tuples
+    return cx * 2 ** 32 + (cy + 2 ** 31)
+
+
+def _compile_geo(directory, lat, lng):
+    """Grid cells of the spatial index, laid out like ``GeoIndex`` builds them."""
+    located = np.flatnonzero(~np.isnan(lat))
+    geo = {"size": len(located), "cos0": 1.0, "cell_km": 1.0, "bounds": None}
+    arrays = {"cell_keys": np.zeros(0, np.int64), "cell_offsets": np.zeros(1, np.int64),
+              "cell_x": np.zeros(0), "cell_y": np.zeros(0), "cell_lat": np.zeros(0), "cell_lng": np.zeros(0),
+              "cell_pos": np.zeros(0, np.int32)}
+    if len(located):
+        plat, plng = lat[located], lng[located]
+        # same arithmetic as GeoIndex, so cells and distances come out identical
+        lat0 = sum(plat.tolist()) / len(located)
+        cos0 = math.cos(math.radians(lat0))
+        x = np.radians(plng) * cos0 * EARTH_RADIUS_KM
+        y = np.radians(plat) * EARTH_RADIUS_KM
+        area = max(float(x.max() - x.min()), 1.0) * max(float(y.max() - y.min()), 1.0)
+        cell_km = max(math.sqrt(area * PER_CELL / len(located)), 0.05)
+        cx = np.floor(x / cell_km).astype(np.int64)
+        cy = np.floor(y / cell_km).astype(np.int64)
+        order = np.argsort(_cell_keys(cx, cy), kind="stable")
+        keys = _cell_keys(cx, cy)[order]
+        cell_keys, starts = np.unique(keys, return_index=True)
+        arrays = {"cell_keys": cell_keys, "cell_offsets": np.append(starts, len(keys)),
+                  "cell_x": x[order], "cell_y": y[order], "cell_lat": plat[order], "cell_lng": plng[order],
+                  "cell_pos": located[order].astype(np.int32)}
+        geo.update(cos0=cos0, cell_km=cell_km,
+                   bounds=[int(cx.min()), int(cx.max()), int(cy.min()), int(cy.max())])
+    for name, values in arrays.items():
+        np.save(os.path.join(directory, name + ".npy"), values)
+    return geo
+
+
+# ---------- mapped views ----------
+def _load(directory, name):
+    # a plain ndarray view of the mapping: np.memmap's per-slice bookkeeping costs more than the lookups
+    return np.load(os.path.join(directory, name + ".npy"), mmap_mode="r").view(np.ndarray)
+
+
+class _Blob:
+    """Byte strings stored back to back in a mapped file, addressed by an offsets array."""
+
+    def __init__(self, directory, name):
+        self.offsets = _load(directory, name + "_offsets")
+        with open(os.path.join(directory, name + ".bin"), "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __getitem__(self, i):
+        return self.data[int(self.offsets[i]):int(self.offsets[i + 1])]
+
+
+class _Positions:
+    """Sorted record positions backed by an array slice; a read-only set for ``in`` and ``&``."""
+
+    __slots__ = ("array",)
+
+    def __init__(self, positions):
+        self.array = positions
+
+    def __len__(self):
+        return len(self.array)
+
+    def __iter__(self):
+        return iter(self.array.tolist())
+
+    def __contains__(self, pos):
+        i = int(np.searchsorted(self.array, pos))
+        return i < len(self.array) and self.array[i] == pos
+
+    def __and__(self, other):
+        return _Positions(np.intersect1d(self.array, other.array, assume_unique=True))
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self.array, dtype=dtype)
+
+
+_EMPTY = _Positions(np.zeros(0, dtype=np.int32))
+
+
+class _Postings(Mapping):
+    """Normalised facet value -> ``_Positions``; unknown values map to an empty set."""
+
+    def __init__(self, keys, offsets, positions):
+        self._codes = {key: code for code, key in enumerate(keys)}
+        self._offsets = offsets
+        self._positions = positions
+
+    def __getitem__(self, key):
+        code = self._codes[key]
+        return _Positions(self._positions[self._offsets[code]:self._offsets[code + 1]])
+
+    def get(self, key, default=None):
+        return self[key] if key in self._codes else _EMPTY
+
+    def __iter__(self):
+        return iter(self._codes)
+
+    def __len__(self):
+        return len(self._codes)
+
+
+class _IdMap(Mapping):
+    """College id -> ``value(position)`` by binary search over the sorted id column."""
+
+    def __init__(self, sorted_ids, order, value):
+        self._sorted = sorted_ids
+        self._order = order
+        self._value = value
+
+    def __getitem__(self, cid):
+        if isinstance(cid, (int, np.integer)) and not isinstance(cid, bool) and -2 ** 63 <= cid < 2 ** 63:
+            # the last of any duplicates wins, as in a dict built in catalog order
+            i = int(np.searchsorted(self._sorted, cid, side="right")) - 1
+            if i >= 0 and self._sorted[i] == cid:
+                return self._value(int(self._order[i]))
+        raise KeyError(cid)
+
+    def __iter__(self):
+        return iter(dict.fromkeys(self._sorted.tolist()))
+
+    def __len__(self):
+        return len(np.unique(self._sorted))
+
+
+class _Records(Sequence):
+    """Lazily materialised, frozen record dicts with a small LRU of recently used ones."""
+
+    def __init__(self, catalog, cache_size):
+        self._catalog = catalog
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._catalog.count
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[pos] for pos in range(*i.indices(len(self)))]
+        pos = operator.index(i)
+        if pos < 0:
+            pos += len(self)
+        if not 0 <= pos < len(self):
+            raise IndexError("catalog index out of range")
+        with self._lock:
+            record = self._cache.get(pos)
+            if record is not None:
+                self._cache.move_to_end(pos)
+                return record
+        record = self._catalog._materialise(pos)
+        with self._lock:
+            self._cache[pos] = record
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return record
+
+
+class _MappedCells:
+    """``GeoIndex.cells`` over the mapped cell arrays: ``(cx, cy)`` -> point tuples."""
+
+    def __init__(self, directory):
+        self._keys = _load(directory, "cell_keys")
+        self._offsets = _load(directory, "cell_offsets")
+        self._columns = [_load(directory, name) for name in ("cell_x", "cell_y", "cell_pos", "cell_lat", "cell_lng")]
+
+    def __len__(self):
+        return len(self._keys)
+
+    def get(self, cell, default=()):
+        key = _cell_keys(*cell)
+        i = int(np.searchsorted(self._keys, key))
+        if i == len(self._keys) or self._keys[i] != key:
+            return default
+        a, b = self._offsets[i], self._offsets[i + 1]
+        return list(zip(*(column[a:b].tolist() for column in self._columns)))
+
+
+class _MappedGeo(GeoIndex):
+    """``GeoIndex`` whose cells are read from the mapped arrays; ``nearest`` is inherited."""
+
+    def __init__(self, directory, geo):
+        self.size = geo["size"]
+        self.cell_km = geo["cell_km"]
+        self._cos0 = geo["cos0"]
+        self.cells = _MappedCells(directory)
+        if geo["bounds"]:
+            self._bounds = tuple(geo["bounds"])
+
+
+class ColumnarCatalog(Catalog):
+    """A ``Catalog`` over a compiled directory; nothing but small metadata lives on the heap."""
+
+    def __init__(self, directory, version=1, cache_size=1024):
+        with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.directory = directory
+        self.version = version
+        self.count = meta["count"]
+        self._layouts = [tuple(order) for order in meta["layouts"]]
+        self._layout = _load(directory, "layout")
+        self._ids = _load(directory, "ids")
+        self._lat = _load(directory, "lat")
+        self._lng = _load(directory, "lng")
+        self._columns = {key: _load(directory, key) for key in STRING_COLUMNS}
+        self._strings = _Blob(directory, "strings")
+        self._extras = _Blob(directory, "extras")
+        self._name_blob = _Blob(directory, "names")
+
+        self.records = _Records(self, cache_size)
+        sorted_ids, id_order = _load(directory, "sorted_ids"), _load(directory, "id_order")
+        self._pos_by_id = _IdMap(sorted_ids, id_order, int)
+        self.by_id = _IdMap(sorted_ids, id_order, self.records.__getitem__)
+        self._index = {
+            facet: _Postings(meta["facets"][facet]["keys"], _load(directory, f"{facet}_offsets"),
+                             _load(directory, f"{facet}_positions"))
+            for facet in FACETS
+        }
+        self._sets = self._index  # _Positions already answer ``in`` and ``&``
+        self._display = {
+            facet: dict(zip(meta["facets"][facet]["keys"], meta["facets"][facet]["display"])) for facet in FACETS
+        }
+        self.geo = _MappedGeo(directory, meta["geo"])
+        self._build_facets()
+
+    def _materialise(self, pos):
+        raw = self._extras[pos]
+        extra = json.loads(raw) if raw else {}
+        record = {}
+        for key in self._layouts[self._layout[pos]]:
+            if key in extra:
+                record[key] = extra[key]
+            elif key == "id":
+                record[key] = int(self._ids[pos])
+            elif key == "lat":
+                record[key] = float(self._lat[pos])
+            elif key == "lng":
+                record[key] = float(self._lng[pos])
+            else:
+                record[key] = self._strings[self._columns[key][pos]].decode("utf-8")
+        return freeze(record)
+
+    def with_changes(self, records):
+        """Upserts go through a regular in-memory ``Catalog``; the next reload maps a fresh compile."""
+        return Catalog(self.records, version=self.version).with_changes(records)
+
+    def _scan_names(self, search):
+        """Positions whose normalised name contains ``search``, by a vectorised scan of the mapped names."""
+        data = np.frombuffer(self._name_blob.data, dtype=np.uint8)
+        needle = np.frombuffer(search.encode("utf-8"), dtype=np.uint8)
+        # candidate starts for the first byte, narrowed one byte at a time
+        hits = np.flatnonzero(data[:max(len(data) - len(needle) + 1, 0)] == needle[0])
+        for j in range(1, len(needle)):
+            hits = hits[data[hits + j] == needle[j]]
+        positions = np.searchsorted(self._name_blob.offsets, hits, side="right") - 1
+        # already sorted: keep the first hit per college
+        return positions[np.concatenate(([True], positions[1:] != positions[:-1]))[:len(positions)]]
+
+    def _filter_positions(self, search="", district="", ctype="", field=""):
+        search = normalize(search)
+        arrays = [
+            self._index[facet].get(normalize(value)).array
+            for facet, value in (("district", district), ("type", ctype), ("fields", field)) if value
+        ]
+        if not arrays and not search:
+            return range(self.count)
+        matched = None
+        if arrays:
+            arrays.sort(key=len)
+            matched = arrays[0]
+            for other in arrays[1:]:
+                matched = np.intersect1d(matched, other, assume_unique=True)
+        if search:
+            needle = search.encode("utf-8")
+            if matched is not None and len(matched) * 8 < self.count:
+                # few candidates left: check their names rather than scan every name
+                names = self._name_blob
+                matched = np.asarray([pos for pos in matched.tolist() if needle in names[pos]], dtype=np.int64)
+            else:
+                hits = self._scan_names(search)
+                matched = hits if matched is None else np.intersect1d(matched, hits, assume_unique=True)
+        return matched
+
+
+# ---------- opening ----------
+def _stream_records(path):
+    with open(path, "rb") as f:
+        for line, record, error in iter_records(f):
+            if error:
+                raise ValueError(f"{path}:{line}: {error}")
+            yield record
+
+
+def open_catalog(path, version=1, cache_dir=None):
+    """``ColumnarCatalog`` for the JSON file at ``path``, compiling it into ``cache_dir`` if needed.
+
+    Falls back to an in-memory ``Catalog`` for files the columnar format
+    can't hold (non-integer ids), and when ``cache_dir`` can't be written
+    (a read-only filesystem).
+    """
+    cache_dir = cache_dir or os.path.join(os.path.dirname(os.path.abspath(path)), ".catalog")
+    key = file_key(path)
+    if key is None:
+        raise OSError(f"{path} does not exist")
+    stem = os.path.splitext(os.path.basename(path))[0]
+    directory = os.path.join(cache_dir, f"{stem}-{key[0]}-{key[1]}-{key[2]}-f{FORMAT}")
+    if not os.path.exists(os.path.join(directory, "meta.json")):
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            _compile_once(path, cache_dir, stem, directory)
+        except ValueError as e:
+            log.warning("Serving %s from memory, it can't be compiled: %s", path, e)
+            return Catalog(read_json(path), version=version)
+        except OSError as e:
+            if file_key(path) is None:
+                raise
+            log.warning("Serving %s from memory, %s is not writable: %s", path, cache_dir, e)
+            return Catalog(read_json(path), version=version)
+    return ColumnarCatalog(directory, version=version)
+
+
+def _compile_once(path, cache_dir, stem, directory):
+    with open(os.path.join(cache_dir, ".lock"), "w") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)  # other workers wait here, then find it compiled
+        if os.path.exists(os.path.join(directory, "meta.json")):
+            return
+        tmp = tempfile.mkdtemp(dir=cache_dir, prefix=f".{stem}-")
+        try:
+            meta = compile_catalog(_stream_records(path), tmp)
+            os.rename(tmp, directory)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)
+            if not os.path.exists(os.path.join(directory, "meta.json")):
+                raise
+            return
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        log.info("Compiled %s into %s (%d colleges)", path, directory, meta["count"])
+        # older compiles of the same file; processes still mapping them keep their pages until they reload
+        compiled = re.compile(re.escape(stem) + r"-\d+-\d+-\d+-f\d+")
+        for entry in os.listdir(cache_dir):
+            if compiled.fullmatch(entry) and os.path.join(cache_dir, entry) != directory:
+                shutil.rmtree(os.path.join(cache_dir, entry), ignore_errors=True)
@@ -0,0 +1,160 @@
+"""Uniform-grid spatial index for nearest-college lookups.
+
+Points are projected onto a local equirectangular plane (km) centred on the
+catalog, bucketed into square cells sized for a handful of colleges each, and
+k-nearest queries walk rings of cells outwards from the query point, stopping
+as soon as no unvisited ring can hold anything closer than the current k-th
+result. Results are reported with great-circle distances.
+"""
+import heapq
+import math
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def coords(record):
+    """``(lat, lng)`` floats for a college, or None if it has no usable location."""
+    try:
+        lat, lng = float(record["lat"]), float(record["lng"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return None
+    return lat, lng
+
+
+class GeoIndex:
+    def __init__(self, points, per_cell=8):
+        """``points`` is an iterable of ``(position, lat, lng)``."""
+        points = list(points)
+        self.size = len(points)
+        self.cells = {}
+        if not points:
+            self.cell_km = 1.0
+            self._cos0 = 1.0
+            return
+
+        lat0 = sum(p[1] for p in points) / len(points)
+        self._cos0 = math.cos(math.radians(lat0))
+        projected = [(pos, lat, lng) + self._project(lat, lng) for pos, lat, lng in points]
+
+        xs = [p[3] for p in projected]
+        ys = [p[4] for p in projected]
+        area = max(max(xs) - min(xs), 1.0) * max(max(ys) - min(ys), 1.0)
+        self.cell_km = max(math.sqrt(area * per_cell / len(points)), 0.05)
+
+        for pos, lat, lng, x, y in projected:
+            self.cells.setdefault(self._cell(x, y), []).append((x, y, pos, lat, lng))
+        cx = [c[0] for c in self.cells]
+        cy = [c[1] for c in self.cells]
+        self._bounds = (min(cx), max(cx), min(cy), max(cy))
+
+    def __len__(self):
+        return self.size
+
+    def updated(self, removed=(), added=()):
+        """A new index with ``removed`` ``(position, lat, lng)`` points dropped and ``added`` ones inserted.
+
+        The projection and cell size are kept, and only the touched cells are
+        copied; the original index is left unchanged for readers still using it.
+        """
+        if not self.cells:
+            return GeoIndex(added)
+        new = GeoIndex.__new__(GeoIndex)
+        new._cos0 = self._cos0
+        new.cell_km = self.cell_km
+        new.cells = dict(self.cells)
+        copied = set()
+
+        def cell_list(cell):
+            if cell not in copied:
+                new.cells[cell] = list(new.cells.get(cell, ()))
+                copied.add(cell)
+            return new.cells[cell]
+
+        size = self.size
+        for pos, lat, lng in removed:
+            cell = self._cell(*self._project(lat, lng))
+            entries = cell_list(cell)
+            before = len(entries)
+            entries[:] = [e for e in entries if e[2] != pos]
+            size -= before - len(entries)
+            if not entries:
+                del new.cells[cell]
+                copied.discard(cell)
+        for pos, lat, lng in added:
+            x, y = self._project(lat, lng)
+            cell_list(self._cell(x, y)).append((x, y, pos, lat, lng))
+            size += 1
+        new.size = size
+        if new.cells:
+            cx = [c[0] for c in new.cells]
+            cy = [c[1] for c in new.cells]
+            new._bounds = (min(cx), max(cx), min(cy), max(cy))
+        return new
+
+    def _project(self, lat, lng):
+        x = math.radians(lng) * self._cos0 * EARTH_RADIUS_KM
+        y = math.radians(lat) * EARTH_RADIUS_KM
+        return x, y
+
+    def _cell(self, x, y):
+        return int(math.floor(x / self.cell_km)), int(math.floor(y / self.cell_km))
+
+    def _ring(self, cx, cy, r):
+        if r == 0:
+            yield cx, cy
+            return
+        for dx in range(-r, r + 1):
+            yield cx + dx, cy - r
+            yield cx + dx, cy + r
+        for dy in range(-r + 1, r):
+            yield cx - r, cy + dy
+            yield cx + r, cy + dy
+
+    def nearest(self, lat, lng, k=5, radius_km=None, allowed=None, exclude=()):
+        """Up to ``k`` ``(distance_km, position)`` pairs, closest first.
+
+        ``allowed`` optionally restricts results to a set of positions (used
+        for type/field filters), ``exclude`` drops specific positions.
+        """
+        if not self.cells or k <= 0:
+            return []
+        qx, qy = self._project(lat, lng)
+        cx, cy = self._cell(qx, qy)
+        min_x, max_x, min_y, max_y = self._bounds
+        # rings needed before the query cell's neighbourhood covers the whole grid
+        max_ring = max(abs(cx - min_x), abs(cx - max_x), abs(cy - min_y), abs(cy - max_y))
+        if radius_km is not None:
+            max_ring = min(max_ring, int(radius_km / self.cell_km) + 1)
+
+        best = []  # max-heap on -dist holding the k closest so far
+        # rings that lie entirely outside the grid hold nothing; start at the first that touches it
+        r = max(min_x - cx, cx - max_x, min_y - cy, cy - max_y, 0)
+        while r <= max_ring:
+            for cell in self._ring(cx, cy, r):
+                for x, y, pos, plat, plng in self.cells.get(cell, ()):
+                    if pos in exclude or (allowed is not None and pos not in allowed):
+                        continue
+                    d = math.hypot(x - qx, y - qy)
+                    if radius_km is not None and d > radius_km:
+                        continue
+                    if len(best) < k:
+                        heapq.heappush(best, (-d, pos, plat, plng))
+                    elif d < -best[0][0]:
+                        heapq.heapreplace(best, (-d, pos, plat, plng))
+            # everything beyond ring r is at least r cells away from the query
+            if len(best) == k and -best[0][0] <= r * self.cell_km:
+                break
+            r += 1
+
+        best.sort(reverse=True)
+        return [(haversine_km(lat, lng, plat, plng), pos) for _, pos, plat, plng in best]
@@ -0,0 +1,60 @@
+"""Offline intent matching for the chat fallback.
+
+When the AI is unavailable every student is answered from here, so it is built
+once: intents and replies come from ``data/intents.json`` and all keywords are
+compiled into one word-boundary regex with a named group per intent. A single
+``finditer`` pass scores every intent (multi-word phrases count for more than
+single words) and the best-scoring one wins; ties go to the earliest mention.
+A trailing ``*`` on a keyword matches word prefixes (``scholarship*``).
+"""
+import json
+import re
+
+_non_word = re.compile(r"[^\w]+")
+
+
+def normalize(text):
+    return " ".join(_non_word.sub(" ", (text or "").casefold()).split())
+
+
+def _keyword_pattern(keyword):
+    prefix = keyword.endswith("*")
+    words = normalize(keyword.rstrip("*")).split()
+    pattern = r"\s+".join(re.escape(w) for w in words)
+    return pattern + (r"\w*" if prefix else "")
+
+
+class IntentEngine:
+    def __init__(self, intents, unavailable_note=""):
+        self.intents = list(intents)
+        self.unavailable_note = unavailable_note
+        self.replies = [intent["reply"] for intent in self.intents]
+        alternatives = []
+        for i, intent in enumerate(self.intents):
+            keywords = sorted({k for k in intent.get("keywords", []) if normalize(k.rstrip("*"))}, key=len, reverse=True)
+            if keywords:
+                alternatives.append(f"(?P<i{i}>{'|'.join(_keyword_pattern(k) for k in keywords)})")
+        self._regex = re.compile(r"\b(?:" + "|".join(alternatives) + r")\b") if alternatives else None
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["intents"], data.get("unavailable_note", ""))
+
+    def match(self, message):
+        """Index of the best intent for ``message``, or None."""
+        if self._regex is None:
+            return None
+        scores = {}  # in order of first mention, so max() breaks ties on it
+        for m in self._regex.finditer(normalize(message)):
+            idx = int(m.lastgroup[1:])
+            scores[idx] = scores.get(idx, 0) + m.group().count(" ") + 1
+        return max(scores, key=scores.get) if scores else None
+
+    def reply(self, message, turn=0):
+        """Reply text for ``message``; unmatched messages rotate through all replies by ``turn``."""
+        idx = self.match(message)
+        if idx is None:
+            idx = turn % len(self.replies)
+        return self.replies[idx] + self.unavailable_note
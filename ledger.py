@@ -0,0 +1,188 @@
+"""Application ledger: deduplicated, group-committed applications per college.
+
+The ``Application`` table is the durable record. Rows are only ever inserted,
+with a unique ``(user_id, college_id)`` and an index on ``college_id``. This
+module keeps that table fast under bursts:
+
+* duplicates are answered from an in-process set of colleges per user (an LRU
+  of recently seen users, loaded with one indexed query), so a repeat click
+  costs a set lookup instead of a round trip;
+* inserts are group-committed. The first request to arrive commits alone;
+  requests arriving while that commit is in flight queue up and the next
+  leader writes them in a single transaction. A burst of N applications then
+  costs a handful of commits (and log flushes) instead of N serialised ones.
+  Another worker process may insert the same pair between our check and our
+  commit; the unique constraint catches that and the batch is retried row by
+  row;
+* ``export`` streams the applicants of one college as CSV or NDJSON, reading
+  the table ``chunk`` rows at a time in id order (keyset pagination), so it
+  never holds more than one chunk however many students applied.
+"""
+import csv
+import io
+import json
+import threading
+from collections import OrderedDict
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.exc import IntegrityError
+
+from module import Application, User
+
+EXPORT_COLUMNS = ("application_id", "applied_at", "user_id", "name", "email")
+
+
+class _Pending:
+    __slots__ = ("row", "done", "inserted", "error")
+
+    def __init__(self, row):
+        self.row = row
+        self.done = False
+        self.inserted = False
+        self.error = None
+
+
+class ApplicationLedger:
+    def __init__(self, db, max_batch=256, max_users=10000):
+        self.db = db
+        self.max_batch = max_batch
+        self.max_users = max_users
+        self._applied = OrderedDict()  # user_id -> set of college ids, least recently used first
+        self._queue = []
+        self._committing = False
+        self._cond = threading.Condition()
+        self.stats = {"applied": 0, "duplicates": 0, "commits": 0, "retries": 0, "largest_batch": 0}
+
+    # ---------- per-user dedupe ----------
+    def _colleges_of(self, user_id):
+        with self._cond:
+            applied = self._applied.get(user_id)
+            if applied is not None:
+                self._applied.move_to_end(user_id)
+                return applied
+        with self.db.engine.connect() as conn:
+            loaded = set(conn.execute(
+                select(Application.college_id).where(Application.user_id == user_id)
+            ).scalars())
+        with self._cond:
+            # another thread may have loaded (and added to) it meanwhile
+            applied = self._applied.setdefault(user_id, loaded)
+            applied |= loaded
+            self._applied.move_to_end(user_id)
+            while len(self._applied) > self.max_users:
+                self._applied.popitem(last=False)
+            return applied
+
+    def has_applied(self, user_id, college_id):
+        return college_id in self._colleges_of(user_id)
+
+    # ---------- group commit ----------
+    def apply(self, user_id, college_id):
+        """Record an application; False if the student had already applied.
+
+        Returns once the row is committed. Raises whatever the database
+        raised if the commit failed.
+        """
+        applied = self._colleges_of(user_id)
+        with self._cond:
+            if college_id in applied:
+                self.stats["duplicates"] += 1
+                return False
+            applied.add(college_id)
+            entry = _Pending({"user_id": user_id, "college_id": college_id})
+            self._queue.append(entry)
+            while not entry.done:
+                if self._committing:
+                    self._cond.wait()
+                    continue
+                # become the leader for everything queued so far
+                self._committing = True
+                batch, self._queue = self._queue[:self.max_batch], self._queue[self.max_batch:]
+                self._cond.release()
+                try:
+                    self._commit(batch)
+                finally:
+                    self._cond.acquire()
+                    self._committing = False
+                    self._cond.notify_all()
+            if entry.error is not None:
+                applied.discard(college_id)
+                raise entry.error
+            self.stats["applied" if entry.inserted else "duplicates"] += 1
+            return entry.inserted
+
+    def _commit(self, batch):
+        try:
+            try:
+                with self.db.engine.begin() as conn:
+                    conn.execute(insert(Application), [entry.row for entry in batch])
+                for entry in batch:
+                    entry.inserted = True
+            except IntegrityError:
+                # another process inserted one of these pairs first; find out which
+                self.stats["retries"] += 1
+                for entry in batch:
+                    try:
+                        with self.db.engine.begin() as conn:
+                            conn.execute(insert(Application), [entry.row])
+                        entry.inserted = True
+                    except IntegrityError:
+                        entry.inserted = False
+        except Exception as e:
+            for entry in batch:
+                if not entry.inserted:
+                    entry.error = e
+        finally:
+            for entry in batch:
+                entry.done = True
+            self.stats["commits"] += 1
+            self.stats["largest_batch"] = max(self.stats["largest_batch"], len(batch))
+
+    # ---------- per-college queries ----------
+    def count(self, college_id):
+        with self.db.engine.connect() as conn:
+            return conn.execute(
+                select(func.count()).select_from(Application).where(Application.college_id == college_id)
+            ).scalar_one()
+
+    def applicants(self, college_id, chunk=500):
+        """Yield ``(application_id, applied_at, user_id, name, email)`` for one college, oldest first."""
+        last = 0
+        while True:
+            query = (
+                select(Application.id, Application.created_at, User.id, User.name, User.email)
+                .join(User, User.id == Application.user_id)
+                .where(Application.college_id == college_id, Application.id > last)
+                .order_by(Application.id)
+                .limit(chunk)
+            )
+            with self.db.engine.connect() as conn:
+                rows = conn.execute(query).all()
+            yield from rows
+            if len(rows) < chunk:
+                return
+            last = rows[-1][0]
+
+    def export(self, college_id, fmt="csv", chunk=500):
+        """Applicants of a college as CSV or NDJSON text, one piece per chunk of rows."""
+        if fmt not in ("csv", "ndjson"):
+            raise ValueError(f"unknown export format {fmt!r}")
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        if fmt == "csv":
+            writer.writerow(EXPORT_COLUMNS)
+        pending = 0
+        for row in self.applicants(college_id, chunk=chunk):
+            values = (row[0], row[1].isoformat(timespec="seconds") if row[1] else "", row[2], row[3] or "", row[4])
+            if fmt == "csv":
+                writer.writerow(values)
+            else:
+                buf.write(json.dumps(dict(zip(EXPORT_COLUMNS, values)), ensure_ascii=False) + "\n")
+            pending += 1
+            if pending == chunk:
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+                pending = 0
+        if buf.tell():
+            yield buf.getvalue()
@@ -0,0 +1,234 @@
+"""Chat completions with deadlines, bounded retries and a circuit breaker.
+
+``ChatClient`` wraps ``openai.ChatCompletion.create`` for the chat views:
+
+* every worker thread shares one ``requests.Session`` (installed as
+  ``openai.requestssession``), so connections to the API stay alive in a
+  bounded pool instead of being re-opened per thread;
+* each attempt has a connect and a read deadline (``(connect, read)``; for
+  streams the read deadline is the longest gap between two chunks);
+* timeouts, connection errors, 429 and 5xx responses are retried up to
+  ``max_retries`` times with full-jitter exponential backoff, within an
+  overall ``deadline`` that also caps each attempt's read deadline. Anything else (bad request, auth) fails at once. A
+  stream is only retried until its first delta has been sent on;
+* a ``CircuitBreaker`` counts retryable failures. After ``failure_threshold``
+  in a row it opens and every call fails fast with ``CircuitOpen``, so the
+  views answer from the offline fallback without waiting on the upstream.
+  After ``reset_timeout`` seconds one request is let through as a half-open
+  probe: success closes the breaker, failure opens it again.
+
+``stats`` counts attempts, retries and short-circuits, and ``breaker.state``
+is the current state; both are exported on ``/metrics``. Attempt latency
+goes to the ``openai_attempt_seconds`` histogram when ``metrics`` is given.
+"""
+import random
+import threading
+import time
+
+# ``openai`` (and the aiohttp/numpy helpers it pulls in) is imported on the
+# first call, not at startup: workers that never reach the model don't pay for it
+openai = None
+_retryable_errors = None
+
+
+def _load_openai():
+    global openai, _retryable_errors
+    if openai is None:
+        import openai as sdk
+        import requests
+
+        _retryable_errors = (
+            sdk.error.Timeout,
+            sdk.error.APIConnectionError,
+            sdk.error.RateLimitError,
+            sdk.error.ServiceUnavailableError,
+            sdk.error.TryAgain,
+            requests.exceptions.RequestException,  # raised unwrapped while a stream is being read
+        )
+        openai = sdk
+    return openai
+
+
+class CircuitOpen(Exception):
+    """The upstream is considered down; the call was not attempted."""
+
+
+def retryable(e):
+    _load_openai()
+    if isinstance(e, _retryable_errors):
+        return True
+    if isinstance(e, openai.error.APIError):
+        # 5xx, or a response that could not be decoded
+        return e.http_status is None or e.http_status >= 500
+    return False
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self.transitions = {self.OPEN: 0, self.HALF_OPEN: 0, self.CLOSED: 0}
+
+    def _move(self, state):
+        self.state = state
+        self.transitions[state] += 1
+
+    def allow(self):
+        """True if a call may go upstream now (in half-open, only the single probe)."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self.clock() - self.opened_at >= self.reset_timeout:
+                self._move(self.HALF_OPEN)
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            if self.state != self.CLOSED:
+                self._move(self.CLOSED)
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+                self.opened_at = self.clock()
+                self._move(self.OPEN)
+
+
+class ChatClient:
+    def __init__(self, model, connect_timeout=3.05, read_timeout=20.0, deadline=45.0, max_retries=2,
+                 backoff=0.25, max_backoff=4.0, pool_size=10, breaker=None, metrics=None, api_key=None):
+        self.model = model
+        self.timeout = (connect_timeout, read_timeout)
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.pool_size = pool_size
+        self.api_key = api_key
+        self.breaker = breaker or CircuitBreaker()
+        self.metrics = metrics
+        self.session = None
+        self._lock = threading.Lock()
+        self.stats = {"ok": 0, "retryable": 0, "fatal": 0, "retries": 0, "short_circuited": 0}
+
+    def _sdk(self):
+        """The ``openai`` module, set up with our session (and key) on first use."""
+        if self.session is None:
+            with self._lock:
+                if self.session is None:
+                    sdk = _load_openai()
+                    from requests import Session
+                    from requests.adapters import HTTPAdapter
+
+                    session = Session()
+                    # retries are ours (and only for retryable errors), not urllib3's
+                    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=self.pool_size, max_retries=0)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    sdk.requestssession = session
+                    if self.api_key:
+                        sdk.api_key = self.api_key
+                    self.session = session
+        return openai
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _attempts(self):
+        """Yield each attempt's ``(connect, read)`` timeout while another try is allowed.
+
+        Sleeps the backoff in between. The read timeout is cut to what is left
+        of ``deadline``, and a retry that couldn't even connect in time is
+        not made.
+        """
+        connect, read = self.timeout
+        give_up = time.monotonic() + self.deadline
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                self._count("short_circuited")
+                raise CircuitOpen("OpenAI circuit breaker is open")
+            yield connect, max(min(read, give_up - time.monotonic()), 0.001)
+            delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+            if attempt == self.max_retries or time.monotonic() + delay + connect > give_up:
+                return
+            self._count("retries")
+            time.sleep(delay)
+
+    def _observe(self, start, outcome):
+        if self.metrics is not None:
+            self.metrics.observe("openai_attempt_seconds", time.perf_counter() - start, outcome=outcome)
+
+    def _failed(self, e, start):
+        kind = "retryable" if retryable(e) else "fatal"
+        self._count(kind)
+        self._observe(start, kind)
+        if kind == "retryable":
+            self.breaker.failure()
+        else:
+            self.breaker.success()  # the upstream answered; the request itself was bad
+        return kind == "retryable"
+
+    def complete(self, messages, **params):
+        """The completion response as a dict; raises the last error or ``CircuitOpen``."""
+        last = None
+        for timeout in self._attempts():
+            start = time.perf_counter()
+            try:
+                response = self._sdk().ChatCompletion.create(
+                    model=self.model, messages=messages, request_timeout=timeout, **params
+                )
+            except Exception as e:
+                last = e
+                if not self._failed(e, start):
+                    raise
+                continue
+            self._count("ok")
+            self._observe(start, "ok")
+            self.breaker.success()
+            return response
+        raise last
+
+    def stream(self, messages, **params):
+        """Yield content deltas. Retries happen only before the first delta is yielded."""
+        last = None
+        for timeout in self._attempts():
+            start = time.perf_counter()
+            sent = False
+            try:
+                for chunk in self._sdk().ChatCompletion.create(
+                    model=self.model, messages=messages, request_timeout=timeout, stream=True, **params
+                ):
+                    delta = chunk["choices"][0].get("delta", {}).get("content")
+                    if delta:
+                        sent = True
+                        yield delta
+            except GeneratorExit:
+                # the reader went away mid-stream; the upstream itself was answering
+                self.breaker.success()
+                raise
+            except Exception as e:
+                last = e
+                if not self._failed(e, start) or sent:
+                    raise
+                continue
+            self._count("ok")
+            self._observe(start, "ok")
+            self.breaker.success()
+            return
+        raise last
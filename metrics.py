@@ -0,0 +1,229 @@
+"""Request, template and upstream metrics in Prometheus text format.
+
+Every thread records into its own shard (plain dicts reached through a
+``threading.local``), so the hot path takes no locks: an increment is a dict
+lookup and an add. ``/metrics`` merges the shards when it is scraped. Shards
+of threads that have exited are folded into one retired shard, so servers
+that start a thread per request don't grow the registry without bound.
+
+Counters from other components (reply cache, prompt builder, sessions, ...)
+are not duplicated here; ``collector`` functions read their ``stats`` dicts at
+scrape time. Numbers are per process: with several gunicorn workers each
+worker reports its own, so scrape them one by one or sum them in the
+dashboard.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import Response, g, request, before_render_template, template_rendered, got_request_exception
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class _Shard:
+    __slots__ = ("thread", "counters", "histograms")
+
+    def __init__(self, thread):
+        self.thread = thread
+        self.counters = {}    # (name, labels) -> value
+        self.histograms = {}  # (name, labels) -> [bucket counts..., +Inf count, sum]
+
+
+class Metrics:
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        self._retired = _Shard(None)
+        self._lock = threading.Lock()  # shard registration and scrapes only
+        self._help = {}     # name -> (kind, help text)
+        self._buckets = {}  # histogram name -> bucket bounds
+        self._collectors = []
+
+    # ---------- recording (lock-free) ----------
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = _Shard(threading.current_thread())
+            with self._lock:
+                self._retire_dead()
+                self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+
+    def inc(self, name, value=1, **labels):
+        counters = self._shard().counters
+        key = (name, tuple(sorted(labels.items())))
+        counters[key] = counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        histograms = self._shard().histograms
+        key = (name, tuple(sorted(labels.items())))
+        bounds = self._buckets.get(name, LATENCY_BUCKETS)
+        h = histograms.get(key)
+        if h is None:
+            h = histograms[key] = [0] * (len(bounds) + 2)
+        h[bisect_left(bounds, value)] += 1
+        h[-1] += value
+
+    @contextmanager
+    def time(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    # ---------- registration ----------
+    def counter(self, name, help_text):
+        self._help[name] = ("counter", help_text)
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self._help[name] = ("histogram", help_text)
+        self._buckets[name] = tuple(buckets)
+
+    def collector(self, fn):
+        """Register ``fn() -> [(name, kind, help, {labels: value})]`` read at scrape time."""
+        self._collectors.append(fn)
+        return fn
+
+    # ---------- scraping ----------
+    def _retire_dead(self):
+        alive = []
+        for shard in self._shards:
+            if shard.thread.is_alive():
+                alive.append(shard)
+            else:
+                _merge(self._retired, shard)
+        self._shards = alive
+
+    def snapshot(self):
+        """Merged ``(counters, histograms)`` across all threads."""
+        total = _Shard(None)
+        with self._lock:
+            self._retire_dead()
+            shards = [self._retired] + list(self._shards)
+        for shard in shards:
+            _merge(total, shard)
+        return total.counters, total.histograms
+
+    def render(self):
+        counters, histograms = self.snapshot()
+        by_name = {}
+        for (name, labels), value in counters.items():
+            by_name.setdefault(name, []).append((labels, value))
+        lines = []
+        for name in sorted(by_name):
+            _header(lines, name, *self._help.get(name, ("counter", "")))
+            for labels, value in sorted(by_name[name]):
+                lines.append(f"{name}{_labels(labels)} {_num(value)}")
+
+        hist_by_name = {}
+        for (name, labels), h in histograms.items():
+            hist_by_name.setdefault(name, []).append((labels, h))
+        for name in sorted(hist_by_name):
+            _header(lines, name, *self._help.get(name, ("histogram", "")))
+            bounds = self._buckets.get(name, LATENCY_BUCKETS)
+            for labels, h in sorted(hist_by_name[name], key=lambda item: item[0]):
+                cumulative = 0
+                for bound, count in zip(bounds + ("+Inf",), h[:-1]):
+                    cumulative += count
+                    le = bound if bound == "+Inf" else _num(bound)
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labels)} {_num(h[-1])}")
+                lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+
+        for fn in self._collectors:
+            for name, kind, help_text, samples in fn():
+                _header(lines, name, kind, help_text)
+                for labels, value in samples.items():
+                    lines.append(f"{name}{_labels(labels)} {_num(value)}")
+        return "\n".join(lines) + "\n"
+
+    # ---------- Flask wiring ----------
+    def init_app(self, app, path="/metrics", token=None):
+        self.histogram("http_request_duration_seconds", "Request latency by endpoint until the response is returned.")
+        self.histogram("http_response_size_bytes", "Response body size by endpoint.", SIZE_BUCKETS)
+        self.counter("http_requests_total", "Requests by endpoint, method and status.")
+        self.counter("http_exceptions_total", "Unhandled exceptions by class.")
+        self.histogram("template_render_seconds", "Jinja render time by template.")
+
+        @app.before_request
+        def _start_timer():
+            g._metrics_start = time.perf_counter()
+
+        @app.after_request
+        def _record_request(response):
+            start = g.pop("_metrics_start", None)
+            if start is not None:
+                endpoint = request.endpoint or "unmatched"
+                self.observe("http_request_duration_seconds", time.perf_counter() - start, endpoint=endpoint)
+                self.inc("http_requests_total", endpoint=endpoint, method=request.method, status=response.status_code)
+                if response.content_length is not None:
+                    self.observe("http_response_size_bytes", response.content_length, endpoint=endpoint)
+            return response
+
+        def _template_started(sender, template, context, **extra):
+            stack = getattr(self._local, "templates", None)
+            if stack is None:
+                stack = self._local.templates = []
+            stack.append(time.perf_counter())
+
+        def _template_done(sender, template, context, **extra):
+            stack = getattr(self._local, "templates", None)
+            if stack:
+                self.observe("template_render_seconds", time.perf_counter() - stack.pop(),
+                             template=template.name or "string")
+
+        def _exception(sender, exception, **extra):
+            self.inc("http_exceptions_total", error=type(exception).__name__)
+
+        # blinker holds weak references by default; these closures live as long as the app
+        before_render_template.connect(_template_started, app, weak=False)
+        template_rendered.connect(_template_done, app, weak=False)
+        got_request_exception.connect(_exception, app, weak=False)
+
+        def metrics_view():
+            if token and request.headers.get("Authorization") != f"Bearer {token}":
+                return Response("unauthorized\n", status=401, mimetype="text/plain")
+            return Response(self.render(), mimetype="text/plain; version=0.0.4")
+
+        app.add_url_rule(path, "metrics", metrics_view)
+        app.extensions["metrics"] = self
+        return self
+
+
+def _merge(into, shard):
+    for key, value in shard.counters.copy().items():
+        into.counters[key] = into.counters.get(key, 0) + value
+    for key, h in shard.histograms.copy().items():
+        target = into.histograms.get(key)
+        if target is None:
+            into.histograms[key] = list(h)
+        else:
+            for i, v in enumerate(h):
+                target[i] += v
+
+
+def _header(lines, name, kind, help_text):
+    if help_text:
+        lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _num(value):
+    if isinstance(value, float):
+        return repr(round(value, 9))
+    return str(value)
@@ -1,10 +1,18 @@
+import json
+from datetime import datetime
+
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import inspect, literal, text
+from sqlalchemy.exc import DBAPIError
 
 db = SQLAlchemy()
 
+WELCOME_MESSAGE = "👋 Hello! I’m your AI career counselor. How can I help today?"
+
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    email = db.Column(db.String(120), unique=True, nullable=False)
+    email = db.Column(db.String(120), unique=True, index=True, nullable=False)
     password = db.Column(db.String(200), nullable=False)
     name = db.Column(db.String(120))
     career_goal = db.Column(db.String(200))
@@ -15,3 +23,115 @@ class User(db.Model):
     interests = db.Column(db.Text)
     guidelines = db.Column(db.Text)
     profile_pic = db.Column(db.String(200))
+    # fields used by the app's register / profile forms
+    qualification = db.Column(db.String(120))
+    school_background = db.Column(db.String(200))
+    marks = db.Column(db.String(50))
+    skills = db.Column(db.Text)
+    college = db.Column(db.String(200))
+    joined = db.Column(db.String(50))
+    recommended_field = db.Column(db.String(120))
+    quiz_scores = db.Column(db.Text)  # JSON {category: score} from the last quiz
+    # rolling summary of older chat turns (see chat_context.py)
+    chat_summary = db.Column(db.Text)
+    chat_summary_upto = db.Column(db.Integer, default=0, nullable=False)
+
+    messages = db.relationship(
+        "ChatMessage", backref="user", order_by="ChatMessage.id",
+        cascade="all, delete-orphan", lazy="select",
+    )
+    applications = db.relationship(
+        "Application", backref="user", cascade="all, delete-orphan", lazy="select",
+    )
+
+    @property
+    def quiz_result(self):
+        return json.loads(self.quiz_scores) if self.quiz_scores else None
+
+
+class ChatMessage(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False, index=True)
+    role = db.Column(db.String(20), nullable=False)
+    content = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+class Application(db.Model):
+    __table_args__ = (db.UniqueConstraint("user_id", "college_id"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False, index=True)
+    college_id = db.Column(db.Integer, nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+# ---------- analytics (see analytics.py) ----------
+class StatCounter(db.Model):
+    __table_args__ = (db.Index("ix_stat_counter_metric_value", "metric", "value"),)
+
+    metric = db.Column(db.String(40), primary_key=True)
+    key = db.Column(db.String(200), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+
+class ChatDay(db.Model):
+    # one row per student per (UTC) day they chatted, to count them once
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), primary_key=True)
+    day = db.Column(db.String(10), primary_key=True, index=True)
+
+
+class StatSnapshot(db.Model):
+    taken_at = db.Column(db.DateTime, primary_key=True)
+    data = db.Column(db.Text, nullable=False)  # JSON of the headline totals
+
+
+# ---------- schema upgrades ----------
+def _column_ddl(column, dialect):
+    ddl = column.type.compile(dialect=dialect)
+    default = column.default.arg if column.default is not None and column.default.is_scalar else None
+    if default is not None:
+        value = literal(default, column.type).compile(dialect=dialect, compile_kwargs={"literal_binds": True})
+        ddl += f" DEFAULT {value}" + ("" if column.nullable else " NOT NULL")
+    return ddl
+
+
+def upgrade_schema():
+    """Add the columns and indexes the models gained since the tables were created.
+
+    ``db.create_all()`` only creates missing tables, so a database made by an
+    older version would lack e.g. ``user.quiz_scores`` or the chat summary
+    columns. Added columns get their scalar default (a NOT NULL column without
+    one is added as nullable); renames and type changes still need the
+    database to be migrated by hand. Every worker runs this at boot, so a
+    column or index another worker added in the meantime counts as done.
+    Returns the ``table.column`` names this call added. Call inside an app
+    context, after ``db.create_all()``.
+    """
+    engine = db.engine
+    quote = engine.dialect.identifier_preparer
+    added = []
+    for table in db.metadata.sorted_tables:
+        if not inspect(engine).has_table(table.name):
+            continue
+        existing = {c["name"] for c in inspect(engine).get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = f"ALTER TABLE {quote.format_table(table)} ADD COLUMN {quote.quote(column.name)} {_column_ddl(column, engine.dialect)}"
+            try:
+                with engine.begin() as conn:
+                    conn.execute(text(ddl))
+            except DBAPIError:
+                # another worker booting at the same time added it first
+                if column.name not in {c["name"] for c in inspect(engine).get_columns(table.name)}:
+                    raise
+            else:
+                added.append(f"{table.name}.{column.name}")
+        for index in table.indexes:
+            try:
+                index.create(engine, checkfirst=True)
+            except DBAPIError:
+                if index.name not in {i["name"] for i in inspect(engine).get_indexes(table.name)}:
+                    raise
+    return added
@@ -0,0 +1,51 @@
+"""Pre-rendered pages for content that only changes between deploys.
+
+``PageCache.render`` renders a template once per (endpoint, content version,
+logged-in or not) and keeps the HTML in memory together with its gzip/brotli
+variants (see ``assets.Asset``). Repeat views are served straight from memory
+with a strong ETag, so a browser that already has the page gets a 304. The
+content version is a hash of the data file, so editing it and restarting
+never serves stale HTML. Requests with pending flash messages are rendered
+normally, since the flashes are part of the page.
+"""
+import hashlib
+import json
+import threading
+
+from flask import render_template, request, session
+
+from assets import Asset, send_asset
+
+# pages depend on the session (nav bar), so browsers must revalidate; the 304 keeps that cheap
+PAGE_CACHE_CONTROL = "private, no-cache"
+
+
+class PageCache:
+    def __init__(self, data_path):
+        with open(data_path, "rb") as f:
+            raw = f.read()
+        self.data = json.loads(raw)
+        self.version = hashlib.sha256(raw).hexdigest()[:12]
+        self._pages = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "renders": 0, "uncached": 0}
+
+    def render(self, template, section):
+        """Cached ``render_template(template, **data[section])`` as a Response."""
+        context = self.data[section]
+        if session.get("_flashes"):
+            self.stats["uncached"] += 1
+            return render_template(template, **context)
+        key = (request.endpoint, self.version, bool(session.get("user")))
+        page = self._pages.get(key)
+        if page is None:
+            html = render_template(template, **context).encode("utf-8")
+            page = Asset(f"{section}.html", html)
+            with self._lock:
+                page = self._pages.setdefault(key, page)
+                self.stats["renders"] += 1
+        else:
+            self.stats["hits"] += 1
+        resp = send_asset(page, PAGE_CACHE_CONTROL)
+        resp.vary.add("Cookie")
+        return resp
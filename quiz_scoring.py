@@ -0,0 +1,147 @@
+"""Career quiz scoring from a rule table, vectorised for whole batches.
+
+The categories and their keywords live in ``data/quiz_rules.json``. An answer
+earns a category ``points`` when it contains any of that category's keywords.
+Answer sheets are scored as a matrix: the distinct answer strings in a batch
+are matched against the rules once, giving a (distinct answers x categories)
+table, and every sheet's scores are a gather + sum over that table in NumPy.
+Answers come from the quiz's fixed options, so a batch of 100k sheets only
+has a handful of distinct strings to match.
+
+Command line (streams CSV to stdout)::
+
+    python quiz_scoring.py answers.csv > results.csv
+
+The input needs ``q1`` .. ``q10`` columns; any other columns (a student id,
+name, class) are copied through to the output.
+"""
+import csv
+import json
+import os
+import sys
+
+import numpy as np
+
+RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "quiz_rules.json")
+
+
+class QuizScorer:
+    def __init__(self, categories, points=2, questions=10):
+        self.categories = [c["name"] for c in categories]
+        self.keywords = [[k.lower() for k in c["keywords"]] for c in categories]
+        self.points = points
+        self.questions = questions
+        self.answer_columns = [f"q{i}" for i in range(1, questions + 1)]
+
+    @classmethod
+    def load(cls, path=RULES_FILE):
+        with open(path, "r", encoding="utf-8") as f:
+            rules = json.load(f)
+        return cls(rules["categories"], rules.get("points", 2), rules.get("questions", 10))
+
+    def _rule_table(self, distinct):
+        """(len(distinct) x categories) 0/1 matrix: does answer i hit category j."""
+        table = np.zeros((len(distinct), len(self.categories)), dtype=np.int32)
+        for i, answer in enumerate(distinct):
+            a = str(answer).lower()
+            for j, words in enumerate(self.keywords):
+                if any(w in a for w in words):
+                    table[i, j] = 1
+        return table
+
+    def score_matrix(self, answers):
+        """Score an (N x questions) array-like of answer strings -> (N x categories) int array."""
+        answers = np.asarray(answers, dtype=str)
+        if answers.size == 0:
+            return np.zeros((len(answers), len(self.categories)), dtype=np.int32)
+        distinct, codes = np.unique(answers, return_inverse=True)
+        table = self._rule_table(distinct)
+        return table[codes.reshape(answers.shape)].sum(axis=1) * self.points
+
+    def best(self, scores):
+        """Recommended category per row (first category wins ties, like ``max``).
+
+        None for a sheet where no answer matched any category: an all-zero
+        tie says nothing about the student.
+        """
+        scores = np.asarray(scores)
+        return [self.categories[i] if top > 0 else None
+                for i, top in zip(np.argmax(scores, axis=1).tolist(), scores.max(axis=1).tolist())]
+
+    def score(self, answers):
+        """One answer sheet -> ``(best_field or None, {category: score})``."""
+        row = [(a or "") for a in answers]
+        scores = self.score_matrix([row])
+        return self.best(scores)[0], dict(zip(self.categories, scores[0].tolist()))
+
+    def score_csv(self, lines, chunk_size=5000):
+        """Yield CSV text for an iterable of input CSV lines, ``chunk_size`` sheets at a time.
+
+        Memory stays bounded by the chunk size however large the upload is.
+        """
+        reader = csv.DictReader(lines)
+        fields = reader.fieldnames or []
+        missing = [c for c in self.answer_columns if c not in fields]
+        if missing:
+            raise ValueError(f"missing answer columns: {', '.join(missing)}")
+        passthrough = [f for f in fields if f not in self.answer_columns]
+
+        out = _LineWriter()
+        writer = csv.writer(out)
+        writer.writerow(passthrough + ["recommended_field"] + self.categories)
+        yield out.take()
+
+        chunk = []
+        for row in reader:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield self._score_chunk(chunk, passthrough, writer, out)
+                chunk = []
+        if chunk:
+            yield self._score_chunk(chunk, passthrough, writer, out)
+
+    def _score_chunk(self, rows, passthrough, writer, out):
+        scores = self.score_matrix([[row.get(c) or "" for c in self.answer_columns] for row in rows])
+        for row, field, values in zip(rows, self.best(scores), scores.tolist()):
+            writer.writerow([row.get(f, "") for f in passthrough] + [field] + values)
+        return out.take()
+
+
+class _LineWriter:
+    """Minimal file object so csv.writer output can be handed out in pieces."""
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, text):
+        self.parts.append(text)
+
+    def take(self):
+        text = "".join(self.parts)
+        self.parts = []
+        return text
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Score a CSV of quiz answer sheets.")
+    parser.add_argument("csv", help="input CSV with q1..q10 columns ('-' for stdin)")
+    parser.add_argument("--rules", default=RULES_FILE)
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    scorer = QuizScorer.load(args.rules)
+    src = sys.stdin if args.csv == "-" else open(args.csv, newline="", encoding="utf-8")
+    try:
+        for text in scorer.score_csv(src, chunk_size=args.chunk_size):
+            sys.stdout.write(text)
+    except ValueError as e:
+        parser.error(str(e))
+    finally:
+        if src is not sys.stdin:
+            src.close()
+
+
+if __name__ == "__main__":
+    main()
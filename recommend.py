@@ -0,0 +1,134 @@
+"""College recommendations from the full quiz score vector.
+
+Quiz categories (``"Engineering/Tech"``) and catalog fields
+(``"Engineering, Technology"``, ``"Engineering/Technology"``) never spell
+things the same way, so ``data/field_taxonomy.json`` maps each category to
+weighted, normalised catalog fields. When a catalog is loaded the
+``RecommendationIndex`` turns that into a (colleges x categories) affinity
+matrix plus, per category, the college positions sorted best first. A
+student's ranking is the affinity matrix times their normalised quiz scores,
+so a close second interest still lifts colleges that cover both. Rankings are
+cached per (score profile, catalog version): students with the same quiz
+result share one entry, and retaking the quiz or a catalog reload simply
+misses the cache.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from catalog import normalize
+
+TAXONOMY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "field_taxonomy.json")
+
+
+class RecommendationIndex:
+    def __init__(self, catalog, categories, weights, aliases):
+        self.catalog = catalog
+        self.version = catalog.version
+        self.categories = list(categories)
+        self.affinity = np.zeros((len(catalog), len(self.categories)), dtype=np.float32)
+        for field, positions in catalog.postings("fields").items():
+            field = aliases.get(field, field)
+            for j, category in enumerate(self.categories):
+                w = weights.get(category, {}).get(field)
+                if w:
+                    rows = np.asarray(positions)
+                    self.affinity[rows, j] = np.maximum(self.affinity[rows, j], w)
+        # category -> positions with any affinity, best first (catalog order breaks ties)
+        self.by_category = {}
+        for j, category in enumerate(self.categories):
+            col = self.affinity[:, j]
+            hits = np.flatnonzero(col)
+            self.by_category[category] = tuple(hits[np.argsort(-col[hits], kind="stable")].tolist())
+
+    def rank(self, scores):
+        """Positions ranked for a score vector (in ``categories`` order)."""
+        scores = np.asarray(scores, dtype=np.float32)
+        total = scores.sum()
+        if total <= 0:
+            return ()
+        nonzero = np.flatnonzero(scores)
+        if len(nonzero) == 1:
+            return self.by_category[self.categories[nonzero[0]]]
+        combined = self.affinity @ (scores / total)
+        top = self.affinity[:, int(np.argmax(scores))]
+        hits = np.flatnonzero(combined)
+        order = np.lexsort((hits, -top[hits], -combined[hits]))
+        return tuple(hits[order].tolist())
+
+
+class Recommender:
+    def __init__(self, categories, weights, aliases=None, cache_size=1024):
+        self.categories = list(categories)
+        self.weights = {c: {normalize(f): w for f, w in fields.items()} for c, fields in weights.items()}
+        self.aliases = {normalize(a): normalize(f) for a, f in (aliases or {}).items()}
+        self.cache_size = cache_size
+        self._index = None
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "builds": 0}
+
+    @classmethod
+    def load(cls, categories, path=TAXONOMY_FILE, **kwargs):
+        with open(path, "r", encoding="utf-8") as f:
+            taxonomy = json.load(f)
+        return cls(categories, taxonomy["categories"], taxonomy.get("aliases"), **kwargs)
+
+    def build(self, catalog):
+        """Catalog listener: index a freshly loaded snapshot."""
+        index = RecommendationIndex(catalog, self.categories, self.weights, self.aliases)
+        with self._lock:
+            self._index = index
+            self._cache.clear()
+            self.stats["builds"] += 1
+        return index
+
+    def vector(self, scores=None, field=None):
+        """Score dict from the quiz -> vector; falls back to the top field alone.
+
+        All-zero scores (no answer matched a keyword) would rank nothing, so
+        they fall back too.
+        """
+        if scores and any(scores.values()):
+            return tuple(int(scores.get(c, 0)) for c in self.categories)
+        return tuple(int(c == field) for c in self.categories)
+
+    def recommend(self, catalog, scores=None, field=None, limit=None):
+        """Records for a student, best match first."""
+        index, ranked = self._ranked(catalog, scores, field)
+        if limit is not None:
+            ranked = ranked[:limit]
+        return [index.catalog.records[pos] for pos in ranked]
+
+    def page(self, catalog, scores=None, field=None, page=1, per_page=12):
+        """One page of ``recommend``; returns ``(items, total, total_pages)`` like ``Catalog.page``."""
+        index, ranked = self._ranked(catalog, scores, field)
+        total = len(ranked)
+        per_page = max(per_page, 1)
+        start = (max(page, 1) - 1) * per_page
+        total_pages = total // per_page + (1 if total % per_page else 0)
+        return [index.catalog.records[pos] for pos in ranked[start:start + per_page]], total, total_pages
+
+    def _ranked(self, catalog, scores, field):
+        # (index, positions best first), cached per catalog version and score vector
+        vector = self.vector(scores, field)
+        index = self._index
+        if index is None or index.version != catalog.version:
+            index = self.build(catalog)
+        key = (index.version, vector)
+        with self._lock:
+            ranked = self._cache.get(key)
+            if ranked is not None:
+                self._cache.move_to_end(key)
+                self.stats["hits"] += 1
+        if ranked is None:
+            ranked = index.rank(vector)
+            with self._lock:
+                self.stats["misses"] += 1
+                self._cache[key] = ranked
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return index, ranked
@@ -0,0 +1,204 @@
+"""Cache of AI counselling replies for repeated questions.
+
+Questions are normalised (case, whitespace and punctuation folded) and keyed
+together with a context string (the student's ``recommended_field``), so
+"How to prepare for NEET?" and "how to prepare for neet" share one entry.
+Entries expire after a TTL and the least recently used ones are evicted once
+the cache is full. ``get_or_compute`` is single-flight: concurrent misses for
+the same key wait for one upstream call instead of each making their own;
+``claim``/``release`` expose the same single-flight to a caller that streams
+the value while producing it.
+
+Two backends are provided: ``MemoryBackend`` for a single process and
+``SqliteBackend`` for sharing one cache file between worker processes.
+"""
+import hashlib
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+
+def normalize_question(text):
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    text = "".join(" " if unicodedata.category(ch).startswith("P") else ch for ch in text)
+    return " ".join(text.split())
+
+
+def cache_key(question, context=""):
+    raw = f"{normalize_question(context)}\x1f{normalize_question(question)}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class MemoryBackend:
+    def __init__(self, max_size=1000):
+        self.max_size = max_size
+        self._data = OrderedDict()  # key -> (expires_at, value), oldest first
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            if item[0] < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return item[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.time() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SqliteBackend:
+    """Cache table in a sqlite file, safe to share between processes."""
+
+    def __init__(self, path, max_size=10000):
+        self.path = path
+        self.max_size = max_size
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS reply_cache ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                " expires_at REAL NOT NULL, used_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS reply_cache_used ON reply_cache (used_at)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        conn = self._conn()
+        now = time.time()
+        row = conn.execute(
+            "SELECT value, expires_at FROM reply_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[1] < now:
+            conn.execute("DELETE FROM reply_cache WHERE key = ?", (key,))
+            return None
+        conn.execute("UPDATE reply_cache SET used_at = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def set(self, key, value, ttl):
+        conn = self._conn()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO reply_cache (key, value, expires_at, used_at) VALUES (?, ?, ?, ?)",
+            (key, value, now + ttl, now),
+        )
+        conn.execute("DELETE FROM reply_cache WHERE expires_at < ?", (now,))
+        conn.execute(
+            "DELETE FROM reply_cache WHERE key IN ("
+            " SELECT key FROM reply_cache ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_size,),
+        )
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM reply_cache").fetchone()[0]
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+
+
+class ReplyCache:
+    def __init__(self, backend, ttl=24 * 3600, wait_timeout=60):
+        self.backend = backend
+        self.ttl = ttl
+        self.wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "bypassed": 0, "stores": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def get(self, key):
+        value = self.backend.get(key)
+        self._count("hits" if value is not None else "misses")
+        return value
+
+    def set(self, key, value):
+        if value:
+            self.backend.set(key, value, self.ttl)
+            self._count("stores")
+
+    def get_or_compute(self, key, compute, bypass=False):
+        """``(value, source)``: cached value for ``key``, else ``compute()`` once for all concurrent callers.
+
+        ``source`` is "computed" for the caller that ran ``compute`` (or
+        bypassed the cache), "cache" for a stored value and "coalesced" for a
+        caller that waited on another one's ``compute``. ``compute`` returning
+        None (e.g. upstream failed) is passed through to every waiter and not
+        stored.
+        """
+        if bypass:
+            self._count("bypassed")
+            return compute(), "computed"
+
+        value, source, flight = self.claim(key)
+        if flight is None:
+            return value, source
+        try:
+            value = compute()
+            return value, source
+        finally:
+            self.release(key, flight, value)
+
+    def claim(self, key):
+        """Single-flight for callers that produce the value themselves (e.g. while streaming it).
+
+        Returns ``(value, source, flight)`` with ``source`` as in
+        ``get_or_compute``. Only the leader gets a ``flight`` (and a None
+        value); it must hand the result, or None on failure, to ``release``
+        while the other callers for ``key`` wait on it.
+        """
+        value = self.backend.get(key)
+        if value is not None:
+            self._count("hits")
+            return value, "cache", None
+
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                self.stats["misses"] += 1
+            else:
+                self.stats["coalesced"] += 1
+
+        if not leader:
+            flight.done.wait(self.wait_timeout)
+            return flight.value, "coalesced", None
+        return None, "computed", flight
+
+    def release(self, key, flight, value):
+        """Store the leader's ``value`` (unless None) and wake the callers waiting on ``flight``."""
+        flight.value = value
+        try:
+            self.set(key, value)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
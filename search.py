@@ -0,0 +1,442 @@
+"""Ranked, typo-tolerant full-text search over the college catalog.
+
+``SearchIndex`` is built from one catalog snapshot. Every college's name,
+district, fields, courses, facilities and description are split into
+accent- and case-folded terms (``"Médical"`` -> ``medical``), and each
+(term, college) pair gets a BM25F impact: per-field term counts, weighted by
+``FIELD_BOOSTS`` (a name match counts most) and normalised by that field's
+average length, then saturated with ``K1``. Postings are stored per term as
+two flat numpy arrays (college positions, impacts), so a query term costs one
+``bincount`` over its postings.
+
+Query terms that are not in the vocabulary are matched fuzzily: a trigram
+index over the vocabulary proposes terms that share enough trigrams, and
+those within one edit (two for long words) of the query term are used at a
+discount. The last query term also matches as a prefix, for half-typed
+words. Results are ordered by how many query terms they match, then by
+score; only the requested page is sorted, and highlight offsets are computed
+for the returned colleges alone.
+
+``CollegeSearch`` keeps the index for the current snapshot, like the
+recommender it subscribes to the ``CatalogLoader``. A reload from disk
+builds a fresh index (or, given a ``snapshot.Snapshot``, reads back the one
+an earlier boot built for the same file); a snapshot made by
+``Catalog.with_changes`` (an admin edit or an import) is applied
+incrementally: the changed colleges are masked out of the main postings and
+re-indexed into a small delta segment, which is folded back in by a full
+rebuild once it grows past ``max_delta``.
+Document frequencies and average lengths are those of the last full build
+plus the delta, which is close enough for ranking.
+"""
+import bisect
+import re
+import threading
+import unicodedata
+from array import array
+from collections import defaultdict, namedtuple
+
+import numpy as np
+from markupsafe import Markup, escape
+
+# field -> weight of one occurrence, before length normalisation
+FIELD_BOOSTS = {
+    "name": 3.0,
+    "district": 1.5,
+    "fields": 1.5,
+    "courses_offered": 1.2,
+    "facilities": 0.6,
+    "description": 1.0,
+}
+K1 = 1.2
+B = 0.75
+INDEX_FORMAT = 1  # bump when the index layout changes, so saved snapshots are rebuilt
+PREFIX_WEIGHT = 0.8
+FUZZY_WEIGHTS = {1: 0.7, 2: 0.5}
+MAX_EXPANSIONS = 24
+
+_word = re.compile(r"\w+")
+
+Hit = namedtuple("Hit", "record score highlights")
+
+
+def fold(term):
+    """``"Médical"`` -> ``"medical"``: strip accents, then casefold."""
+    decomposed = unicodedata.normalize("NFKD", term)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+
+
+def field_text(record, field):
+    """The searchable text of one field; list fields are joined with ``", "``."""
+    value = record.get(field)
+    if isinstance(value, (list, tuple)):
+        return ", ".join(str(v) for v in value)
+    return str(value or "")
+
+
+def terms(text):
+    """Folded terms of ``text`` in order."""
+    return [fold(word) for word in _word.findall(text)]
+
+
+def _grams(term):
+    padded = f"${term}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _fuzzy_edits(term):
+    """Edits allowed when matching ``term`` fuzzily; 0 for short or numeric terms."""
+    if len(term) < 4 or any(ch.isdigit() for ch in term):
+        return 0
+    return 1 if len(term) < 8 else 2
+
+
+def edit_distance(a, b, limit):
+    """Optimal-string-alignment distance of ``a`` and ``b``, or ``limit + 1`` once it exceeds ``limit``."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous, current = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+    return current[-1]
+
+
+class _Analyzer:
+    """Turns records into ``{term: impact}`` with fixed average field lengths."""
+
+    def __init__(self, average_lengths):
+        self.average_lengths = average_lengths
+        self._memo = {}
+
+    def terms(self, text):
+        # fields like facilities and courses repeat across colleges
+        cached = self._memo.get(text)
+        if cached is None:
+            cached = terms(text)
+            if len(self._memo) < 100_000:
+                self._memo[text] = cached
+        return cached
+
+    def impacts(self, record):
+        weighted = defaultdict(float)
+        for field, boost in FIELD_BOOSTS.items():
+            words = self.terms(field_text(record, field))
+            if not words:
+                continue
+            norm = 1 - B + B * len(words) / (self.average_lengths.get(field) or 1)
+            for word in words:
+                weighted[word] += boost / norm
+        return {word: tf * (K1 + 1) / (K1 + tf) for word, tf in weighted.items()}
+
+
+class _Delta:
+    """Postings for re-indexed colleges: ``term -> {position: impact}``."""
+
+    def __init__(self, postings=None, positions=()):
+        self.postings = postings or {}
+        self.positions = frozenset(positions)
+        self.vocabulary = sorted(self.postings)
+
+    def with_records(self, records, analyzer):
+        """New delta with ``records`` (``{position: record}``) replacing whatever it held for them."""
+        postings = {}
+        for term, docs in self.postings.items():
+            kept = {pos: impact for pos, impact in docs.items() if pos not in records}
+            if kept:
+                postings[term] = kept
+        for pos, record in records.items():
+            for term, impact in analyzer.impacts(record).items():
+                postings.setdefault(term, {})[pos] = impact
+        return _Delta(postings, self.positions | set(records))
+
+
+class SearchIndex:
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.version = catalog.version
+        records = catalog.records
+        count = len(records)
+
+        analyzer = _Analyzer({})
+        totals = dict.fromkeys(FIELD_BOOSTS, 0)
+        for record in records:
+            for field in FIELD_BOOSTS:
+                totals[field] += len(analyzer.terms(field_text(record, field)))
+        analyzer.average_lengths = {field: total / max(count, 1) for field, total in totals.items()}
+
+        ids, docs, impacts = {}, array("i"), array("f")
+        term_ids = array("i")
+        for pos, record in enumerate(records):
+            for term, impact in analyzer.impacts(record).items():
+                term_ids.append(ids.setdefault(term, len(ids)))
+                docs.append(pos)
+                impacts.append(impact)
+        term_ids = np.frombuffer(term_ids, dtype=np.int32)
+        order = np.argsort(term_ids, kind="stable")  # keeps catalog order within a term
+        self._docs = np.frombuffer(docs, dtype=np.int32)[order]
+        self._impacts = np.frombuffer(impacts, dtype=np.float32)[order]
+        self._offsets = np.zeros(len(ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(ids)), out=self._offsets[1:])
+        self._ids = ids
+        self._terms = list(ids)  # term id -> term
+        self._vocabulary = sorted(ids)
+        self._lengths = np.fromiter((len(t) for t in ids), dtype=np.int16, count=len(ids))
+        grams = defaultdict(list)
+        for term, term_id in ids.items():
+            if _fuzzy_edits(term):
+                for gram in _grams(term):
+                    grams[gram].append(term_id)
+        self._grams = {gram: np.asarray(tids, dtype=np.int32) for gram, tids in grams.items()}
+        analyzer._memo.clear()
+        self._analyzer = analyzer
+        self._live = None  # bool per position in the main postings; None while nothing was replaced
+        self._delta = _Delta()
+        self._main_count = self.count = count
+
+    def __getstate__(self):
+        # snapshots hold the index alone; ``attach`` gives it the catalog back
+        state = dict(self.__dict__)
+        del state["catalog"]
+        return state
+
+    def attach(self, catalog):
+        self.catalog = catalog
+        self.version = catalog.version
+        return self
+
+    # ---------- incremental updates ----------
+    def updated(self, catalog, positions):
+        """Index for ``catalog``, which differs from ours only at ``positions``."""
+        new = SearchIndex.__new__(SearchIndex)
+        new.__dict__.update(self.__dict__)
+        new.catalog = catalog
+        new.version = catalog.version
+        new.count = len(catalog)
+        live = np.ones(self._main_count, dtype=bool) if self._live is None else self._live.copy()
+        live[[pos for pos in positions if pos < len(live)]] = False
+        new._live = live
+        new._delta = self._delta.with_records({pos: catalog.records[pos] for pos in positions}, self._analyzer)
+        return new
+
+    @property
+    def delta_size(self):
+        return len(self._delta.positions)
+
+    # ---------- term expansion ----------
+    def _df(self, term):
+        term_id = self._ids.get(term)
+        main = 0 if term_id is None else int(self._offsets[term_id + 1] - self._offsets[term_id])
+        return main + len(self._delta.postings.get(term, ()))
+
+    def _known(self, term):
+        return term in self._ids or term in self._delta.postings
+
+    def _prefixed(self, prefix):
+        found = set()
+        for vocabulary in (self._vocabulary, self._delta.vocabulary):
+            i = bisect.bisect_left(vocabulary, prefix)
+            while i < len(vocabulary) and vocabulary[i].startswith(prefix) and len(found) < 4 * MAX_EXPANSIONS:
+                if vocabulary[i] != prefix:
+                    found.add(vocabulary[i])
+                i += 1
+        return sorted(found, key=lambda t: -self._df(t))[:MAX_EXPANSIONS]
+
+    def _similar(self, term):
+        """``[(term, edits), ...]`` within the allowed edits of ``term``, closest first."""
+        limit = _fuzzy_edits(term)
+        if not limit:
+            return []
+        grams = _grams(term)
+        postings = [self._grams[g] for g in grams if g in self._grams]
+        found = {}
+        if postings:
+            shared = np.bincount(np.concatenate(postings), minlength=len(self._ids))
+            # q-gram lemma: each edit destroys at most three trigrams
+            candidates = np.flatnonzero(shared >= max(len(grams) - 3 * limit, 1))
+            candidates = candidates[np.abs(self._lengths[candidates] - len(term)) <= limit]
+            for term_id in candidates.tolist():
+                other = self._terms[term_id]
+                edits = edit_distance(term, other, limit)
+                if edits <= limit:
+                    found[other] = edits
+        for other in self._delta.vocabulary:
+            if other not in found and abs(len(other) - len(term)) <= limit:
+                edits = edit_distance(term, other, limit)
+                if edits <= limit:
+                    found[other] = edits
+        return sorted(found.items(), key=lambda item: (item[1], -self._df(item[0])))[:MAX_EXPANSIONS]
+
+    def expand(self, query):
+        """``[[(term, weight), ...] per query term]``; groups that match nothing are dropped."""
+        words = list(dict.fromkeys(terms(query)))
+        groups = []
+        for i, word in enumerate(words):
+            group = [(word, 1.0)] if self._known(word) else []
+            if i == len(words) - 1 and len(word) >= 3 and not query[-1:].isspace():
+                group += [(t, PREFIX_WEIGHT) for t in self._prefixed(word)]
+            if not group:
+                group = [(t, FUZZY_WEIGHTS[edits]) for t, edits in self._similar(word)]
+            if group:
+                groups.append(group)
+        return groups
+
+    # ---------- querying ----------
+    def _postings(self, term):
+        docs, impacts = [], []
+        term_id = self._ids.get(term)
+        if term_id is not None:
+            start, end = self._offsets[term_id], self._offsets[term_id + 1]
+            d, w = self._docs[start:end], self._impacts[start:end]
+            if self._live is not None:
+                keep = self._live[d]
+                d, w = d[keep], w[keep]
+            docs.append(d)
+            impacts.append(w)
+        delta = self._delta.postings.get(term)
+        if delta:
+            docs.append(np.fromiter(delta.keys(), dtype=np.int32, count=len(delta)))
+            impacts.append(np.fromiter(delta.values(), dtype=np.float32, count=len(delta)))
+        return docs, impacts
+
+    def search(self, query, limit=10, offset=0, within=None):
+        """``(hits, total)``: ranked ``Hit(record, score, highlights)`` for one page.
+
+        ``within`` restricts results to those catalog positions (e.g. the
+        result of the facet filters). ``highlights`` maps a field to the
+        ``[start, end)`` offsets of matched words in ``field_text``.
+        """
+        groups = self.expand(query)
+        if not groups:
+            return [], 0
+        n = self.count
+        scores = np.zeros(n, dtype=np.float64)
+        matched = np.zeros(n, dtype=np.int16)
+        for group in groups:
+            docs, contributions = [], []
+            for term, weight in group:
+                idf = np.log(1 + (n - self._df(term) + 0.5) / (self._df(term) + 0.5))
+                for d, w in zip(*self._postings(term)):
+                    docs.append(d)
+                    contributions.append(w * (weight * idf))
+            if not docs:
+                continue
+            docs = np.concatenate(docs)
+            scores += np.bincount(docs, weights=np.concatenate(contributions), minlength=n)
+            matched += np.bincount(docs, minlength=n) > 0
+        if within is not None and not (isinstance(within, range) and len(within) == n):
+            allowed = np.zeros(n, dtype=bool)
+            allowed[np.asarray(within, dtype=np.int64)] = True
+            matched[~allowed] = 0
+        best = matched.max(initial=0)
+        if not best:
+            return [], 0
+        candidates = np.flatnonzero(matched == best)
+        total = len(candidates)
+        wanted = min(offset + limit, total)
+        if wanted <= offset:
+            return [], total
+        if wanted < total:
+            top = np.argpartition(-scores[candidates], wanted - 1)[:wanted]
+            candidates = candidates[top]
+        order = np.lexsort((candidates, -scores[candidates]))[offset:wanted]
+        used = {term for group in groups for term, _ in group}
+        hits = []
+        for pos in candidates[order].tolist():
+            record = self.catalog.records[pos]
+            hits.append(Hit(record, float(scores[pos]), highlights(record, used)))
+        return hits, total
+
+
+def highlights(record, used):
+    """``{field: [[start, end], ...]}`` for words of ``record`` whose folded form is in ``used``."""
+    found = {}
+    for field in FIELD_BOOSTS:
+        spans = [[m.start(), m.end()] for m in _word.finditer(field_text(record, field)) if fold(m.group()) in used]
+        if spans:
+            found[field] = spans
+    return found
+
+
+def highlight(text, spans, width=None):
+    """Jinja filter: ``text`` escaped with ``<mark>`` around ``spans``.
+
+    With ``width``, only a window of about that many characters around the
+    first span is shown.
+    """
+    text = str(text or "")
+    spans = sorted(spans or ())
+    start, end, prefix, suffix = 0, len(text), "", ""
+    if width and len(text) > width:
+        anchor = spans[0][0] if spans else 0
+        start = max(0, min(anchor - width // 3, len(text) - width))
+        end = start + width
+        prefix = "… " if start else ""
+        suffix = " …" if end < len(text) else ""
+    out, cursor = [escape(prefix)], start
+    for s, e in spans:
+        s, e = max(s, cursor), min(e, end)
+        if s >= e:
+            continue
+        out.append(escape(text[cursor:s]))
+        out.append(Markup("<mark>") + escape(text[s:e]) + Markup("</mark>"))
+        cursor = e
+    out.append(escape(text[cursor:end]))
+    out.append(escape(suffix))
+    return Markup("").join(out)
+
+
+class CollegeSearch:
+    """The search index for the current catalog snapshot, kept up to date by the loader."""
+
+    def __init__(self, max_delta=2000, snapshot=None):
+        self.max_delta = max_delta
+        self.snapshot = snapshot
+        self._index = None
+        self._lock = threading.Lock()
+        self.stats = {"builds": 0, "updates": 0, "queries": 0}
+
+    def _full(self, catalog):
+        # only indexes of a catalog read straight from its file are saved, keyed by that file
+        if self.snapshot is None or catalog.source is None or getattr(catalog, "changed", None) is not None:
+            return SearchIndex(catalog)
+        key = (INDEX_FORMAT, type(catalog).__name__, catalog.source, len(catalog))
+        return self.snapshot.load("search", key, lambda: SearchIndex(catalog)).attach(catalog)
+
+    def build(self, catalog):
+        """Catalog listener: index a new snapshot, incrementally when it is a ``with_changes`` of ours."""
+        with self._lock:
+            index = self._index
+            changed = getattr(catalog, "changed", None)
+            if (index is not None and changed is not None and changed[0] == index.version
+                    and index.delta_size + len(changed[1]) <= max(self.max_delta, len(catalog) // 20)):
+                index = index.updated(catalog, changed[1])
+                self.stats["updates"] += 1
+            else:
+                index = self._full(catalog)
+                self.stats["builds"] += 1
+            self._index = index
+        return index
+
+    def index_for(self, catalog):
+        index = self._index
+        if index is None or index.version != catalog.version:
+            index = self.build(catalog)
+        return index
+
+    def search(self, catalog, query, limit=10, offset=0, within=None):
+        self.stats["queries"] += 1
+        return self.index_for(catalog).search(query, limit=limit, offset=offset, within=within)
+
+    def page(self, catalog, query, page=1, per_page=6, **filters):
+        """Ranked counterpart of ``Catalog.page``: ``(hits, total, total_pages)``."""
+        per_page = max(per_page, 1)
+        within = catalog.positions(**filters) if any(filters.values()) else None
+        hits, total = self.search(catalog, query, limit=per_page, offset=(max(page, 1) - 1) * per_page,
+                                  within=within)
+        return hits, total, total // per_page + (1 if total % per_page else 0)
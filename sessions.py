@@ -0,0 +1,202 @@
+"""Server-side sessions: the cookie only carries an opaque session id.
+
+``ServerSessionInterface`` plugs into ``app.session_interface``, so
+``session["user"]``, ``flash()`` and everything else keep working as before,
+but the data lives in a store instead of a signed cookie that is re-signed
+and re-sent on every response. A store is only written when the session
+changed (or is past half its lifetime, to slide the expiry), and an
+untouched anonymous visitor gets no cookie at all. ``ServerSession.regenerate``
+moves a session to a fresh id (on login and logout), so an id planted in the
+browser before login can't be used to ride the authenticated session.
+
+Two stores are provided: ``MemoryStore``, an in-process LRU for a single
+worker, and ``SqliteStore``, a sqlite file shared by every worker process.
+Both expire entries lazily: a stale id is dropped when it is next read, and
+the sqlite store sweeps expired rows every ``sweep_every`` writes. Each store
+call is timed per operation in ``ServerSessionInterface.stats``.
+"""
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, new=False, expires_at=0.0):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.expires_at = expires_at
+        self.modified = False
+        self.replaced = None  # id given up by regenerate(), deleted from the store on save
+
+    def regenerate(self):
+        """Keep the data under a new random id; the old id stops working once the response is saved."""
+        if self.replaced is None:
+            self.replaced = self.sid
+        self.sid = secrets.token_urlsafe(32)
+        self.modified = True
+
+
+class MemoryStore:
+    name = "memory"
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self._data = OrderedDict()  # sid -> (expires_at, payload), least recently used first
+        self._lock = threading.Lock()
+
+    def get(self, sid):
+        with self._lock:
+            item = self._data.get(sid)
+            if item is None:
+                return None
+            if item[0] < time.time():
+                del self._data[sid]
+                return None
+            self._data.move_to_end(sid)
+            return item
+
+    def set(self, sid, payload, expires_at):
+        with self._lock:
+            self._data[sid] = (expires_at, payload)
+            self._data.move_to_end(sid)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, sid):
+        with self._lock:
+            self._data.pop(sid, None)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SqliteStore:
+    """Session table in a sqlite file, safe to share between processes."""
+
+    name = "sqlite"
+
+    def __init__(self, path, sweep_every=200):
+        self.path = path
+        self.sweep_every = sweep_every
+        self._writes = 0
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                " sid TEXT PRIMARY KEY, payload TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_expires ON sessions (expires_at)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, sid):
+        conn = self._conn()
+        row = conn.execute("SELECT expires_at, payload FROM sessions WHERE sid = ?", (sid,)).fetchone()
+        if row is None:
+            return None
+        if row[0] < time.time():
+            conn.execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+            return None
+        return row
+
+    def set(self, sid, payload, expires_at):
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO sessions (sid, payload, expires_at) VALUES (?, ?, ?)",
+            (sid, payload, expires_at),
+        )
+        self._writes += 1
+        if self._writes % self.sweep_every == 0:
+            conn.execute("DELETE FROM sessions WHERE expires_at < ?", (time.time(),))
+
+    def delete(self, sid):
+        self._conn().execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+class ServerSessionInterface(SessionInterface):
+    serializer = TaggedJSONSerializer()  # same encoding Flask uses (flash tuples, Markup, ...)
+
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.Lock()
+        # op -> [calls, total seconds]
+        self.stats = {"backend": store.name, "get": [0, 0.0], "set": [0, 0.0], "delete": [0, 0.0]}
+
+    def _timed(self, op, *args):
+        start = time.perf_counter()
+        try:
+            return getattr(self.store, op)(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.stats[op][0] += 1
+                self.stats[op][1] += elapsed
+
+    def _lifetime(self, app):
+        return app.permanent_session_lifetime.total_seconds()
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            item = self._timed("get", sid)
+            if item is not None:
+                expires_at, payload = item
+                return ServerSession(self.serializer.loads(payload), sid=sid, expires_at=expires_at)
+        return ServerSession(new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+
+        if session.accessed:
+            response.vary.add("Cookie")
+        if session.replaced:
+            self._timed("delete", session.replaced)
+            session.replaced = None
+
+        if not session:
+            if session.modified and session.sid:
+                # emptied (e.g. logout + flash read): drop it server-side and in the browser
+                self._timed("delete", session.sid)
+                response.delete_cookie(
+                    name, domain=domain, path=path, secure=secure, samesite=samesite, httponly=httponly,
+                )
+            return
+
+        lifetime = self._lifetime(app)
+        now = time.time()
+        refresh = session.expires_at - now < lifetime / 2
+        if not session.modified and not refresh:
+            return
+        if session.sid is None:
+            session.sid = secrets.token_urlsafe(32)
+        session.expires_at = now + lifetime
+        self._timed("set", session.sid, self.serializer.dumps(dict(session)), session.expires_at)
+        response.set_cookie(
+            name, session.sid, expires=self.get_expiration_time(app, session),
+            httponly=httponly, domain=domain, path=path, secure=secure, samesite=samesite,
+        )
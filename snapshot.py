@@ -0,0 +1,80 @@
+"""Startup artefacts built once and reused by every later worker boot.
+
+Some of what a worker builds at startup is a pure function of files on disk:
+the search index of a catalog file, the compressed variants of the static
+assets. ``Snapshot.load(name, key, build)`` pickles ``build()``'s result under
+``directory`` the first time, named by a hash of ``key`` (the stat keys and
+format versions of its sources), and from then on unpickles it instead of
+rebuilding. When a source changes its key changes, so the next boot builds
+and saves a new snapshot and removes the old one.
+
+Writing is best-effort: on a read-only filesystem, or if the directory
+can't be created, ``load`` just returns ``build()`` every time. A snapshot
+that fails to unpickle (truncated, from an incompatible version) is rebuilt.
+Writes go through a temporary file and a rename, so concurrent workers never
+read a partial file.
+
+Snapshots are only ever written by the app itself into its own instance
+directory; pickle is not safe for files from anywhere else.
+"""
+import glob
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+
+log = logging.getLogger(__name__)
+
+
+class Snapshot:
+    def __init__(self, directory):
+        self.directory = directory
+        self.stats = {"hits": 0, "builds": 0, "unsaved": 0}
+
+    def _path(self, name, key):
+        digest = hashlib.sha256(repr(key).encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.directory, f"{name}-{digest}.pickle")
+
+    def load(self, name, key, build):
+        """``build()``'s result for ``key``, read back from disk when it was saved before."""
+        path = self._path(name, key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            log.warning("Rebuilding snapshot %s: %s", path, e)
+        else:
+            self.stats["hits"] += 1
+            return value
+        value = build()
+        self.stats["builds"] += 1
+        self._save(name, path, value)
+        return value
+
+    def _save(self, name, path, value):
+        tmp = None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=f".{name}-")
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except OSError as e:
+            self.stats["unsaved"] += 1
+            log.info("Snapshot %s not saved: %s", path, e)
+            if tmp:
+                try:
+                    os.unlink(tmp)
+                except OSError:
+                    pass
+            return
+        # snapshots of earlier versions of the same sources
+        for old in glob.glob(os.path.join(glob.escape(self.directory), f"{glob.escape(name)}-*.pickle")):
+            if old != path:
+                try:
+                    os.unlink(old)
+                except OSError:
+                    pass
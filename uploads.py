@@ -0,0 +1,156 @@
+"""Profile picture uploads: validate, dedupe by content hash, resize in the background.
+
+``ImagePipeline.save`` streams an upload to a temp file while hashing it,
+checks that it really is an image, and moves it to ``avatars/<sha256>.<ext>``
+so two students uploading ``photo.jpg`` never clash and identical files are
+stored once. Square thumbnails (JPEG plus a smaller WebP) are generated on a
+small thread pool, so the request returns as soon as the original is stored;
+``avatar_urls`` serves the thumbnails once they exist and the original until
+then. Pictures uploaded before this pipeline get their thumbnails generated
+the first time they are shown.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+log = logging.getLogger(__name__)
+
+FORMATS = {"JPEG": "jpg", "MPO": "jpg", "PNG": "png", "GIF": "gif", "WEBP": "webp"}
+THUMB_SIZES = (160, 320)
+CHUNK = 64 * 1024
+
+
+class UploadError(ValueError):
+    pass
+
+
+def variant_path(original, size, ext):
+    stem, _ = os.path.splitext(original)
+    return f"{stem}_{size}.{ext}"
+
+
+class ImagePipeline:
+    def __init__(self, static_dir, subdir="uploads/avatars", max_bytes=8 * 1024 * 1024,
+                 max_pixels=40_000_000, workers=2):
+        self.static_dir = static_dir
+        self.subdir = subdir
+        self.max_bytes = max_bytes
+        self.max_pixels = max_pixels
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="avatar")
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def _abs(self, rel):
+        return os.path.join(self.static_dir, *rel.split("/"))
+
+    def save(self, file):
+        """Store an uploaded FileStorage; returns its path relative to ``static``."""
+        target_dir = self._abs(self.subdir)
+        os.makedirs(target_dir, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp = tempfile.mkstemp(dir=target_dir, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while True:
+                    chunk = file.stream.read(CHUNK)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise UploadError(f"Image is larger than {self.max_bytes // (1024 * 1024)} MB")
+                    digest.update(chunk)
+                    out.write(chunk)
+            ext = self._validate(tmp)
+            rel = f"{self.subdir}/{digest.hexdigest()}.{ext}"
+            dest = self._abs(rel)
+            if os.path.exists(dest):
+                os.remove(tmp)  # same picture already stored
+            else:
+                os.chmod(tmp, 0o644)  # mkstemp creates it owner-only
+                os.replace(tmp, dest)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        self.schedule(rel)
+        return rel
+
+    def _validate(self, path):
+        try:
+            with Image.open(path) as img:
+                fmt = img.format
+                if img.width * img.height > self.max_pixels:
+                    raise UploadError("Image dimensions are too large")
+                img.verify()
+        except (UnidentifiedImageError, OSError, SyntaxError, Image.DecompressionBombError):
+            raise UploadError("File is not a valid image")
+        if fmt not in FORMATS:
+            raise UploadError("Unsupported image format")
+        return FORMATS[fmt]
+
+    def _variants(self, rel):
+        return [variant_path(rel, size, ext) for size in THUMB_SIZES for ext in ("jpg", "webp")]
+
+    def ready(self, rel):
+        return all(os.path.exists(self._abs(v)) for v in self._variants(rel))
+
+    def schedule(self, rel):
+        """Queue thumbnail generation for ``rel`` unless done or already queued."""
+        with self._lock:
+            if rel in self._pending:
+                return
+            self._pending.add(rel)
+        self._pool.submit(self._process, rel)
+
+    def _process(self, rel):
+        try:
+            if self.ready(rel):
+                return
+            with Image.open(self._abs(rel)) as img:
+                img = ImageOps.exif_transpose(img)
+                if img.mode not in ("RGB", "L"):
+                    img = img.convert("RGBA")
+                    background = Image.new("RGB", img.size, "white")
+                    background.paste(img, mask=img.getchannel("A"))
+                    img = background
+                img = img.convert("RGB")
+                for size in THUMB_SIZES:
+                    thumb = ImageOps.fit(img, (size, size), Image.LANCZOS)
+                    self._write(thumb, variant_path(rel, size, "jpg"), "JPEG", quality=82, optimize=True, progressive=True)
+                    self._write(thumb, variant_path(rel, size, "webp"), "WEBP", quality=75, method=4)
+        except Exception:
+            log.exception("Could not generate thumbnails for %s", rel)
+        finally:
+            with self._lock:
+                self._pending.discard(rel)
+
+    def _write(self, img, rel, fmt, **params):
+        dest = self._abs(rel)
+        tmp = dest + ".part"
+        img.save(tmp, fmt, **params)
+        os.replace(tmp, dest)
+
+    def avatar_urls(self, rel, size=160):
+        """Static paths for showing ``rel`` at ``size`` px (and 2x), or just the original.
+
+        Returns ``{"jpg", "jpg_2x", "webp", "webp_2x"}`` once thumbnails exist,
+        ``{"jpg": rel}`` before that, or None without a picture.
+        """
+        if not rel:
+            return None
+        if self.ready(rel):
+            return {
+                "jpg": variant_path(rel, size, "jpg"),
+                "jpg_2x": variant_path(rel, size * 2, "jpg"),
+                "webp": variant_path(rel, size, "webp"),
+                "webp_2x": variant_path(rel, size * 2, "webp"),
+            }
+        if os.path.exists(self._abs(rel)):
+            self.schedule(rel)
+        return {"jpg": rel}